@@ -147,7 +147,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'openbook_common.middleware.TimezoneMiddleware'
+    'openbook_common.middleware.TimezoneMiddleware',
+    'openbook_common.middleware.AuthorizationContextMiddleware'
 ]
 
 ROOT_URLCONF = 'openbook.urls'
@@ -359,7 +360,7 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'openbook_auth.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.AcceptHeaderVersioning'
 }
@@ -381,6 +382,14 @@ OS_TRANSLATION_CONFIG = {
     }
 }
 
+# Translations are cached in the default cache, its Redis should evict with an LRU maxmemory-policy
+TRANSLATION_CACHE_TIMEOUT = int(os.environ.get('TRANSLATION_CACHE_TIMEOUT', str(60 * 60 * 24 * 7)))
+TRANSLATION_CACHE_LOCK_TIMEOUT = int(os.environ.get('TRANSLATION_CACHE_LOCK_TIMEOUT', '10'))
+# How long concurrent requests wait for a translation being done by another request before doing it themselves
+TRANSLATION_CACHE_LOCK_WAIT_TIMEOUT = float(os.environ.get('TRANSLATION_CACHE_LOCK_WAIT_TIMEOUT', '1'))
+TRANSLATION_CACHE_LOCK_POLL_INTERVAL = float(os.environ.get('TRANSLATION_CACHE_LOCK_POLL_INTERVAL', '0.1'))
+TRANSLATE_POSTS_MAX_COUNT = int(os.environ.get('TRANSLATE_POSTS_MAX_COUNT', '20'))
+
 UNICODE_JSON = True
 
 # The sentry DSN for error reporting
@@ -503,12 +512,21 @@ CATEGORY_DESCRIPTION_MAX_LENGTH = 64
 DEVICE_NAME_MAX_LENGTH = 32
 DEVICE_UUID_MAX_LENGTH = 64
 SEARCH_QUERIES_MAX_LENGTH = 120
+# Users, communities and hashtags are indexed by the trigrams of their names, shorter queries match name prefixes
+SEARCH_TOKEN_LENGTH = 3
+# Trigrams of more objects than this are not looked up in the index, the names are compared instead
+SEARCH_TOKEN_MAX_OBJECTS_COUNT = int(os.environ.get('SEARCH_TOKEN_MAX_OBJECTS_COUNT', '10000'))
+SEARCH_TOKEN_OBJECTS_COUNT_CACHE_TIMEOUT = int(os.environ.get('SEARCH_TOKEN_OBJECTS_COUNT_CACHE_TIMEOUT', str(60 * 60)))
 FEATURE_IMPORTER_ENABLED = os.environ.get('FEATURE_IMPORTER_ENABLED', 'True') == 'True'
 MODERATION_REPORT_DESCRIPTION_MAX_LENGTH = 1000
 MODERATED_OBJECT_DESCRIPTION_MAX_LENGTH = 1000
 GLOBAL_HIDE_CONTENT_AFTER_REPORTS_AMOUNT = int(os.environ.get('GLOBAL_HIDE_CONTENT_AFTER_REPORTS_AMOUNT', '20'))
 MODERATORS_COMMUNITY_NAME = os.environ.get('MODERATORS_COMMUNITY_NAME', 'mods')
 PROXY_BLACKLIST_DOMAIN_MAX_LENGTH = 150
+# The blacklisted domains are kept in memory, their version in the cache is checked at most every interval
+PROXY_BLACKLISTED_DOMAINS_VERSION_CHECK_INTERVAL = int(
+    os.environ.get('PROXY_BLACKLISTED_DOMAINS_VERSION_CHECK_INTERVAL', '5'))
+PROXY_BLACKLISTED_DOMAINS_TIMEOUT = int(os.environ.get('PROXY_BLACKLISTED_DOMAINS_TIMEOUT', str(60 * 60)))
 
 SUPPORTED_MEDIA_MIMETYPES = [
     'video/mp4',
@@ -529,6 +547,80 @@ MIN_UNIQUE_TOP_POST_REACTIONS_COUNT = int(os.environ.get('MIN_UNIQUE_TOP_POST_RE
 MIN_UNIQUE_TOP_POST_COMMENTS_COUNT = int(os.environ.get('MIN_UNIQUE_TOP_POST_COMMENTS_COUNT', '5'))
 MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT = int(os.environ.get('MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT', '5'))
 
+# Draft posts flush config
+
+DRAFT_POSTS_FLUSH_BATCH_SIZE = int(os.environ.get('DRAFT_POSTS_FLUSH_BATCH_SIZE', '100'))
+# Seconds after which the flush job stops and enqueues itself to continue from the last flushed draft post
+DRAFT_POSTS_FLUSH_TIME_BUDGET = int(os.environ.get('DRAFT_POSTS_FLUSH_TIME_BUDGET', '60'))
+DRAFT_POSTS_FLUSH_MEDIA_DELETION_THREADS = int(os.environ.get('DRAFT_POSTS_FLUSH_MEDIA_DELETION_THREADS', '8'))
+
+# Posts counters reconcile config
+
+POSTS_COUNTERS_RECONCILE_BATCH_SIZE = int(os.environ.get('POSTS_COUNTERS_RECONCILE_BATCH_SIZE', '1000'))
+# Seconds after which the reconcile job stops and enqueues itself to continue from the last reconciled posts
+POSTS_COUNTERS_RECONCILE_TIME_BUDGET = int(os.environ.get('POSTS_COUNTERS_RECONCILE_TIME_BUDGET', '60'))
+
+# Timeline config
+
+TIMELINE_POSTS_MAX_LENGTH = int(os.environ.get('TIMELINE_POSTS_MAX_LENGTH', '800'))
+TIMELINE_POSTS_BULK_CREATE_BATCH_SIZE = int(os.environ.get('TIMELINE_POSTS_BULK_CREATE_BATCH_SIZE', '1000'))
+# When disabled, timeline fan-out/backfill jobs run inline instead of being enqueued
+TIMELINE_POSTS_JOBS_ASYNC = os.environ.get('TIMELINE_POSTS_JOBS_ASYNC', 'True') == 'True'
+
+# Notifications config
+
+NEW_POST_NOTIFICATIONS_FAN_OUT_PAGE_SIZE = int(os.environ.get('NEW_POST_NOTIFICATIONS_FAN_OUT_PAGE_SIZE', '1000'))
+# OneSignal accepts up to 200 filters per request, each device takes 2 filters and an OR operator
+PUSH_NOTIFICATIONS_MAX_DEVICES_PER_REQUEST = int(os.environ.get('PUSH_NOTIFICATIONS_MAX_DEVICES_PER_REQUEST', '66'))
+# When disabled, the new post notifications fan-out runs inline instead of being enqueued
+NEW_POST_NOTIFICATIONS_JOBS_ASYNC = os.environ.get('NEW_POST_NOTIFICATIONS_JOBS_ASYNC', 'True') == 'True'
+# Pending push notifications are queued in Redis and delivered in batches by the deliver_push_notifications command
+PUSH_NOTIFICATIONS_QUEUE_KEY = os.environ.get('PUSH_NOTIFICATIONS_QUEUE_KEY', 'push_notifications:pending')
+PUSH_NOTIFICATIONS_METRICS_KEY = os.environ.get('PUSH_NOTIFICATIONS_METRICS_KEY', 'push_notifications:metrics')
+PUSH_NOTIFICATIONS_DELIVERY_BATCH_SIZE = int(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_BATCH_SIZE', '500'))
+PUSH_NOTIFICATIONS_DELIVERY_POOL_SIZE = int(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_POOL_SIZE', '10'))
+PUSH_NOTIFICATIONS_DELIVERY_MAX_RETRIES = int(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_MAX_RETRIES', '3'))
+PUSH_NOTIFICATIONS_DELIVERY_RETRY_BACKOFF = float(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_RETRY_BACKOFF', '0.5'))
+PUSH_NOTIFICATIONS_DELIVERY_REQUEST_TIMEOUT = int(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_REQUEST_TIMEOUT', '10'))
+PUSH_NOTIFICATIONS_DELIVERY_IDLE_TIMEOUT = int(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_IDLE_TIMEOUT', '5'))
+# Pushes whose requests all failed after their retries are queued again, up to this amount of attempts
+PUSH_NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS = int(os.environ.get('PUSH_NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS', '3'))
+# The unread notifications counts are kept per user and notification type in Redis and recomputed when missing
+UNREAD_NOTIFICATIONS_COUNT_KEY_PREFIX = os.environ.get('UNREAD_NOTIFICATIONS_COUNT_KEY_PREFIX',
+                                                       'unread_notifications_count:')
+UNREAD_NOTIFICATIONS_COUNT_TTL = int(os.environ.get('UNREAD_NOTIFICATIONS_COUNT_TTL', str(60 * 60 * 24 * 7)))
+UNREAD_NOTIFICATIONS_COUNT_RECONCILE_BATCH_SIZE = int(
+    os.environ.get('UNREAD_NOTIFICATIONS_COUNT_RECONCILE_BATCH_SIZE', '1000'))
+
+# Language detection config
+
+LANGUAGE_DETECTION_MIN_TEXT_LETTERS = int(os.environ.get('LANGUAGE_DETECTION_MIN_TEXT_LETTERS', '3'))
+LANGUAGE_DETECTION_CACHE_TIMEOUT = int(os.environ.get('LANGUAGE_DETECTION_CACHE_TIMEOUT', str(60 * 60 * 24)))
+# When enabled, the languages of posts and comments are detected by a job once they are committed
+LANGUAGE_DETECTION_JOBS_ASYNC = os.environ.get('LANGUAGE_DETECTION_JOBS_ASYNC', 'False') == 'True'
+LANGUAGES_MAP_TIMEOUT = int(os.environ.get('LANGUAGES_MAP_TIMEOUT', str(60 * 60)))
+
+# The community roles, bans and suspension of users are also shared between requests for this many seconds
+AUTHORIZATION_CONTEXT_CACHE_TIMEOUT = int(os.environ.get('AUTHORIZATION_CONTEXT_CACHE_TIMEOUT', '60'))
+
+# The users of auth tokens are shared between processes through the cache for this many seconds
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_CACHE_TIMEOUT', str(60 * 60)))
+# and optionally kept in each process for this many seconds. Logouts, password changes and other changes to them made
+# by other processes can take as long to apply, so it is disabled unless set
+AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = int(os.environ.get('AUTH_TOKEN_LOCAL_CACHE_TIMEOUT', '0'))
+AUTH_TOKEN_LOCAL_CACHE_MAX_SIZE = int(os.environ.get('AUTH_TOKEN_LOCAL_CACHE_MAX_SIZE', '10000'))
+
+# The trending communities are looked up in leaderboards of this many communities, 0 disables them
+TRENDING_COMMUNITIES_LEADERBOARD_SIZE = int(os.environ.get('TRENDING_COMMUNITIES_LEADERBOARD_SIZE', '1000'))
+# and read from their top this many communities at a time
+TRENDING_COMMUNITIES_LEADERBOARD_READ_SIZE = int(os.environ.get('TRENDING_COMMUNITIES_LEADERBOARD_READ_SIZE', '100'))
+# Missing leaderboards are rebuilt by a job enqueued at most once in this many seconds
+TRENDING_COMMUNITIES_REBUILD_ENQUEUED_TIMEOUT = int(
+    os.environ.get('TRENDING_COMMUNITIES_REBUILD_ENQUEUED_TIMEOUT', str(60 * 5)))
+
+# When enabled, the mentions and hashtags of posts and comments are processed by a job once they are committed
+MENTIONS_AND_HASHTAGS_JOBS_ASYNC = os.environ.get('MENTIONS_AND_HASHTAGS_JOBS_ASYNC', 'False') == 'True'
+
 # Email Config
 
 EMAIL_BACKEND = 'django_amazon_ses.EmailBackend'
@@ -551,6 +643,18 @@ if TESTING:
     MIN_UNIQUE_TOP_POST_REACTIONS_COUNT = 1
     MIN_UNIQUE_TOP_POST_COMMENTS_COUNT = 1
     MIN_UNIQUE_TRENDING_POST_REACTIONS_COUNT = 1
+    TIMELINE_POSTS_JOBS_ASYNC = False
+    NEW_POST_NOTIFICATIONS_JOBS_ASYNC = False
+    # Test cases load and roll back their own languages
+    LANGUAGES_MAP_TIMEOUT = 0
+    PROXY_BLACKLISTED_DOMAINS_TIMEOUT = 0
+    # Test cases roll back the users they authorize, contexts only live for a request
+    AUTHORIZATION_CONTEXT_CACHE_TIMEOUT = 0
+    AUTH_TOKEN_CACHE_TIMEOUT = 0
+    AUTH_TOKEN_LOCAL_CACHE_TIMEOUT = 0
+    SEARCH_TOKEN_OBJECTS_COUNT_CACHE_TIMEOUT = 0
+    # The leaderboards live in Redis, which keeps the communities of rolled back test cases
+    TRENDING_COMMUNITIES_LEADERBOARD_SIZE = 0
 
 if IS_PRODUCTION:
     AWS_ACCESS_KEY_ID = os.environ.get('AWS_ACCESS_KEY_ID')
@@ -579,3 +683,4 @@ if IS_PRODUCTION:
 # ONE SIGNAL
 ONE_SIGNAL_APP_ID = os.environ.get('ONE_SIGNAL_APP_ID')
 ONE_SIGNAL_API_KEY = os.environ.get('ONE_SIGNAL_API_KEY')
+ONE_SIGNAL_API_ROOT = os.environ.get('ONE_SIGNAL_API_ROOT', 'https://onesignal.com/api/v1')
@@ -0,0 +1,184 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.translation import ugettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from openbook_auth.authorization_contexts import get_authorization_context_for_user_with_id
+from openbook_common.utils.model_loaders import get_user_model
+
+AUTH_TOKEN_CACHE_KEY_PREFIX = 'auth_token:'
+AUTH_TOKEN_USER_CACHE_KEY_PREFIX = 'auth_token_user:'
+
+# The user fields authenticated requests can read without loading the user
+AUTH_TOKEN_USER_SNAPSHOT_FIELDS = ('id', 'uuid', 'username', 'is_active', 'is_deleted')
+
+# The user snapshots of the recently authenticated tokens of this process, by token key
+_local_auth_tokens = OrderedDict()
+_local_auth_tokens_lock = threading.Lock()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    A token authentication which looks the token user up in the cache instead of the database
+    """
+
+    def authenticate_credentials(self, key):
+        if settings.AUTH_TOKEN_CACHE_TIMEOUT <= 0:
+            return super(CachedTokenAuthentication, self).authenticate_credentials(key=key)
+
+        user_snapshot = get_user_snapshot_for_auth_token_with_key(key=key)
+
+        if user_snapshot is None:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not user_snapshot['is_active']:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (CachedTokenUser(user_snapshot=user_snapshot), key)
+
+
+class CachedTokenUser(SimpleLazyObject):
+    """
+    The user of a request authenticated with a cached token. The snapshot fields are answered without any query and
+    is_suspended from the authorization context, the user is loaded from the database the first time anything else is
+    accessed.
+    """
+
+    def __init__(self, user_snapshot):
+        user_id = user_snapshot['id']
+        super(CachedTokenUser, self).__init__(lambda: get_user_model().objects.get(pk=user_id))
+        # Set through __dict__ as setting attributes of lazy objects loads them
+        self.__dict__['_user_snapshot'] = user_snapshot
+
+    def __getattr__(self, name):
+        if self._wrapped is empty:
+            if name == 'pk':
+                return self._user_snapshot['id']
+            if name in self._user_snapshot:
+                return self._user_snapshot[name]
+            if name == 'is_authenticated':
+                return True
+            if name == 'is_anonymous':
+                return False
+            if name == 'is_suspended':
+                # Checked by IsNotSuspended on most views, which would otherwise load the user for nothing
+                authorization_context = get_authorization_context_for_user_with_id(user_id=self._user_snapshot['id'])
+                if authorization_context is not None:
+                    return authorization_context.is_suspended
+
+        return super(CachedTokenUser, self).__getattr__(name)
+
+    def __bool__(self):
+        return True
+
+
+def get_user_snapshot_for_auth_token_with_key(key):
+    """
+    Returns the snapshot of the user of the token, kept in the process for AUTH_TOKEN_LOCAL_CACHE_TIMEOUT and shared
+    between processes through the cache for AUTH_TOKEN_CACHE_TIMEOUT. Returns None if the token does not exist.
+    """
+    user_snapshot = _get_local_user_snapshot(key=key)
+
+    if user_snapshot is not None:
+        return user_snapshot
+
+    auth_token_cache_key = make_auth_token_cache_key(key=key)
+    user_id = cache.get(auth_token_cache_key)
+    user_snapshot = cache.get(make_auth_token_user_cache_key(user_id=user_id)) if user_id is not None else None
+
+    if user_snapshot is None:
+        user_snapshot = load_user_snapshot_for_auth_token_with_key(key=key)
+
+        if user_snapshot is None:
+            return None
+
+        cache.set_many({
+            auth_token_cache_key: user_snapshot['id'],
+            make_auth_token_user_cache_key(user_id=user_snapshot['id']): user_snapshot
+        }, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+
+    _set_local_user_snapshot(key=key, user_snapshot=user_snapshot)
+
+    return user_snapshot
+
+
+def load_user_snapshot_for_auth_token_with_key(key):
+    User = get_user_model()
+
+    return User.objects.filter(auth_token__key=key).values(*AUTH_TOKEN_USER_SNAPSHOT_FIELDS).first()
+
+
+def invalidate_auth_token_with_key(key):
+    with _local_auth_tokens_lock:
+        _local_auth_tokens.pop(key, None)
+
+    if settings.AUTH_TOKEN_CACHE_TIMEOUT > 0:
+        _delete_cache_keys([make_auth_token_cache_key(key=key)])
+
+
+def invalidate_auth_token_user_with_id(user_id):
+    with _local_auth_tokens_lock:
+        for key in [key for key, (expires_at, user_snapshot) in _local_auth_tokens.items() if
+                    user_snapshot['id'] == user_id]:
+            del _local_auth_tokens[key]
+
+    if settings.AUTH_TOKEN_CACHE_TIMEOUT > 0:
+        _delete_cache_keys([make_auth_token_user_cache_key(user_id=user_id)])
+
+
+def make_auth_token_cache_key(key):
+    # Tokens are credentials, only their hash is stored
+    return '%s%s' % (AUTH_TOKEN_CACHE_KEY_PREFIX, hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+def make_auth_token_user_cache_key(user_id):
+    return '%s%d' % (AUTH_TOKEN_USER_CACHE_KEY_PREFIX, user_id)
+
+
+def _delete_cache_keys(cache_keys):
+    cache.delete_many(cache_keys)
+
+    if transaction.get_connection().in_atomic_block:
+        # A snapshot loaded by another request before the change is committed would be cached again
+        transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def _get_local_user_snapshot(key):
+    if settings.AUTH_TOKEN_LOCAL_CACHE_TIMEOUT <= 0:
+        return None
+
+    with _local_auth_tokens_lock:
+        local_auth_token = _local_auth_tokens.get(key)
+
+        if local_auth_token is None:
+            return None
+
+        expires_at, user_snapshot = local_auth_token
+
+        if expires_at <= time.monotonic():
+            del _local_auth_tokens[key]
+            return None
+
+        _local_auth_tokens.move_to_end(key)
+
+        return user_snapshot
+
+
+def _set_local_user_snapshot(key, user_snapshot):
+    if settings.AUTH_TOKEN_LOCAL_CACHE_TIMEOUT <= 0:
+        return
+
+    with _local_auth_tokens_lock:
+        _local_auth_tokens[key] = (time.monotonic() + settings.AUTH_TOKEN_LOCAL_CACHE_TIMEOUT, user_snapshot)
+        _local_auth_tokens.move_to_end(key)
+
+        while len(_local_auth_tokens) > settings.AUTH_TOKEN_LOCAL_CACHE_MAX_SIZE:
+            _local_auth_tokens.popitem(last=False)
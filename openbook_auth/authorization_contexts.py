@@ -0,0 +1,128 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from openbook_common.utils.model_loaders import get_community_membership_model, get_community_model, \
+    get_moderation_penalty_model
+
+AUTHORIZATION_CONTEXT_CACHE_KEY_PREFIX = 'authorization_context:'
+
+# The authorization contexts loaded during the current request, by user id
+_request_authorization_contexts = ContextVar('request_authorization_contexts', default=None)
+
+
+class AuthorizationContext:
+    """
+    The community roles, community bans and suspension of a user, loaded at once to authorize their actions
+    """
+
+    def __init__(self, memberships, banned_from_communities_names, suspension_expiration):
+        # {community_name: (is_administrator, is_moderator)}
+        self.memberships = memberships
+        self.banned_from_communities_names = banned_from_communities_names
+        self.suspension_expiration = suspension_expiration
+
+    def is_member_of_community_with_name(self, community_name):
+        return community_name in self.memberships
+
+    def is_administrator_of_community_with_name(self, community_name):
+        return self.memberships.get(community_name, (False, False))[0]
+
+    def is_moderator_of_community_with_name(self, community_name):
+        return self.memberships.get(community_name, (False, False))[1]
+
+    def is_staff_of_community_with_name(self, community_name):
+        return any(self.memberships.get(community_name, (False, False)))
+
+    def is_banned_from_community_with_name(self, community_name):
+        return community_name in self.banned_from_communities_names
+
+    def is_global_moderator(self):
+        return self.is_member_of_community_with_name(community_name=settings.MODERATORS_COMMUNITY_NAME)
+
+    def is_suspended(self):
+        return self.suspension_expiration is not None and self.suspension_expiration > timezone.now()
+
+
+def get_authorization_context_for_user_with_id(user_id):
+    """
+    Returns the authorization context of the user, loaded once per request and shared between requests through the
+    cache for AUTHORIZATION_CONTEXT_CACHE_TIMEOUT. Returns None outside of requests when the cache is disabled.
+    """
+    request_authorization_contexts = _request_authorization_contexts.get()
+
+    if request_authorization_contexts is not None and user_id in request_authorization_contexts:
+        return request_authorization_contexts[user_id]
+
+    is_cached = settings.AUTHORIZATION_CONTEXT_CACHE_TIMEOUT > 0
+
+    if request_authorization_contexts is None and not is_cached:
+        return None
+
+    authorization_context = cache.get(make_authorization_context_cache_key(user_id=user_id)) if is_cached else None
+
+    if authorization_context is None:
+        authorization_context = load_authorization_context_for_user_with_id(user_id=user_id)
+
+        if is_cached:
+            cache.set(make_authorization_context_cache_key(user_id=user_id), authorization_context,
+                      settings.AUTHORIZATION_CONTEXT_CACHE_TIMEOUT)
+
+    if request_authorization_contexts is not None:
+        request_authorization_contexts[user_id] = authorization_context
+
+    return authorization_context
+
+
+def load_authorization_context_for_user_with_id(user_id):
+    CommunityMembership = get_community_membership_model()
+    Community = get_community_model()
+    ModerationPenalty = get_moderation_penalty_model()
+
+    memberships = {community_name: (is_administrator, is_moderator) for
+                   community_name, is_administrator, is_moderator in
+                   CommunityMembership.objects.filter(user_id=user_id).values_list('community__name',
+                                                                                    'is_administrator',
+                                                                                    'is_moderator')}
+
+    banned_from_communities_names = set(
+        Community.objects.filter(banned_users__id=user_id).values_list('name', flat=True))
+
+    suspension_expirations = ModerationPenalty.objects.filter(user_id=user_id, type=ModerationPenalty.TYPE_SUSPENSION,
+                                                              expiration__gt=timezone.now()).order_by(
+        '-expiration').values_list('expiration', flat=True)[:1]
+
+    return AuthorizationContext(memberships=memberships,
+                                banned_from_communities_names=banned_from_communities_names,
+                                suspension_expiration=next(iter(suspension_expirations), None))
+
+
+def invalidate_authorization_contexts_for_users_with_ids(users_ids):
+    request_authorization_contexts = _request_authorization_contexts.get()
+
+    if request_authorization_contexts is not None:
+        for user_id in users_ids:
+            request_authorization_contexts.pop(user_id, None)
+
+    if users_ids and settings.AUTHORIZATION_CONTEXT_CACHE_TIMEOUT > 0:
+        cache_keys = [make_authorization_context_cache_key(user_id=user_id) for user_id in users_ids]
+        cache.delete_many(cache_keys)
+
+        if transaction.get_connection().in_atomic_block:
+            # A context loaded by another request before the change is committed would be cached again
+            transaction.on_commit(lambda: cache.delete_many(cache_keys))
+
+
+def start_request_authorization_contexts():
+    return _request_authorization_contexts.set({})
+
+
+def end_request_authorization_contexts(token):
+    _request_authorization_contexts.reset(token)
+
+
+def make_authorization_context_cache_key(user_id):
+    return '%s%d' % (AUTHORIZATION_CONTEXT_CACHE_KEY_PREFIX, user_id)
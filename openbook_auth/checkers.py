@@ -765,6 +765,13 @@ def check_has_muted_post_comment_with_id(user, post_comment_id):
         )
 
 
+def check_can_translate_posts(user):
+    if user.translation_language is None:
+        raise ValidationError(
+            _('User\'s preferred translation language not set')
+        )
+
+
 def check_can_translate_comment_with_id(user, post_comment_id):
     PostComment = get_post_comment_model()
     post_comment = PostComment.objects.get(pk=post_comment_id)
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_auth', '0051_auto_20191209_1338'),
+    ]
+
+    operations = [
+        # Existing users are left with no boundary until their timeline posts are bootstrapped
+        migrations.AddField(
+            model_name='user',
+            name='timeline_posts_boundary_post_id',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='timeline_posts_boundary_post_id',
+            field=models.PositiveIntegerField(default=0, null=True),
+        ),
+    ]
@@ -4,9 +4,9 @@ import re
 import uuid
 from django.contrib.auth.validators import UnicodeUsernameValidator, ASCIIUsernameValidator
 from django.contrib.contenttypes.fields import GenericRelation
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import six, timezone, translation
 from django.template.loader import render_to_string
@@ -14,7 +14,7 @@ from django.utils.translation import ugettext_lazy as _
 from imagekit.models import ProcessedImageField
 from pilkit.processors import ResizeToFill, ResizeToFit
 from rest_framework.authtoken.models import Token
-from django.db.models import Q, F, Count
+from django.db.models import Q, F
 from django.core.mail import EmailMultiAlternatives
 
 from openbook.settings import USERNAME_MAX_LENGTH
@@ -22,22 +22,35 @@ from openbook_auth.helpers import upload_to_user_cover_directory, upload_to_user
 from openbook_hashtags.queries import make_search_hashtag_query_for_user_with_id, \
     make_get_hashtag_with_name_for_user_with_id_query
 from openbook_notifications.helpers import get_notification_language_code_for_target_user
-from openbook_posts.queries import make_get_hashtag_posts_for_user_with_id_query
+from openbook_notifications.unread_notifications_counts import get_unread_notifications_count_for_user_with_id, \
+    decrement_unread_notifications_count_for_user_with_id, load_unread_notifications_counts_for_users_with_ids, \
+    reset_unread_notifications_counts_for_user_with_id
+from openbook_posts.jobs import enqueue_timeline_posts_job, refresh_timeline_posts_between_users, \
+    add_community_posts_to_timeline, remove_community_posts_from_timeline
+from openbook_posts.queries import make_get_hashtag_posts_for_user_query, make_exclude_reported_posts_for_user_query, \
+    make_exclude_blocked_posts_for_user_query, make_exclude_community_posts_banned_from_for_user_query, \
+    make_exclude_communities_posts_query
 from openbook_posts.query_collections import get_posts_for_user_collection
-from openbook_translation import translation_strategy
+from openbook_auth.authorization_contexts import get_authorization_context_for_user_with_id
+from openbook_auth.authentication import invalidate_auth_token_with_key, invalidate_auth_token_user_with_id
+from openbook_translation.strategies.base import UnsupportedLanguagePairException, MaxTextLengthExceededError
+from openbook_translation.translated_texts import get_translated_text
 from openbook_common.helpers import get_supported_translation_language
-from openbook_common.models import Badge, Language
-from openbook_common.utils.helpers import delete_file_field
+from openbook_common.models import Badge, Language, SearchToken
+from openbook_common.search import make_search_query, order_by_search_rank, update_search_tokens_for_object_with_id, \
+    delete_search_tokens_for_object_with_id
+from openbook_common.utils.helpers import delete_file_field, get_union_of_querysets
 from openbook_common.utils.model_loaders import get_connection_model, get_circle_model, get_follow_model, \
     get_list_model, get_community_invite_model, \
     get_post_comment_notification_model, get_follow_notification_model, get_connection_confirmed_notification_model, \
     get_connection_request_notification_model, get_post_reaction_notification_model, get_device_model, \
-    get_post_mute_model, get_community_invite_notification_model, get_user_block_model, get_emoji_model, \
+    get_post_mute_model, get_community_invite_notification_model, get_user_block_model, \
     get_post_comment_reply_notification_model, get_moderated_object_model, get_moderation_report_model, \
     get_moderation_penalty_model, get_post_comment_mute_model, get_post_comment_reaction_model, \
     get_post_comment_reaction_notification_model, get_top_post_model, get_top_post_community_exclusion_model, \
     get_hashtag_model, get_profile_posts_community_exclusion_model, get_user_new_post_notification_model
 from openbook_common.validators import name_characters_validator
+from openbook_communities.queries import make_search_communities_names_query
 from openbook_notifications import helpers
 from openbook_auth.checkers import *
 
@@ -83,10 +96,15 @@ class User(AbstractUser):
 
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     invite_count = models.SmallIntegerField(default=0)
+    # The timeline posts older than this post are not materialized and computed on read, see TimelinePost.
+    # Null until the timeline posts of the user are bootstrapped.
+    timeline_posts_boundary_post_id = models.PositiveIntegerField(null=True, default=0)
 
     JWT_TOKEN_TYPE_CHANGE_EMAIL = 'CE'
     JWT_TOKEN_TYPE_PASSWORD_RESET = 'PR'
 
+    SEARCH_USERS_FIELDS = ('username', 'profile__name')
+
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
@@ -275,8 +293,8 @@ class User(AbstractUser):
         return self.moderation_penalties.filter(
             moderated_object__category__severity=moderation_severity).count()
 
-    def count_unread_notifications(self):
-        return self.notifications.filter(read=False).count()
+    def count_unread_notifications(self, types=None):
+        return get_unread_notifications_count_for_user_with_id(user_id=self.pk, types=types)
 
     def count_public_posts_for_user(self, user):
         """
@@ -295,10 +313,9 @@ class User(AbstractUser):
 
         exclude_reported_and_approved_posts_query = ~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED)
 
-        exclude_reported_posts_query = ~Q(moderated_object__reports__reporter_id=self.pk)
+        exclude_reported_posts_query = make_exclude_reported_posts_for_user_query(user=self)
 
-        exclude_blocked_posts_query = ~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-            creator__user_blocks__blocked_user_id=self.pk))
+        exclude_blocked_posts_query = make_exclude_blocked_posts_for_user_query(user=self)
 
         exclude_deleted_posts_query = Q(is_deleted=False, status=Post.STATUS_PUBLISHED)
 
@@ -350,7 +367,7 @@ class User(AbstractUser):
         Count how many posts are with the given hashtag name relative to the user
         """
         Post = get_post_model()
-        hashtag_posts_query = make_get_hashtag_posts_for_user_with_id_query(user_id=self.pk, hashtag=hashtag)
+        hashtag_posts_query = make_get_hashtag_posts_for_user_query(user=self, hashtag=hashtag)
 
         return Post.objects.filter(hashtag_posts_query).distinct().cache().count()
 
@@ -676,6 +693,53 @@ class User(AbstractUser):
         UserBlock = get_user_block_model()
         return UserBlock.users_are_blocked(user_a_id=self.pk, user_b_id=user_id)
 
+    def get_blocked_with_users_ids(self):
+        """
+        Ids of the users blocking or blocked by this user, cached until one of their blocks changes
+        """
+        UserBlock = get_user_block_model()
+        users_blocks = UserBlock.objects.filter(Q(blocker_id=self.pk) | Q(blocked_user_id=self.pk)).values_list(
+            'blocker_id', 'blocked_user_id').cache()
+
+        return {blocked_user_id if blocker_id == self.pk else blocker_id for blocker_id, blocked_user_id in
+                users_blocks}
+
+    def get_reported_posts_ids(self):
+        """
+        Ids of the posts reported by this user, cached until one of their reports changes
+        """
+        ModerationReport = get_moderation_report_model()
+        ModeratedObject = get_moderated_object_model()
+        reported_posts_ids = ModerationReport.objects.filter(
+            reporter_id=self.pk, moderated_object__object_type=ModeratedObject.OBJECT_TYPE_POST).values_list(
+            'moderated_object__object_id', flat=True).cache()
+
+        return set(reported_posts_ids)
+
+    def get_banned_from_communities_ids(self):
+        """
+        Ids of the communities this user is banned from, cached until one of their bans changes
+        """
+        Community = get_community_model()
+        banned_from_communities_ids = Community.banned_users.through.objects.filter(user_id=self.pk).values_list(
+            'community_id', flat=True).cache()
+
+        return set(banned_from_communities_ids)
+
+    def get_top_posts_excluded_communities_ids(self):
+        TopPostCommunityExclusion = get_top_post_community_exclusion_model()
+        excluded_communities_ids = TopPostCommunityExclusion.objects.filter(user_id=self.pk).values_list(
+            'community_id', flat=True).cache()
+
+        return set(excluded_communities_ids)
+
+    def get_profile_posts_excluded_communities_ids(self):
+        ProfilePostsCommunityExclusion = get_profile_posts_community_exclusion_model()
+        excluded_communities_ids = ProfilePostsCommunityExclusion.objects.filter(user_id=self.pk).values_list(
+            'community_id', flat=True).cache()
+
+        return set(excluded_communities_ids)
+
     def has_circles_with_ids(self, circles_ids):
         return self.circles.filter(id__in=circles_ids).count() == len(circles_ids)
 
@@ -687,9 +751,19 @@ class User(AbstractUser):
                                                        community__name=community_name).exists()
 
     def is_administrator_of_community_with_name(self, community_name):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_administrator_of_community_with_name(community_name=community_name)
+
         return self.communities_memberships.filter(community__name=community_name, is_administrator=True).exists()
 
     def is_staff_of_community_with_name(self, community_name):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_staff_of_community_with_name(community_name=community_name)
+
         return self.is_administrator_of_community_with_name(
             community_name=community_name) or self.is_moderator_of_community_with_name(community_name=community_name)
 
@@ -697,18 +771,38 @@ class User(AbstractUser):
         return self.communities_memberships.all().exists()
 
     def is_member_of_community_with_name(self, community_name):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_member_of_community_with_name(community_name=community_name)
+
         return self.communities_memberships.filter(community__name=community_name).exists()
 
     def is_banned_from_community_with_name(self, community_name):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_banned_from_community_with_name(community_name=community_name)
+
         return self.banned_of_communities.filter(name=community_name).exists()
 
     def is_creator_of_community_with_name(self, community_name):
         return self.created_communities.filter(name=community_name).exists()
 
     def is_moderator_of_community_with_name(self, community_name):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_moderator_of_community_with_name(community_name=community_name)
+
         return self.communities_memberships.filter(community__name=community_name, is_moderator=True).exists()
 
     def is_suspended(self):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_suspended()
+
         ModerationPenalty = get_moderation_penalty_model()
         return self.moderation_penalties.filter(type=ModerationPenalty.TYPE_SUSPENSION,
                                                 expiration__gt=timezone.now()).exists()
@@ -717,6 +811,11 @@ class User(AbstractUser):
         return self.moderation_penalties.order_by('expiration')[0:1][0]
 
     def is_global_moderator(self):
+        authorization_context = self._get_authorization_context()
+
+        if authorization_context:
+            return authorization_context.is_global_moderator()
+
         moderators_community_name = settings.MODERATORS_COMMUNITY_NAME
         return self.is_member_of_community_with_name(community_name=moderators_community_name)
 
@@ -934,38 +1033,11 @@ class User(AbstractUser):
     def get_emoji_counts_for_post(self, post, emoji_id=None):
         check_can_get_reactions_for_post(user=self, post=post)
 
-        Emoji = get_emoji_model()
-
-        emoji_query = Q(post_reactions__post_id=post.pk, )
-
-        if emoji_id:
-            emoji_query.add(Q(post_reactions__emoji_id=emoji_id), Q.AND)
-
-        post_community = post.community
-
-        if post_community:
-            if not self.is_staff_of_community_with_name(community_name=post_community.name):
-                # Exclude blocked users reactions
-                blocked_users_query = ~Q(Q(post_reactions__reactor__blocked_by_users__blocker_id=self.pk) | Q(
-                    post_reactions__reactor__user_blocks__blocked_user_id=self.pk))
-                blocked_users_query_staff_members = Q(
-                    post_reactions__reactor__communities_memberships__community_id=post_community.pk)
-                blocked_users_query_staff_members.add(
-                    Q(post_reactions__reactor__communities_memberships__is_administrator=True) | Q(
-                        post_reactions__reactor__communities_memberships__is_moderator=True), Q.AND)
-
-                blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
-                emoji_query.add(blocked_users_query, Q.AND)
-        else:
-            # Show all, even blocked users reactions
-            blocked_users_query = ~Q(Q(post_reactions__reactor__blocked_by_users__blocker_id=self.pk) | Q(
-                post_reactions__reactor__user_blocks__blocked_user_id=self.pk))
-            emoji_query.add(blocked_users_query, Q.AND)
-
-        emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_reactions')).distinct().order_by(
-            '-post_reactions__count').cache().all()
+        PostReaction = get_post_reaction_model()
+        posts_emoji_counts = PostReaction.get_emoji_counts_for_posts_with_user(posts=[post], user=self,
+                                                                               emoji_id=emoji_id)
 
-        return [{'emoji': emoji, 'count': emoji.post_reactions__count} for emoji in emojis]
+        return posts_emoji_counts.get(post.pk, [])
 
     def get_emoji_counts_for_post_comment_with_id(self, post_comment_id, emoji_id=None):
         PostComment = get_post_comment_model()
@@ -975,38 +1047,20 @@ class User(AbstractUser):
     def get_emoji_counts_for_post_comment(self, post_comment, emoji_id=None):
         check_can_get_reactions_for_post_comment(user=self, post_comment=post_comment)
 
-        Emoji = get_emoji_model()
-
-        emoji_query = Q(post_comment_reactions__post_comment_id=post_comment.pk, )
-
-        if emoji_id:
-            emoji_query.add(Q(post_comment_reactions__emoji_id=emoji_id), Q.AND)
-
-        post_comment_community = post_comment.post.community
-
-        if post_comment_community:
-            if not self.is_staff_of_community_with_name(community_name=post_comment_community.name):
-                # Exclude blocked users reactions
-                blocked_users_query = ~Q(Q(post_comment_reactions__reactor__blocked_by_users__blocker_id=self.pk) | Q(
-                    post_comment_reactions__reactor__user_blocks__blocked_user_id=self.pk))
-                blocked_users_query_staff_members = Q(
-                    post_comment_reactions__reactor__communities_memberships__community_id=post_comment_community.pk)
-                blocked_users_query_staff_members.add(
-                    Q(post_comment_reactions__reactor__communities_memberships__is_administrator=True) | Q(
-                        post_comment_reactions__reactor__communities_memberships__is_moderator=True), Q.AND)
-
-                blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
-                emoji_query.add(blocked_users_query, Q.AND)
-        else:
-            # Show all, even blocked users reactions
-            blocked_users_query = ~Q(Q(post_comment_reactions__reactor__blocked_by_users__blocker_id=self.pk) | Q(
-                post_comment_reactions__reactor__user_blocks__blocked_user_id=self.pk))
-            emoji_query.add(blocked_users_query, Q.AND)
+        PostCommentReaction = get_post_comment_reaction_model()
+        post_comments_emoji_counts = PostCommentReaction.get_emoji_counts_for_post_comments_with_user(
+            post_comments=[post_comment], user=self, emoji_id=emoji_id)
 
-        emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_comment_reactions')).distinct().order_by(
-            '-post_comment_reactions__count').cache().all()
+        return post_comments_emoji_counts.get(post_comment.pk, [])
 
-        return [{'emoji': emoji, 'count': emoji.post_comment_reactions__count} for emoji in emojis]
+    def get_emoji_counts_for_posts_with_ids(self, posts_ids, emoji_id=None):
+        """
+        Batched variant of get_emoji_counts_for_post_with_id for posts the user can see.
+        Returns a dict of post id to a list of {'emoji', 'count'} ordered by count.
+        """
+        PostReaction = get_post_reaction_model()
+        return PostReaction.get_emoji_counts_for_posts_with_ids_with_user(posts_ids=posts_ids, user=self,
+                                                                          emoji_id=emoji_id)
 
     def get_reaction_for_post_comment_with_id(self, post_comment_id):
         return self.post_comment_reactions.filter(post_comment_id=post_comment_id).get()
@@ -1126,6 +1180,51 @@ class User(AbstractUser):
         PostComment = get_post_comment_model()
         return PostComment.objects.filter(comment_replies_query)
 
+    def get_comments_page_for_post(self, post, sort_query, max_id=None, min_id=None, count_max=10, count_min=10):
+        """
+        Returns count_max comments before max_id and count_min comments from min_id, sorted by sort_query.
+        When scrolling around a comment with both of them, they are retrieved in a single query where the database
+        supports it.
+        """
+        check_can_get_comments_for_post(user=self, post=post)
+
+        PostComment = get_post_comment_model()
+
+        if not max_id and not min_id:
+            comments_query = self._make_get_comments_for_post_query(post=post)
+            return list(PostComment.objects.filter(comments_query).order_by(sort_query)[:count_max])
+
+        post_comments_querysets = []
+
+        if max_id:
+            comments_query = self._make_get_comments_for_post_query(post=post, max_id=max_id)
+            post_comments_querysets.append(PostComment.objects.filter(comments_query).order_by('-pk')[:count_max])
+
+        if min_id:
+            comments_query = self._make_get_comments_for_post_query(post=post, min_id=min_id)
+            post_comments_querysets.append(PostComment.objects.filter(comments_query).order_by('pk')[:count_min])
+
+        return get_union_of_querysets(querysets=post_comments_querysets, order_by=sort_query)
+
+    def get_first_replies_for_post_comments_with_post(self, post, post_comments, sort_query, count):
+        """
+        Returns the first count replies of each of the post comments, sorted by sort_query, in a single query where
+        the database supports it. Returns a dict of post comment id to replies.
+        """
+        PostComment = get_post_comment_model()
+
+        # Comments without any reply are not queried
+        replies_querysets = [PostComment.objects.filter(
+            self._make_get_comments_for_post_query(post=post, post_comment_parent_id=post_comment.pk)).order_by(
+            sort_query)[:count] for post_comment in post_comments if post_comment.replies_count > 0]
+
+        post_comments_replies = {}
+
+        for reply in get_union_of_querysets(querysets=replies_querysets, order_by=sort_query):
+            post_comments_replies.setdefault(reply.parent_comment_id, []).append(reply)
+
+        return post_comments_replies
+
     def get_comments_count_for_post(self, post):
         return post.count_comments_with_user(user=self)
 
@@ -1339,8 +1438,12 @@ class User(AbstractUser):
     def delete_circle_with_id(self, circle_id):
         check_can_delete_circle_with_id(user=self, circle_id=circle_id)
         circle = self.circles.get(id=circle_id)
+        circle_users_ids = list(circle.connections.values_list('target_user_id', flat=True))
         circle.delete()
 
+        for circle_user_id in circle_users_ids:
+            self._refresh_timeline_posts_with_user_with_id(user_id=circle_user_id)
+
     def update_circle(self, circle, **kwargs):
         return self.update_circle_with_id(circle.pk, **kwargs)
 
@@ -1395,6 +1498,7 @@ class User(AbstractUser):
         check_is_connected_with_user_with_id_in_circle_with_id(user=self, user_id=user_id, circle_id=circle_id)
         connection = self.get_connection_for_user_with_id(user_id)
         connection.circles.remove(circle_id)
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
         return connection
 
     def add_circle_with_id_to_connection_with_user_with_id(self, user_id, circle_id):
@@ -1402,6 +1506,7 @@ class User(AbstractUser):
         check_is_not_connected_with_user_with_id_in_circle_with_id(user=self, user_id=user_id, circle_id=circle_id)
         connection = self.get_connection_for_user_with_id(user_id)
         connection.circles.add(circle_id)
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
         return connection
 
     def get_circle_with_id(self, circle_id):
@@ -1549,6 +1654,8 @@ class User(AbstractUser):
         community_to_join = Community.objects.get(name=community_name)
         community_to_join.add_member(self)
 
+        enqueue_timeline_posts_job(add_community_posts_to_timeline, user_id=self.pk, community_id=community_to_join.pk)
+
         # Clean up_full any invites
         CommunityInvite = get_community_invite_model()
         CommunityInvite.objects.filter(community__name=community_name, invited_user__username=self.username).delete()
@@ -1573,6 +1680,9 @@ class User(AbstractUser):
 
         community_to_leave.remove_member(self)
 
+        enqueue_timeline_posts_job(remove_community_posts_from_timeline, user_id=self.pk,
+                                   community_id=community_to_leave.pk)
+
         return community_to_leave
 
     def invite_user_with_username_to_community_with_name(self, username, community_name):
@@ -1826,22 +1936,26 @@ class User(AbstractUser):
         hashtags_query = make_search_hashtag_query_for_user_with_id(search_query=query, user_id=self.pk)
         Hashtag = get_hashtag_model()
 
-        return Hashtag.objects.filter(hashtags_query)
+        return order_by_search_rank(Hashtag.objects.filter(hashtags_query), query=query, fields=('name',))
 
     def search_users_with_query(self, query):
         users_query = self._make_search_users_query(query=query)
 
-        return User.objects.filter(users_query)
+        return order_by_search_rank(User.objects.filter(users_query), query=query,
+                                    fields=self.SEARCH_USERS_FIELDS)
 
     def _make_search_users_query(self, query):
         users_query = self._make_users_query()
 
-        search_users_query = Q(username__icontains=query)
-        search_users_query.add(Q(profile__name__icontains=query), Q.OR)
+        search_users_query = self._make_search_users_names_query(query=query)
 
         users_query.add(search_users_query, Q.AND)
         return users_query
 
+    def _make_search_users_names_query(self, query):
+        return make_search_query(object_type=SearchToken.OBJECT_TYPE_USER, query=query,
+                                 fields=self.SEARCH_USERS_FIELDS)
+
     def _make_users_query(self):
         users_query = Q(is_deleted=False)
         users_query.add(~Q(blocked_by_users__blocker_id=self.pk) & ~Q(user_blocks__blocked_user_id=self.pk),
@@ -1869,8 +1983,7 @@ class User(AbstractUser):
         connected_users_query = self._make_connections_query()
         followers_query = self._make_followers_query()
 
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
+        names_query = self._make_search_users_names_query(query=query)
 
         connected_users_query.add(names_query, Q.AND)
         followers_query.add(names_query, Q.AND)
@@ -1890,8 +2003,7 @@ class User(AbstractUser):
     def search_blocked_users_with_query(self, query):
         blocked_users_query = self._make_blocked_users_query()
 
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
+        names_query = self._make_search_users_names_query(query=query)
 
         blocked_users_query.add(names_query, Q.AND)
 
@@ -1952,8 +2064,7 @@ class User(AbstractUser):
     def search_followers_with_query(self, query):
         followers_query = Q(follows__followed_user_id=self.pk, is_deleted=False)
 
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
+        names_query = self._make_search_users_names_query(query=query)
 
         followers_query.add(names_query, Q.AND)
 
@@ -1970,8 +2081,7 @@ class User(AbstractUser):
     def search_user_notifications_subscriptions_with_query(self, query):
         user_subscriptions_query = Q(notifications_subscribers__subscriber=self, is_deleted=False)
 
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
+        names_query = self._make_search_users_names_query(query=query)
 
         user_subscriptions_query.add(names_query, Q.AND)
 
@@ -1980,8 +2090,7 @@ class User(AbstractUser):
     def search_followings_with_query(self, query):
         followings_query = Q(followers__user_id=self.pk, is_deleted=False)
 
-        names_query = Q(username__icontains=query)
-        names_query.add(Q(profile__name__icontains=query), Q.OR)
+        names_query = self._make_search_users_names_query(query=query)
 
         followings_query.add(names_query, Q.AND)
 
@@ -1989,11 +2098,11 @@ class User(AbstractUser):
 
     def get_trending_posts(self, max_id=None, min_id=None):
         Post = get_post_model()
-        return Post.get_trending_posts_for_user_with_id(user_id=self.pk, max_id=max_id, min_id=min_id)
+        return Post.get_trending_posts_for_user(user=self, max_id=max_id, min_id=min_id)
 
     def get_trending_posts_old(self):
         Post = get_post_model()
-        return Post.get_trending_posts_old_for_user_with_id(user_id=self.pk)
+        return Post.get_trending_posts_old_for_user(user=self)
 
     def get_trending_communities(self, category_name=None):
         Community = get_community_model()
@@ -2022,8 +2131,7 @@ class User(AbstractUser):
 
     def search_subscribed_communities_with_query(self, query):
         subscribed_communities_query = Q(notifications_subscriptions__subscriber=self)
-        subscribed_communities_name_query = Q(name__icontains=query)
-        subscribed_communities_name_query.add(Q(title__icontains=query), Q.OR)
+        subscribed_communities_name_query = make_search_communities_names_query(query=query)
         subscribed_communities_query.add(subscribed_communities_name_query, Q.AND)
         Community = get_community_model()
         return Community.objects.filter(subscribed_communities_query)
@@ -2045,8 +2153,7 @@ class User(AbstractUser):
 
     def search_favorite_communities_with_query(self, query):
         favorite_communities_query = Q(starrers__id=self.pk)
-        favorite_communities_name_query = Q(name__icontains=query)
-        favorite_communities_name_query.add(Q(title__icontains=query), Q.OR)
+        favorite_communities_name_query = make_search_communities_names_query(query=query)
         favorite_communities_query.add(favorite_communities_name_query, Q.AND)
         Community = get_community_model()
         return Community.objects.filter(favorite_communities_query)
@@ -2057,8 +2164,7 @@ class User(AbstractUser):
 
     def search_administrated_communities_with_query(self, query):
         administrated_communities_query = Q(memberships__user=self, memberships__is_administrator=True)
-        administrated_communities_name_query = Q(name__icontains=query)
-        administrated_communities_name_query.add(Q(title__icontains=query), Q.OR)
+        administrated_communities_name_query = make_search_communities_names_query(query=query)
         administrated_communities_query.add(administrated_communities_name_query, Q.AND)
         Community = get_community_model()
         return Community.objects.filter(administrated_communities_query)
@@ -2069,8 +2175,7 @@ class User(AbstractUser):
 
     def search_moderated_communities_with_query(self, query):
         moderated_communities_query = Q(memberships__user=self, memberships__is_moderator=True)
-        moderated_communities_name_query = Q(name__icontains=query)
-        moderated_communities_name_query.add(Q(title__icontains=query), Q.OR)
+        moderated_communities_name_query = make_search_communities_names_query(query=query)
         moderated_communities_query.add(moderated_communities_name_query, Q.AND)
         Community = get_community_model()
         return Community.objects.filter(moderated_communities_query)
@@ -2155,12 +2260,41 @@ class User(AbstractUser):
         check_can_translate_post_with_id(user=self, post_id=post_id)
         Post = get_post_model()
         post = Post.objects.get(id=post_id)
-        result = translation_strategy.translate_text(
+        translated_text = get_translated_text(
             source_language_code=post.language.code,
             target_language_code=self.translation_language.code,
             text=post.text
         )
-        return post, result.get('translated_text')
+        return post, translated_text
+
+    def translate_posts_with_ids(self, posts_ids):
+        """
+        Translates the posts which can be translated, identical texts are translated once.
+        Returns a list of (post, translated_text), translated_text being None if the post could not be translated.
+        """
+        check_can_translate_posts(user=self)
+        Post = get_post_model()
+        target_language_code = self.translation_language.code
+
+        posts = Post.get_translatable_posts_with_ids(posts_ids=posts_ids)
+        translated_texts = {}
+
+        for post in posts:
+            translation_key = (post.text, post.language.code)
+
+            if translation_key in translated_texts:
+                continue
+
+            try:
+                translated_texts[translation_key] = get_translated_text(
+                    source_language_code=post.language.code,
+                    target_language_code=target_language_code,
+                    text=post.text
+                )
+            except (UnsupportedLanguagePairException, MaxTextLengthExceededError):
+                translated_texts[translation_key] = None
+
+        return [(post, translated_texts[(post.text, post.language.code)]) for post in posts]
 
     def open_post_with_id(self, post_id):
         check_can_open_post_with_id(user=self, post_id=post_id)
@@ -2197,7 +2331,7 @@ class User(AbstractUser):
         Hashtag = get_hashtag_model()
         hashtag = Hashtag.objects.get(name=hashtag_name)
 
-        hashtag_posts_query = make_get_hashtag_posts_for_user_with_id_query(user_id=self.pk, hashtag=hashtag)
+        hashtag_posts_query = make_get_hashtag_posts_for_user_query(user=self, hashtag=hashtag)
 
         if max_id:
             hashtag_posts_query.add(Q(id__lt=max_id), Q.AND)
@@ -2307,7 +2441,8 @@ class User(AbstractUser):
 
         posts_query.add(exclude_reported_and_approved_posts_query, Q.AND)
 
-        exclude_excluded_communitities_posts_query = ~Q(community__profile_posts_community_exclusions__user_id=self.pk)
+        exclude_excluded_communitities_posts_query = make_exclude_communities_posts_query(
+            communities_ids=self.get_profile_posts_excluded_communities_ids())
 
         posts_query.add(exclude_excluded_communitities_posts_query, Q.AND)
 
@@ -2421,17 +2556,19 @@ class User(AbstractUser):
                       'post__community__avatar',
                       'post__community__color', 'post__community__title')
 
-        reported_posts_exclusion_query = ~Q(post__moderated_object__reports__reporter_id=self.pk)
-        excluded_top_posts_communities_query = ~Q(post__community__top_posts_community_exclusions__user=self.pk)
+        reported_posts_exclusion_query = make_exclude_reported_posts_for_user_query(user=self, post_field='post')
+        excluded_top_posts_communities_query = make_exclude_communities_posts_query(
+            communities_ids=self.get_top_posts_excluded_communities_ids(), post_field='post')
 
         top_community_posts_query = Q(post__is_closed=False,
                                       post__is_deleted=False,
                                       post__status=Post.STATUS_PUBLISHED)
 
-        top_community_posts_query.add(~Q(Q(post__creator__blocked_by_users__blocker_id=self.pk) | Q(
-            post__creator__user_blocks__blocked_user_id=self.pk)), Q.AND)
+        top_community_posts_query.add(make_exclude_blocked_posts_for_user_query(user=self, post_field='post'), Q.AND)
         top_community_posts_query.add(Q(post__community__type=Community.COMMUNITY_TYPE_PUBLIC), Q.AND)
-        top_community_posts_query.add(~Q(post__community__banned_users__id=self.pk), Q.AND)
+        top_community_posts_query.add(make_exclude_community_posts_banned_from_for_user_query(user=self,
+                                                                                            post_field='post'),
+                                      Q.AND)
 
         if max_id:
             top_community_posts_query.add(Q(id__lt=max_id), Q.AND)
@@ -2460,7 +2597,7 @@ class User(AbstractUser):
         """
 
         if not circles_ids and not lists_ids:
-            return self._get_timeline_posts_with_no_filters(max_id=max_id)
+            return self._get_timeline_posts_with_no_filters(max_id=max_id, min_id=min_id)
 
         return self._get_timeline_posts_with_filters(max_id=max_id, circles_ids=circles_ids, lists_ids=lists_ids)
 
@@ -2507,13 +2644,58 @@ class User(AbstractUser):
 
         timeline_posts_query.add(Q(is_deleted=False, status=Post.STATUS_PUBLISHED), Q.AND)
 
-        timeline_posts_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        timeline_posts_query.add(make_exclude_reported_posts_for_user_query(user=self), Q.AND)
 
         return Post.objects.filter(timeline_posts_query).distinct()
 
-    def _get_timeline_posts_with_no_filters(self, max_id=None):
+    def _get_timeline_posts_with_no_filters(self, max_id=None, min_id=None):
         """
         Being the main action of the network, an optimised call of the get timeline posts call with no filtering.
+        Reads the timeline posts materialized on publish, see TimelinePost.
+        """
+        boundary_post_id = self.timeline_posts_boundary_post_id
+
+        if boundary_post_id is None or (max_id and max_id <= boundary_post_id):
+            # Not bootstrapped yet or paging past the trimmed timeline
+            return self._compute_timeline_posts_with_no_filters(max_id=max_id, min_id=min_id)
+
+        Post = get_post_model()
+
+        posts_select_related = ('creator', 'creator__profile', 'community', 'image')
+
+        posts_prefetch_related = ('circles', 'creator__profile__badges')
+
+        posts_only = ('text', 'id', 'uuid', 'created', 'image__width', 'image__height', 'image__image',
+                      'creator__username', 'creator__id', 'creator__profile__name', 'creator__profile__avatar',
+                      'creator__profile__badges__id', 'creator__profile__badges__keyword',
+                      'creator__profile__id', 'community__id', 'community__name', 'community__avatar',
+                      'community__color',
+                      'community__title')
+
+        ModeratedObject = get_moderated_object_model()
+
+        timeline_posts_query = Q(timeline_posts__owner_id=self.pk, is_deleted=False, status=Post.STATUS_PUBLISHED)
+
+        timeline_posts_query.add(make_exclude_reported_posts_for_user_query(user=self), Q.AND)
+
+        timeline_posts_query.add(~Q(Q(community__isnull=False) & (
+            Q(is_closed=True) | Q(moderated_object__status=ModeratedObject.STATUS_APPROVED))), Q.AND)
+
+        if max_id:
+            timeline_posts_query.add(Q(id__lt=max_id), Q.AND)
+        elif min_id:
+            timeline_posts_query.add(Q(id__gt=min_id), Q.AND)
+
+        if boundary_post_id:
+            # The older posts are computed once paged past the boundary
+            timeline_posts_query.add(Q(id__gte=boundary_post_id), Q.AND)
+
+        return Post.objects.select_related(*posts_select_related).prefetch_related(
+            *posts_prefetch_related).only(*posts_only).filter(timeline_posts_query)
+
+    def _compute_timeline_posts_with_no_filters(self, max_id=None, min_id=None):
+        """
+        Computes the timeline posts with no filtering straight from the follows, connections and communities.
         """
         world_circle_id = self._get_world_circle_id()
 
@@ -2531,7 +2713,7 @@ class User(AbstractUser):
                       'community__title')
 
         ModeratedObject = get_moderated_object_model()
-        reported_posts_exclusion_query = ~Q(moderated_object__reports__reporter_id=self.pk)
+        reported_posts_exclusion_query = make_exclude_reported_posts_for_user_query(user=self)
 
         own_posts_query = Q(creator=self.pk, community__isnull=True, is_deleted=False, status=Post.STATUS_PUBLISHED)
 
@@ -2539,6 +2721,8 @@ class User(AbstractUser):
 
         if max_id:
             own_posts_query.add(Q(id__lt=max_id), Q.AND)
+        elif min_id:
+            own_posts_query.add(Q(id__gt=min_id), Q.AND)
 
         own_posts_queryset = self.posts.select_related(*posts_select_related).prefetch_related(
             *posts_prefetch_related).only(*posts_only).filter(own_posts_query)
@@ -2546,11 +2730,12 @@ class User(AbstractUser):
         community_posts_query = Q(community__memberships__user__id=self.pk, is_closed=False, is_deleted=False,
                                   status=Post.STATUS_PUBLISHED)
 
-        community_posts_query.add(~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-            creator__user_blocks__blocked_user_id=self.pk)), Q.AND)
+        community_posts_query.add(make_exclude_blocked_posts_for_user_query(user=self), Q.AND)
 
         if max_id:
             community_posts_query.add(Q(id__lt=max_id), Q.AND)
+        elif min_id:
+            community_posts_query.add(Q(id__gt=min_id), Q.AND)
 
         community_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
@@ -2569,6 +2754,8 @@ class User(AbstractUser):
 
         if max_id:
             followed_users_query.add(Q(id__lt=max_id), Q.AND)
+        elif min_id:
+            followed_users_query.add(Q(id__gt=min_id), Q.AND)
 
         followed_users_query.add(
             Q(circles__id=world_circle_id) | Q(circles__connections__target_connection__circles__isnull=False,
@@ -2705,6 +2892,7 @@ class User(AbstractUser):
         follow = Follow.create_follow(user_id=self.pk, followed_user_id=user_id, lists_ids=lists_ids)
         self._create_follow_notification(followed_user_id=user_id)
         self._send_follow_push_notification(followed_user_id=user_id)
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
 
         return follow
 
@@ -2716,6 +2904,7 @@ class User(AbstractUser):
         follow = self.follows.get(followed_user_id=user_id)
         self._delete_follow_notification(followed_user_id=user_id)
         follow.delete()
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
 
     def update_follow_for_user(self, user, lists_ids=None):
         return self.update_follow_for_user_with_id(user.pk, lists_ids=lists_ids)
@@ -2774,6 +2963,7 @@ class User(AbstractUser):
 
         self._create_connection_request_notification(user_connection_requested_for_id=user_id)
         self._send_connection_request_push_notification(user_connection_requested_for_id=user_id)
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
 
         return connection
 
@@ -2813,6 +3003,8 @@ class User(AbstractUser):
         connection.circles.add(*circles_ids)
         connection.save()
 
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
+
         return connection
 
     def disconnect_from_user(self, user):
@@ -2830,6 +3022,8 @@ class User(AbstractUser):
         connection = self.connections.get(target_connection__user_id=user_id)
         connection.delete()
 
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
+
         return connection
 
     def get_connection_for_user_with_id(self, user_id):
@@ -2859,6 +3053,9 @@ class User(AbstractUser):
 
         self.notifications.filter(notifications_query).update(read=True)
 
+        user_id = self.pk
+        transaction.on_commit(lambda: load_unread_notifications_counts_for_users_with_ids(users_ids=[user_id]))
+
     def get_unread_notifications(self, max_id=None, types=None):
         notifications_query = Q(read=False)
 
@@ -2871,9 +3068,18 @@ class User(AbstractUser):
 
     def read_notification_with_id(self, notification_id):
         check_can_read_notification_with_id(user=self, notification_id=notification_id)
+
+        # Only discounted by the request which marked it as read
+        is_notification_read = self.notifications.filter(id=notification_id, read=False).update(read=True) == 1
+
         notification = self.notifications.get(id=notification_id)
-        notification.read = True
-        notification.save()
+
+        if is_notification_read:
+            user_id = self.pk
+            notification_type = notification.notification_type
+            transaction.on_commit(lambda: decrement_unread_notifications_count_for_user_with_id(
+                user_id=user_id, notification_type=notification_type))
+
         return notification
 
     def delete_notification_with_id(self, notification_id):
@@ -2981,12 +3187,12 @@ class User(AbstractUser):
         check_can_translate_comment_with_id(user=self, post_comment_id=post_comment_id)
         PostComment = get_post_comment_model()
         post_comment = PostComment.objects.get(pk=post_comment_id)
-        result = translation_strategy.translate_text(
+        translated_text = get_translated_text(
             source_language_code=post_comment.language.code,
             target_language_code=self.translation_language.code,
             text=post_comment.text
         )
-        return post_comment, result.get('translated_text')
+        return post_comment, translated_text
 
     def unsubscribe_from_user_notifications(self, user):
         UserNotificationsSubscription = get_user_notifications_subscription_model()
@@ -3055,6 +3261,8 @@ class User(AbstractUser):
         UserBlock = get_user_block_model()
         UserBlock.create_user_block(blocker_id=self.pk, blocked_user_id=user_id)
 
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
+
         return user_to_block
 
     def unblock_user_with_username(self, username):
@@ -3064,6 +3272,7 @@ class User(AbstractUser):
     def unblock_user_with_id(self, user_id):
         check_can_unblock_user_with_id(user=self, user_id=user_id)
         self.user_blocks.filter(blocked_user_id=user_id).delete()
+        self._refresh_timeline_posts_with_user_with_id(user_id=user_id)
         return User.objects.get(pk=user_id)
 
     def report_comment_with_id_for_post_with_uuid(self, post_comment_id, post_uuid, category_id, description=None):
@@ -3422,20 +3631,25 @@ class User(AbstractUser):
                                   circles__connections__target_connection__circles__isnull=False), Q.OR)
 
         posts_query.add(posts_circles_query, Q.AND)
-        posts_query.add(~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-            creator__user_blocks__blocked_user_id=self.pk)), Q.AND)
+        posts_query.add(make_exclude_blocked_posts_for_user_query(user=self), Q.AND)
 
         if max_id:
             posts_query.add(Q(id__lt=max_id), Q.AND)
 
-        posts_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        posts_query.add(make_exclude_reported_posts_for_user_query(user=self), Q.AND)
 
         return posts_query
 
+    def _get_authorization_context(self):
+        return get_authorization_context_for_user_with_id(user_id=self.pk)
+
     def _get_world_circle_id(self):
         Circle = get_circle_model()
         return Circle.get_world_circle().pk
 
+    def _refresh_timeline_posts_with_user_with_id(self, user_id):
+        enqueue_timeline_posts_job(refresh_timeline_posts_between_users, user_a_id=self.pk, user_b_id=user_id)
+
     def _get_default_connection_circles(self):
         """
         If no circles were given on a connection request or confirm,
@@ -3624,10 +3838,10 @@ class User(AbstractUser):
         community_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
         # Dont retrieve items we have reported
-        community_posts_query.add(~Q(moderated_object__reports__reporter_id=self.pk), Q.AND)
+        community_posts_query.add(make_exclude_reported_posts_for_user_query(user=self), Q.AND)
 
         # Only retrieve posts if we're not banned
-        community_posts_query.add(~Q(community__banned_users__id=self.pk), Q.AND)
+        community_posts_query.add(make_exclude_community_posts_banned_from_for_user_query(user=self), Q.AND)
 
         # Ensure public/private visibility is respected
         community_posts_visibility_query = Q(community__memberships__user__id=self.pk)
@@ -3641,16 +3855,15 @@ class User(AbstractUser):
             community_posts_query.add(Q(is_closed=False) | Q(creator_id=self.pk), Q.AND)
 
             # Don't retrieve posts of blocked users, except if they're staff members
-            blocked_users_query = ~Q(Q(creator__blocked_by_users__blocker_id=self.pk) | Q(
-                creator__user_blocks__blocked_user_id=self.pk))
-
-            blocked_users_query_staff_members = Q(creator__communities_memberships__community_id=community)
-            blocked_users_query_staff_members.add(Q(creator__communities_memberships__is_administrator=True) | Q(
-                creator__communities_memberships__is_moderator=True), Q.AND)
+            blocked_users_ids = self.get_blocked_with_users_ids()
 
-            blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
+            if blocked_users_ids:
+                blocked_users_query_staff_members = Q(creator__communities_memberships__community_id=community)
+                blocked_users_query_staff_members.add(Q(creator__communities_memberships__is_administrator=True) | Q(
+                    creator__communities_memberships__is_moderator=True), Q.AND)
 
-            community_posts_query.add(blocked_users_query, Q.AND)
+                community_posts_query.add(~Q(creator_id__in=blocked_users_ids) | blocked_users_query_staff_members,
+                                          Q.AND)
         else:
             if not include_closed_posts_for_staff:
                 community_posts_query.add(Q(is_closed=False), Q.AND)
@@ -3673,6 +3886,33 @@ def create_auth_token(sender, instance=None, created=False, **kwargs):
         bootstrap_user_auth_token(instance)
 
 
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='invalidate_auth_token_user')
+def invalidate_auth_token_user(sender, instance=None, created=False, **kwargs):
+    """
+    Invalidate the cached snapshot of users once they change, e.g. when soft deleted
+    """
+    if not created:
+        invalidate_auth_token_user_with_id(user_id=instance.pk)
+
+
+@receiver(post_delete, sender=Token, dispatch_uid='invalidate_auth_token')
+def invalidate_auth_token(sender, instance=None, **kwargs):
+    """
+    Invalidate the cached user of tokens once they are deleted, e.g. when reset on a password change
+    """
+    invalidate_auth_token_with_key(key=instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='bootstrap_unread_notifications_counts')
+def bootstrap_unread_notifications_counts(sender, instance=None, created=False, **kwargs):
+    """
+    Start the unread notifications counts of new users at zero once they are committed
+    """
+    if created:
+        user_id = instance.pk
+        transaction.on_commit(lambda: reset_unread_notifications_counts_for_user_with_id(user_id=user_id))
+
+
 @receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='bootstrap_user_circles')
 def bootstrap_circles(sender, instance=None, created=False, **kwargs):
     """"
@@ -3716,6 +3956,34 @@ class UserProfile(models.Model):
         return self.user.username
 
 
+@receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='update_user_search_tokens')
+def update_user_search_tokens(sender, instance=None, update_fields=None, **kwargs):
+    """
+    Index users by their username and profile name for the users searches
+    """
+    if update_fields is None or 'username' in update_fields:
+        update_search_tokens_for_user_with_id(user_id=instance.pk)
+
+
+@receiver(post_save, sender=UserProfile, dispatch_uid='update_user_profile_search_tokens')
+def update_user_profile_search_tokens(sender, instance=None, update_fields=None, **kwargs):
+    if update_fields is None or 'name' in update_fields:
+        update_search_tokens_for_user_with_id(user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL, dispatch_uid='delete_user_search_tokens')
+def delete_user_search_tokens(sender, instance=None, **kwargs):
+    delete_search_tokens_for_object_with_id(object_type=SearchToken.OBJECT_TYPE_USER, object_id=instance.pk)
+
+
+def update_search_tokens_for_user_with_id(user_id):
+    user_names = User.objects.filter(pk=user_id).values_list('username', 'profile__name').first()
+
+    if user_names:
+        update_search_tokens_for_object_with_id(object_type=SearchToken.OBJECT_TYPE_USER, object_id=user_id,
+                                                texts=user_names)
+
+
 class UserNotificationsSettings(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
                                 related_name='notifications_settings')
@@ -3808,6 +4076,17 @@ class UserBlock(models.Model):
         return cls.objects.filter(Q(blocked_user_id=user_a_id, blocker_id=user_b_id) | Q(blocked_user_id=user_b_id,
                                                                                          blocker_id=user_a_id)).exists()
 
+    @classmethod
+    def get_users_ids_blocked_with_user_with_id(cls, user_id, users_ids):
+        """
+        The ids of the given users blocking or blocked by the user
+        """
+        users_blocks = cls.objects.filter(Q(blocker_id=user_id, blocked_user_id__in=users_ids) | Q(
+            blocker_id__in=users_ids, blocked_user_id=user_id)).values_list('blocker_id', 'blocked_user_id')
+
+        return {blocked_user_id if blocker_id == user_id else blocker_id for blocker_id, blocked_user_id in
+                users_blocks}
+
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL, dispatch_uid='bootstrap_notifications_settings')
 def create_user_notifications_settings(sender, instance=None, created=False, **kwargs):
@@ -0,0 +1,127 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+
+from openbook_auth.authentication import CachedTokenAuthentication
+from openbook_auth.authorization_contexts import start_request_authorization_contexts, \
+    end_request_authorization_contexts
+from openbook_common.tests.helpers import make_user, make_authentication_headers_for_user, make_moderation_penalty
+from openbook_common.tests.models import OpenbookAPITestCase
+
+
+@override_settings(AUTH_TOKEN_CACHE_TIMEOUT=60, AUTH_TOKEN_LOCAL_CACHE_TIMEOUT=0)
+class CachedTokenAuthenticationTests(OpenbookAPITestCase):
+    """
+    CachedTokenAuthentication
+    """
+
+    def test_authenticates_cached_token_without_queries(self):
+        """
+        should authenticate a cached token without any query and load the user only when needed
+        """
+        user = make_user()
+        token_key = user.auth_token.key
+        authentication = CachedTokenAuthentication()
+
+        authentication.authenticate_credentials(key=token_key)
+
+        with CaptureQueriesContext(connection) as authenticate_queries:
+            authenticated_user, auth = authentication.authenticate_credentials(key=token_key)
+            self.assertEqual(authenticated_user.pk, user.pk)
+            self.assertEqual(authenticated_user.username, user.username)
+            self.assertTrue(authenticated_user.is_authenticated)
+
+        self.assertEqual(len(authenticate_queries), 0)
+
+        with CaptureQueriesContext(connection) as load_queries:
+            self.assertEqual(authenticated_user.email, user.email)
+
+        self.assertEqual(len(load_queries), 1)
+
+    def test_invalidates_cached_token_on_password_change(self):
+        """
+        should not authenticate a cached token once the password of its user changed
+        """
+        user = make_user()
+        token_key = user.auth_token.key
+        authentication = CachedTokenAuthentication()
+
+        authentication.authenticate_credentials(key=token_key)
+
+        user.update_password(password='aNewPassword123!')
+
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(key=token_key)
+
+        authenticated_user, auth = authentication.authenticate_credentials(key=user.auth_token.key)
+        self.assertEqual(authenticated_user.pk, user.pk)
+
+    @override_settings(AUTH_TOKEN_LOCAL_CACHE_TIMEOUT=60)
+    def test_invalidates_cached_user_on_soft_delete(self):
+        """
+        should refresh the cached user of a token once the user is soft deleted
+        """
+        user = make_user()
+        token_key = user.auth_token.key
+        authentication = CachedTokenAuthentication()
+
+        authenticated_user, auth = authentication.authenticate_credentials(key=token_key)
+        self.assertFalse(authenticated_user.is_deleted)
+
+        user.soft_delete()
+
+        authenticated_user, auth = authentication.authenticate_credentials(key=token_key)
+        self.assertTrue(authenticated_user.is_deleted)
+
+    @override_settings(AUTHORIZATION_CONTEXT_CACHE_TIMEOUT=60)
+    def test_checks_suspension_without_loading_user(self):
+        """
+        should answer whether the user of a cached token is suspended from the authorization context
+        """
+        user = make_user()
+        suspended_user = make_user()
+        suspension = make_moderation_penalty(user=suspended_user)
+        suspension.expiration = timezone.now() + timedelta(days=1)
+        suspension.save()
+        authentication = CachedTokenAuthentication()
+
+        request_authorization_contexts_token = start_request_authorization_contexts()
+
+        try:
+            authenticated_user, auth = authentication.authenticate_credentials(key=user.auth_token.key)
+            authenticated_suspended_user, auth = authentication.authenticate_credentials(
+                key=suspended_user.auth_token.key)
+
+            with CaptureQueriesContext(connection) as check_queries:
+                self.assertFalse(authenticated_user.is_suspended())
+                self.assertTrue(authenticated_suspended_user.is_suspended())
+        finally:
+            end_request_authorization_contexts(request_authorization_contexts_token)
+
+        self.assertFalse(any('"openbook_auth_user"' in query['sql'] for query in check_queries.captured_queries))
+
+    @override_settings(AUTHORIZATION_CONTEXT_CACHE_TIMEOUT=60)
+    def test_authenticated_get_queries(self):
+        """
+        should authenticate and authorize a typical GET without querying the token nor the suspension of its user
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        url = reverse('trending-posts-new')
+
+        self.client.get(url, **headers)
+
+        with CaptureQueriesContext(connection) as request_queries:
+            response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # The user, their reported and blocked content, their community bans and the trending posts
+        self.assertEqual(len(request_queries), 5)
+        self.assertEqual(len([query for query in request_queries.captured_queries if
+                              query['sql'].startswith('SELECT "openbook_auth_user"')]), 1)
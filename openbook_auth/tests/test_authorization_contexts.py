@@ -0,0 +1,70 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from openbook_auth.authorization_contexts import start_request_authorization_contexts, \
+    end_request_authorization_contexts
+from openbook_common.tests.helpers import make_user, make_community
+from openbook_common.tests.models import OpenbookAPITestCase
+
+
+class AuthorizationContextTests(OpenbookAPITestCase):
+    """
+    AuthorizationContext
+    """
+
+    def setUp(self):
+        super(AuthorizationContextTests, self).setUp()
+        self.request_authorization_contexts_token = start_request_authorization_contexts()
+
+    def tearDown(self):
+        end_request_authorization_contexts(self.request_authorization_contexts_token)
+        super(AuthorizationContextTests, self).tearDown()
+
+    def test_loads_community_roles_bans_and_suspension_once_per_request(self):
+        """
+        should answer the community roles, bans and suspension checks of a user with the queries of a single load
+        """
+        user = make_user()
+        communities = [make_community(creator=user) for i in range(0, 3)]
+
+        with CaptureQueriesContext(connection) as first_check_queries:
+            self.assertTrue(user.is_administrator_of_community_with_name(community_name=communities[0].name))
+
+        with CaptureQueriesContext(connection) as next_checks_queries:
+            for community in communities:
+                self.assertTrue(user.is_member_of_community_with_name(community_name=community.name))
+                self.assertTrue(user.is_staff_of_community_with_name(community_name=community.name))
+                self.assertFalse(user.is_moderator_of_community_with_name(community_name=community.name))
+                self.assertFalse(user.is_banned_from_community_with_name(community_name=community.name))
+            self.assertFalse(user.is_global_moderator())
+            self.assertFalse(user.is_suspended())
+
+        self.assertEqual(len(first_check_queries), 3)
+        self.assertEqual(len(next_checks_queries), 0)
+
+    def test_reloads_context_when_memberships_and_bans_change(self):
+        """
+        should reload the context of a user once they join, are made moderator of or are banned from a community
+        """
+        user = make_user()
+        community_creator = make_user()
+        community = make_community(creator=community_creator)
+
+        self.assertFalse(user.is_member_of_community_with_name(community_name=community.name))
+
+        user.join_community_with_name(community_name=community.name)
+
+        self.assertTrue(user.is_member_of_community_with_name(community_name=community.name))
+
+        community_creator.add_moderator_with_username_to_community_with_name(username=user.username,
+                                                                             community_name=community.name)
+
+        self.assertTrue(user.is_moderator_of_community_with_name(community_name=community.name))
+
+        other_user = make_user()
+        other_user.join_community_with_name(community_name=community.name)
+        community_creator.ban_user_with_username_from_community_with_name(username=other_user.username,
+                                                                         community_name=community.name)
+
+        self.assertFalse(other_user.is_member_of_community_with_name(community_name=community.name))
+        self.assertTrue(other_user.is_banned_from_community_with_name(community_name=community.name))
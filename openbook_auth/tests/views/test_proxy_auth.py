@@ -1,3 +1,6 @@
+from unittest.mock import patch
+
+from django.test import override_settings
 from django.urls import reverse
 from faker import Faker
 
@@ -104,5 +107,28 @@ class ProxyAuthAPITests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
 
+    @override_settings(PROXY_BLACKLISTED_DOMAINS_TIMEOUT=60 * 60, PROXY_BLACKLISTED_DOMAINS_VERSION_CHECK_INTERVAL=0)
+    def test_proxy_auth_disallows_domain_blacklisted_after_loading_blacklisted_domains(self):
+        """
+        should reload the blacklisted domains kept in memory once a domain is blacklisted and return 403
+        """
+        url = self._get_url()
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        domain = fake.domain_name()
+
+        headers['HTTP_X_PROXY_URL'] = 'https://%s' % domain
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        # The blacklisted domains are invalidated once the domain is committed, which tests never do
+        with patch('openbook_common.models.transaction.on_commit', side_effect=lambda func: func()):
+            make_proxy_blacklisted_domain(domain=domain)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
     def _get_url(self):
         return reverse('proxy-auth')
@@ -1,3 +1,4 @@
+from django.test import override_settings
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
@@ -132,6 +133,102 @@ class SearchUsersAPITests(OpenbookAPITestCase):
 
         self.assertEqual(0, len(parsed_reponse))
 
+    def test_orders_exact_and_prefix_matches_first(self):
+        """
+        should return the users matching the query exactly first, then the ones starting with it
+        """
+        containing_user = make_user(username='themarvin')
+
+        prefixed_user = make_user(name='Marvinho')
+
+        exact_user = make_user(username='marvin')
+
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        url = self._get_url()
+        response = self.client.get(url, {
+            'query': 'Marvin'
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        parsed_response = json.loads(response.content)
+
+        self.assertEqual([user['id'] for user in parsed_response],
+                         [exact_user.pk, prefixed_user.pk, containing_user.pk])
+
+    def test_short_query_matches_start_of_names(self):
+        """
+        should return the users whose username or name start with a query shorter than a trigram
+        """
+        prefixed_user = make_user(username='qzmarvin')
+        prefixed_name_user = make_user(name='Qzara')
+        make_user(username='marvinqz')
+
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        url = self._get_url()
+        response = self.client.get(url, {
+            'query': 'qz'
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        parsed_response = json.loads(response.content)
+
+        self.assertEqual({user['id'] for user in parsed_response}, {prefixed_user.pk, prefixed_name_user.pk})
+
+    @override_settings(SEARCH_TOKEN_MAX_OBJECTS_COUNT=0)
+    def test_query_with_common_trigrams_compares_names(self):
+        """
+        should return the users containing the query when its trigrams are too common to be looked up
+        """
+        user_to_search_for = make_user(username='themarvin')
+
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        url = self._get_url()
+        response = self.client.get(url, {
+            'query': 'marvin'
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        parsed_response = json.loads(response.content)
+
+        self.assertEqual([user['id'] for user in parsed_response], [user_to_search_for.pk])
+
+    def test_can_query_renamed_user(self):
+        """
+        should find users by their new username only once they are renamed
+        """
+        user_to_search_for = make_user(username='zebradancer')
+        user_to_search_for.username = 'kiwiflyer'
+        user_to_search_for.save()
+
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        url = self._get_url()
+
+        response = self.client.get(url, {
+            'query': 'zebra'
+        }, **headers)
+
+        self.assertEqual(len(json.loads(response.content)), 0)
+
+        response = self.client.get(url, {
+            'query': 'wiflye'
+        }, **headers)
+
+        parsed_response = json.loads(response.content)
+
+        self.assertEqual(len(parsed_response), 1)
+        self.assertEqual(parsed_response[0]['id'], user_to_search_for.pk)
+
     def _get_url(self):
         return reverse('search-users')
 
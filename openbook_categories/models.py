@@ -1,5 +1,7 @@
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.utils import timezone
 
 # Create your models here.
@@ -8,6 +10,8 @@ from django.utils.translation import ugettext_lazy as _
 
 from openbook_common.validators import hex_color_validator
 from openbook_communities.models import Community
+from openbook_communities.trending_communities import refresh_trending_community_with_id, \
+    remove_trending_communities_of_categories
 
 
 class Category(models.Model):
@@ -39,3 +43,25 @@ class Category(models.Model):
 
     def __str__(self):
         return 'Category: ' + self.name
+
+
+@receiver(m2m_changed, sender=Category.communities.through, dispatch_uid='update_categories_trending_communities')
+def update_categories_trending_communities(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear') or settings.TRENDING_COMMUNITIES_LEADERBOARD_SIZE <= 0:
+        return
+
+    if action == 'pre_clear':
+        pk_set = instance.categories.values_list('id', flat=True) if reverse else instance.communities.values_list(
+            'id', flat=True)
+
+    if reverse:
+        # Changed from the community side
+        communities_categories_ids = [(instance.pk, category_id) for category_id in pk_set]
+    else:
+        communities_categories_ids = [(community_id, instance.pk) for community_id in pk_set]
+
+    if action == 'post_add':
+        for community_id in {community_id for community_id, category_id in communities_categories_ids}:
+            refresh_trending_community_with_id(community_id=community_id)
+    else:
+        remove_trending_communities_of_categories(communities_categories_ids=communities_categories_ids)
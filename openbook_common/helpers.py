@@ -1,10 +1,13 @@
 import tempfile
+import time
+from hashlib import sha256
 from json import dumps
 
 import requests
 from langdetect import DetectorFactory
 from langdetect.lang_detect_exception import LangDetectException
 from django.conf import settings
+from django.core.cache import cache
 from urllib.parse import urlparse
 from urlextract import URLExtract
 
@@ -15,6 +18,15 @@ from openbook_translation import translation_strategy
 # seed the language detector
 DetectorFactory.seed = 0
 
+DETECTED_LANGUAGE_CODE_CACHE_KEY_PREFIX = 'detected_language_code:'
+# Cached for the texts in which no language was detected
+UNDETECTED_LANGUAGE_CODE = ''
+
+# Languages only change with their fixtures, they are kept in memory
+_languages_by_code = None
+_languages_by_code_loaded_at = None
+_url_extractor = None
+
 
 def get_detected_language_code(text):
     try:
@@ -25,12 +37,43 @@ def get_detected_language_code(text):
 
 
 def get_language_for_text(text):
-    language_code = get_detected_language_code(text)
-    Language = get_language_model()
-    if language_code is not None and Language.objects.filter(code=language_code).exists():
-        return Language.objects.get(code=language_code)
+    """
+    Detects the language of the text. The detected codes are cached by text hash and resolved with an
+    in-process map of the languages.
+    """
+    language_code = get_cached_detected_language_code(text)
+
+    if language_code is None:
+        return None
+
+    return get_language_with_code(language_code)
+
+
+def get_cached_detected_language_code(text):
+    # Too short for a meaningful detection, eg. emojis, numbers or a single word
+    if not text or sum(1 for character in text if character.isalpha()) < settings.LANGUAGE_DETECTION_MIN_TEXT_LETTERS:
+        return None
+
+    cache_key = '%s%s' % (DETECTED_LANGUAGE_CODE_CACHE_KEY_PREFIX, sha256(text.encode('utf-8')).hexdigest())
+    language_code = cache.get(cache_key)
 
-    return None
+    if language_code is None:
+        language_code = get_detected_language_code(text) or UNDETECTED_LANGUAGE_CODE
+        cache.set(cache_key, language_code, settings.LANGUAGE_DETECTION_CACHE_TIMEOUT)
+
+    return language_code or None
+
+
+def get_language_with_code(language_code):
+    global _languages_by_code, _languages_by_code_loaded_at
+
+    if _languages_by_code is None or \
+            time.monotonic() - _languages_by_code_loaded_at >= settings.LANGUAGES_MAP_TIMEOUT:
+        Language = get_language_model()
+        _languages_by_code = {language.code: language for language in Language.objects.all()}
+        _languages_by_code_loaded_at = time.monotonic()
+
+    return _languages_by_code.get(language_code)
 
 
 def get_supported_translation_language(language_code):
@@ -47,8 +90,7 @@ def extract_urls_from_string(text):
     URLs like www. are sanitised in the normalise_url
     """
     text = text.lower()
-    extractor = URLExtract(cache_dir=tempfile.gettempdir())
-    results = [url for url in extractor.gen_urls(text)]
+    results = [url for url in _get_url_extractor().gen_urls(text)]
     for url in results:
         scheme = urlparse(url).scheme
         if scheme and scheme != 'https' and scheme != 'http':
@@ -57,6 +99,16 @@ def extract_urls_from_string(text):
     return results
 
 
+def _get_url_extractor():
+    # Building the extractor loads the TLDs list, so a single one is reused
+    global _url_extractor
+
+    if _url_extractor is None:
+        _url_extractor = URLExtract(cache_dir=tempfile.gettempdir())
+
+    return _url_extractor
+
+
 def make_proxy_image_url(image_url):
     proxy_image_url = settings.PROXY_URL + image_url
 
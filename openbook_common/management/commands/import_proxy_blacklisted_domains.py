@@ -1,64 +1,152 @@
-import ipaddress
+import time
 from urllib.parse import urlparse
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from django.db import connection
 from tldextract import tldextract
 
 from openbook_common.models import ProxyBlacklistedDomain
-from openbook_common.utils.model_loaders import get_user_invite_model, get_badge_model
+from openbook_common.proxy_blacklisted_domains import invalidate_proxy_blacklisted_domains
 
 import logging
-from django.core.validators import URLValidator
-from django.core.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
 
-url_validator = URLValidator()
-
 
 class Command(BaseCommand):
     help = 'Imports a list of proxy blacklisted domains'
 
     def add_arguments(self, parser):
         parser.add_argument('--file', type=str, help='The file to import the blacklisted domains from')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='The amount of domains to diff and insert at once')
+        parser.add_argument('--sync', action='store_true',
+                            help='Also delete the blacklisted domains which are not in the file')
 
     def handle(self, *args, **options):
+        file_path = options.get('file', None)
+        batch_size = options.get('batch_size')
+        sync = options.get('sync')
+
+        started_at = time.monotonic()
 
+        read_lines = 0
         imported_domains = 0
         already_existing_domains = 0
-
-        file_path = options.get('file', None)
+        invalid_domains = 0
+        # Every domain in the file, to dedupe them and to know which ones to keep when syncing
+        file_domains = set()
+        batch = []
 
         with open(file_path, newline='') as file:
-            line = file.readline()
-
-            while line:
-                url = line
-                line = file.readline()
-
-                if not urlparse(url).scheme:
-                    url = 'http://' + line
-
-                # This uses a list of public suffixes
-                tld_extract_result = tldextract.extract(url)
-
-                if tld_extract_result.subdomain:
-                    url_full_domain = '.'.join(
-                        [tld_extract_result.subdomain, tld_extract_result.domain, tld_extract_result.suffix])
-                elif tld_extract_result.suffix:
-                    url_full_domain = '.'.join(
-                        [tld_extract_result.domain, tld_extract_result.suffix])
-                else:
-                    url_full_domain = tld_extract_result.domain
-
-                if ProxyBlacklistedDomain.objects.filter(domain=url_full_domain).exists():
-                    logger.info('Domain %s already exists, not importing.' % url_full_domain)
-                    already_existing_domains += 1
+            for line in file:
+                read_lines += 1
+                domain = normalize_domain(line)
+
+                if not domain or len(domain) > settings.PROXY_BLACKLIST_DOMAIN_MAX_LENGTH:
+                    invalid_domains += 1
+                    continue
+
+                if domain in file_domains:
                     continue
 
-                ProxyBlacklistedDomain.objects.create(domain=url_full_domain)
-                logger.info('Imported domain %s successfully.' % url_full_domain)
-                imported_domains += 1
+                file_domains.add(domain)
+                batch.append(domain)
+
+                if len(batch) >= batch_size:
+                    batch_imported_domains = import_domains(domains=batch)
+                    imported_domains += batch_imported_domains
+                    already_existing_domains += len(batch) - batch_imported_domains
+                    batch = []
+                    _log_progress(read_lines=read_lines, imported_domains=imported_domains, started_at=started_at)
+
+        if batch:
+            batch_imported_domains = import_domains(domains=batch)
+            imported_domains += batch_imported_domains
+            already_existing_domains += len(batch) - batch_imported_domains
+
+        deleted_domains = delete_domains_not_in(domains=file_domains, batch_size=batch_size) if sync else 0
+
+        if imported_domains or deleted_domains:
+            invalidate_proxy_blacklisted_domains()
+
+        elapsed_seconds = time.monotonic() - started_at
+
+        logger.info(
+            'Finished in %.2fs (%d lines/s). Imported %d domains, skipped %d as they already existed, '
+            '%d invalid lines and deleted %d domains' % (
+                elapsed_seconds, read_lines / max(elapsed_seconds, 0.001), imported_domains,
+                already_existing_domains, invalid_domains, deleted_domains))
+
+
+def normalize_domain(line):
+    url = line.strip().lower()
+
+    if not url:
+        return None
+
+    if not urlparse(url).scheme:
+        url = 'http://' + url
+
+    # This uses a list of public suffixes
+    tld_extract_result = tldextract.extract(url)
+
+    if tld_extract_result.subdomain:
+        return '.'.join([tld_extract_result.subdomain, tld_extract_result.domain, tld_extract_result.suffix])
+    elif tld_extract_result.suffix:
+        return '.'.join([tld_extract_result.domain, tld_extract_result.suffix])
+
+    return tld_extract_result.domain
+
+
+def import_domains(domains):
+    """
+    Inserts the domains which are not blacklisted yet, returns the amount of inserted domains
+    """
+    existing_domains = set(ProxyBlacklistedDomain.objects.filter(domain__in=domains).values_list('domain', flat=True))
+    new_domains = [ProxyBlacklistedDomain(domain=domain) for domain in domains if domain not in existing_domains]
+
+    ProxyBlacklistedDomain.objects.bulk_create(new_domains, ignore_conflicts=True)
+
+    return len(new_domains)
+
+
+def delete_domains_not_in(domains, batch_size):
+    """
+    Deletes the blacklisted domains which are not in the given ones, walking the table in chunks of ids
+    """
+    deleted_domains = 0
+    last_id = 0
+
+    while True:
+        blacklisted_domains = list(
+            ProxyBlacklistedDomain.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'domain')[
+            :batch_size])
+
+        if not blacklisted_domains:
+            break
+
+        last_id = blacklisted_domains[-1][0]
+        removed_domains_ids = [domain_id for domain_id, domain in blacklisted_domains if domain not in domains]
+
+        if removed_domains_ids:
+            deleted_domains += _delete_domains_with_ids(domains_ids=removed_domains_ids)
+
+    return deleted_domains
+
+
+def _delete_domains_with_ids(domains_ids):
+    # With post_delete receivers, Django would load the domains to send the signal for each of them, invalidating the
+    # blacklisted domains every time. They are invalidated once after the import and cacheops caches none of them.
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE id IN (%s)' % (
+            connection.ops.quote_name(ProxyBlacklistedDomain._meta.db_table), ', '.join(['%s'] * len(domains_ids))),
+                       domains_ids)
+        return cursor.rowcount
+
 
-            logger.info('Finished. Imported %d domains and skipped %d as they already existed' % (
-                imported_domains, already_existing_domains))
+def _log_progress(read_lines, imported_domains, started_at):
+    elapsed_seconds = time.monotonic() - started_at
+    logger.info('Read %d lines and imported %d domains in %.2fs (%d lines/s)' % (
+        read_lines, imported_domains, elapsed_seconds, read_lines / max(elapsed_seconds, 0.001)))
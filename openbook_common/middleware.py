@@ -3,6 +3,9 @@ import pytz
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
+from openbook_auth.authorization_contexts import start_request_authorization_contexts, \
+    end_request_authorization_contexts
+
 
 class TimezoneMiddleware(MiddlewareMixin):
     """
@@ -15,3 +18,20 @@ class TimezoneMiddleware(MiddlewareMixin):
             timezone.activate(pytz.timezone(tzname))
         else:
             timezone.deactivate()
+
+
+class AuthorizationContextMiddleware:
+    """
+    A middleware to load the authorization context of the users at most once per request
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = start_request_authorization_contexts()
+
+        try:
+            return self.get_response(request)
+        finally:
+            end_request_authorization_contexts(token)
@@ -0,0 +1,85 @@
+# Generated by Django 2.2.5 on 2026-10-18 21:46
+
+import unicodedata
+
+from django.db import migrations, models
+
+SEARCH_TOKENS_BATCH_SIZE = 1000
+
+SEARCH_TOKEN_LENGTH = 3
+
+
+# Copied from openbook_common.search at the time of this migration, so later changes don't affect it
+def make_search_tokens(*texts):
+    tokens = set()
+
+    for text in texts:
+        if not text:
+            continue
+
+        text = normalize_search_text(text)
+        tokens.update(text[i:i + SEARCH_TOKEN_LENGTH] for i in range(0, len(text) - SEARCH_TOKEN_LENGTH + 1))
+
+    return tokens
+
+
+def normalize_search_text(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(character for character in text if not unicodedata.combining(character)).lower()
+
+
+def populate_search_tokens(apps, schema_editor):
+    SearchToken = apps.get_model('openbook_common', 'SearchToken')
+    User = apps.get_model('openbook_auth', 'User')
+    Community = apps.get_model('openbook_communities', 'Community')
+    Hashtag = apps.get_model('openbook_hashtags', 'Hashtag')
+
+    objects_texts = (
+        ('U', User.objects.values_list('id', 'username', 'profile__name')),
+        ('C', Community.objects.values_list('id', 'name', 'title')),
+        ('H', Hashtag.objects.values_list('id', 'name')),
+    )
+
+    for object_type, objects in objects_texts:
+        search_tokens = []
+
+        for object_id, *texts in objects.iterator():
+            search_tokens.extend(SearchToken(object_type=object_type, object_id=object_id, token=token) for token in
+                                 make_search_tokens(*texts))
+
+            if len(search_tokens) >= SEARCH_TOKENS_BATCH_SIZE:
+                SearchToken.objects.bulk_create(search_tokens, ignore_conflicts=True)
+                search_tokens = []
+
+        SearchToken.objects.bulk_create(search_tokens, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_common', '0021_auto_20190917_1806'),
+        ('openbook_auth', '0051_auto_20191209_1338'),
+        ('openbook_communities', '0034_community_members_count'),
+        ('openbook_hashtags', '0002_hashtag_text_color'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('U', 'User'), ('C', 'Community'), ('H', 'Hashtag')], max_length=5)),
+                ('object_id', models.PositiveIntegerField()),
+                ('token', models.CharField(max_length=3)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchtoken',
+            index=models.Index(fields=['object_type', 'token', 'object_id'], name='openbook_co_object__0bf119_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchtoken',
+            unique_together={('object_type', 'object_id', 'token')},
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
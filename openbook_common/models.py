@@ -3,17 +3,39 @@
 from urllib.parse import urlparse
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 from django.db.models import QuerySet, Q, Count
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 # Create your views here.
 from openbook.settings import COLOR_ATTR_MAX_LENGTH
+from openbook_common.utils.model_loaders import get_post_reaction_emoji_count_model, \
+    get_post_comment_reaction_emoji_count_model
+from openbook_common.proxy_blacklisted_domains import is_domain_blacklisted, invalidate_proxy_blacklisted_domains
 from openbook_common.validators import hex_color_validator
 import tldextract
 
 
+class CounterFieldsMixin:
+    """
+    For models with counters updated with F expressions only. Saving an existing instance never writes back its
+    possibly stale COUNTER_FIELDS, nor the fields it was loaded without.
+    """
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            deferred_fields = self.get_deferred_fields()
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields if
+                                       not field.primary_key and field.name not in self.COUNTER_FIELDS and
+                                       field.attname not in deferred_fields]
+
+        return super(CounterFieldsMixin, self).save(*args, **kwargs)
+
+
 class EmojiGroup(models.Model):
     keyword = models.CharField(_('keyword'), max_length=32, blank=False, null=False)
     color = models.CharField(_('color'), max_length=COLOR_ATTR_MAX_LENGTH, blank=False, null=False,
@@ -47,33 +69,56 @@ class Emoji(models.Model):
 
     @classmethod
     def get_emoji_counts_for_post_comment_with_id(cls, post_comment_id, emoji_id=None, reactor_id=None):
-        emoji_query = Q(post_comment_reactions__post_comment_id=post_comment_id, )
+        if reactor_id:
+            emoji_query = Q(post_comment_reactions__post_comment_id=post_comment_id,
+                            post_comment_reactions__reactor_id=reactor_id)
 
-        if emoji_id:
-            emoji_query.add(Q(post_comment_reactions__emoji_id=emoji_id), Q.AND)
+            if emoji_id:
+                emoji_query.add(Q(post_comment_reactions__emoji_id=emoji_id), Q.AND)
 
-        if reactor_id:
-            emoji_query.add(Q(post_comment_reactions__reactor_id=reactor_id), Q.AND)
+            emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_comment_reactions')).distinct().order_by(
+                '-post_comment_reactions__count').cache().all()
 
-        emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_comment_reactions')).distinct().order_by(
-            '-post_comment_reactions__count').cache().all()
+            return [{'emoji': emoji, 'count': emoji.post_comment_reactions__count} for emoji in emojis]
 
-        return [{'emoji': emoji, 'count': emoji.post_comment_reactions__count} for emoji in emojis]
+        # Maintained on reaction writes, no aggregate needed
+        PostCommentReactionEmojiCount = get_post_comment_reaction_emoji_count_model()
 
-    @classmethod
-    def get_emoji_counts_for_post_with_id(cls, post_id, emoji_id=None, reactor_id=None):
-        emoji_query = Q(post_reactions__post_id=post_id, )
+        emoji_counts_query = Q(post_comment_id=post_comment_id, count__gt=0)
 
         if emoji_id:
-            emoji_query.add(Q(post_reactions__emoji_id=emoji_id), Q.AND)
+            emoji_counts_query.add(Q(emoji_id=emoji_id), Q.AND)
+
+        emoji_counts = PostCommentReactionEmojiCount.objects.select_related('emoji').filter(
+            emoji_counts_query).order_by('-count')
 
+        return [{'emoji': emoji_count.emoji, 'count': emoji_count.count} for emoji_count in emoji_counts]
+
+    @classmethod
+    def get_emoji_counts_for_post_with_id(cls, post_id, emoji_id=None, reactor_id=None):
         if reactor_id:
-            emoji_query.add(Q(post_reactions__reactor_id=reactor_id), Q.AND)
+            emoji_query = Q(post_reactions__post_id=post_id, post_reactions__reactor_id=reactor_id)
 
-        emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_reactions')).distinct().order_by(
-            '-post_reactions__count').cache().all()
+            if emoji_id:
+                emoji_query.add(Q(post_reactions__emoji_id=emoji_id), Q.AND)
 
-        return [{'emoji': emoji, 'count': emoji.post_reactions__count} for emoji in emojis]
+            emojis = Emoji.objects.filter(emoji_query).annotate(Count('post_reactions')).distinct().order_by(
+                '-post_reactions__count').cache().all()
+
+            return [{'emoji': emoji, 'count': emoji.post_reactions__count} for emoji in emojis]
+
+        # Maintained on reaction writes, no aggregate needed
+        PostReactionEmojiCount = get_post_reaction_emoji_count_model()
+
+        emoji_counts_query = Q(post_id=post_id, count__gt=0)
+
+        if emoji_id:
+            emoji_counts_query.add(Q(emoji_id=emoji_id), Q.AND)
+
+        emoji_counts = PostReactionEmojiCount.objects.select_related('emoji').filter(emoji_counts_query).order_by(
+            '-count')
+
+        return [{'emoji': emoji_count.emoji, 'count': emoji_count.count} for emoji_count in emoji_counts]
 
     def __str__(self):
         return 'Emoji: ' + self.keyword
@@ -131,4 +176,36 @@ class ProxyBlacklistedDomain(models.Model):
         # test.blogspot.com
         url_full_domain = '.'.join([tld_extract_result.subdomain, tld_extract_result.domain, tld_extract_result.suffix])
 
-        return cls.objects.filter(Q(domain=url_root_domain) | Q(domain=url_full_domain)).exists()
+        return is_domain_blacklisted(url_root_domain) or is_domain_blacklisted(url_full_domain)
+
+
+@receiver(post_save, sender=ProxyBlacklistedDomain, dispatch_uid='invalidate_saved_proxy_blacklisted_domain')
+@receiver(post_delete, sender=ProxyBlacklistedDomain, dispatch_uid='invalidate_deleted_proxy_blacklisted_domain')
+def invalidate_changed_proxy_blacklisted_domain(sender, **kwargs):
+    # Processes reloading the domains before the change is committed would keep the old ones
+    transaction.on_commit(invalidate_proxy_blacklisted_domains)
+
+
+class SearchToken(models.Model):
+    """
+    A trigram of the names an object is searched by, see openbook_common.search
+    """
+    OBJECT_TYPE_USER = 'U'
+    OBJECT_TYPE_COMMUNITY = 'C'
+    OBJECT_TYPE_HASHTAG = 'H'
+
+    OBJECT_TYPES = (
+        (OBJECT_TYPE_USER, 'User'),
+        (OBJECT_TYPE_COMMUNITY, 'Community'),
+        (OBJECT_TYPE_HASHTAG, 'Hashtag'),
+    )
+
+    object_type = models.CharField(max_length=5, choices=OBJECT_TYPES)
+    object_id = models.PositiveIntegerField()
+    token = models.CharField(max_length=settings.SEARCH_TOKEN_LENGTH)
+
+    class Meta:
+        unique_together = (('object_type', 'object_id', 'token'),)
+        indexes = [
+            models.Index(fields=['object_type', 'token', 'object_id']),
+        ]
@@ -0,0 +1,55 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from openbook_common.utils.model_loaders import get_proxy_blacklist_domain_model
+
+PROXY_BLACKLISTED_DOMAINS_VERSION_CACHE_KEY = 'proxy_blacklisted_domains_version'
+
+_blacklisted_domains = None
+_blacklisted_domains_version = None
+_blacklisted_domains_loaded_at = 0
+_blacklisted_domains_version_checked_at = 0
+
+
+def is_domain_blacklisted(domain):
+    """
+    Looks the domain up in the blacklisted domains kept in memory, they are reloaded from the database only when
+    their version in the cache changed
+    """
+    return domain in _get_blacklisted_domains()
+
+
+def invalidate_proxy_blacklisted_domains():
+    """
+    Makes every process reload the blacklisted domains on its next version check
+    """
+    cache.set(PROXY_BLACKLISTED_DOMAINS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def _get_blacklisted_domains():
+    global _blacklisted_domains, _blacklisted_domains_version, _blacklisted_domains_loaded_at, \
+        _blacklisted_domains_version_checked_at
+
+    now = time.monotonic()
+
+    if _blacklisted_domains is not None and now - _blacklisted_domains_loaded_at < settings.PROXY_BLACKLISTED_DOMAINS_TIMEOUT:
+        if now - _blacklisted_domains_version_checked_at < settings.PROXY_BLACKLISTED_DOMAINS_VERSION_CHECK_INTERVAL:
+            return _blacklisted_domains
+
+        _blacklisted_domains_version_checked_at = now
+
+        if cache.get(PROXY_BLACKLISTED_DOMAINS_VERSION_CACHE_KEY) == _blacklisted_domains_version:
+            return _blacklisted_domains
+
+    # The version is read before the domains, so a change made while loading them triggers another load
+    version = cache.get(PROXY_BLACKLISTED_DOMAINS_VERSION_CACHE_KEY)
+
+    ProxyBlacklistedDomain = get_proxy_blacklist_domain_model()
+    _blacklisted_domains = frozenset(ProxyBlacklistedDomain.objects.values_list('domain', flat=True))
+    _blacklisted_domains_version = version
+    _blacklisted_domains_loaded_at = _blacklisted_domains_version_checked_at = time.monotonic()
+
+    return _blacklisted_domains
@@ -0,0 +1,171 @@
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Count, Case, When, Value, IntegerField
+
+from openbook_common.utils.model_loaders import get_search_token_model
+
+SEARCH_RANK_EXACT = 0
+SEARCH_RANK_PREFIX = 1
+SEARCH_RANK_CONTAINS = 2
+
+SEARCH_TOKEN_OBJECTS_COUNT_CACHE_KEY_PREFIX = 'search_token_objects_count:'
+
+
+def make_search_query(object_type, query, fields):
+    """
+    Returns a query for the objects with any of the fields containing the search query. Search queries with trigrams
+    first narrow the objects down to the ones with all of their selective trigrams in their search tokens, through an
+    index, so the fields are only compared for those. Shorter search queries match the start of the fields, which are
+    indexed.
+    """
+    query_tokens = make_search_tokens(query)
+
+    if not query_tokens:
+        prefix_query = Q()
+
+        for field in fields:
+            prefix_query.add(Q(**{'%s__istartswith' % field: query}), Q.OR)
+
+        return prefix_query
+
+    fields_query = Q()
+
+    for field in fields:
+        fields_query.add(Q(**{'%s__icontains' % field: query}), Q.OR)
+
+    query_tokens = _get_selective_search_tokens(object_type=object_type, tokens=query_tokens)
+
+    if not query_tokens:
+        return fields_query
+
+    SearchToken = get_search_token_model()
+
+    # The tokens of all the fields are matched together, the fields query keeps the results exact
+    matching_objects_ids = SearchToken.objects.filter(object_type=object_type, token__in=query_tokens).order_by() \
+        .values('object_id').annotate(tokens_count=Count('id')).filter(tokens_count=len(query_tokens)) \
+        .values('object_id')
+
+    search_query = Q(id__in=matching_objects_ids)
+    search_query.add(fields_query, Q.AND)
+
+    return search_query
+
+
+def order_by_search_rank(queryset, query, fields):
+    """
+    Orders the objects matching any of the fields exactly first, then the ones starting with the search query.
+    Search queries without trigrams are left unordered, ordering them would read all of their matches.
+    """
+    if not make_search_tokens(query):
+        return queryset
+
+    exact_query = Q()
+    prefix_query = Q()
+
+    for field in fields:
+        exact_query.add(Q(**{'%s__iexact' % field: query}), Q.OR)
+        prefix_query.add(Q(**{'%s__istartswith' % field: query}), Q.OR)
+
+    search_rank = Case(
+        When(exact_query, then=Value(SEARCH_RANK_EXACT)),
+        When(prefix_query, then=Value(SEARCH_RANK_PREFIX)),
+        default=Value(SEARCH_RANK_CONTAINS),
+        output_field=IntegerField()
+    )
+
+    return queryset.annotate(search_rank=search_rank).order_by('search_rank')
+
+
+def make_search_tokens(*texts):
+    """
+    Returns the trigrams of the texts, a text can only contain a search query with all of the query trigrams
+    """
+    tokens = set()
+    token_length = settings.SEARCH_TOKEN_LENGTH
+
+    for text in texts:
+        if not text:
+            continue
+
+        text = normalize_search_text(text)
+        tokens.update(text[i:i + token_length] for i in range(0, len(text) - token_length + 1))
+
+    return tokens
+
+
+def normalize_search_text(text):
+    # Accents are dropped as the case insensitive collations of MySQL ignore them when comparing
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(character for character in text if not unicodedata.combining(character)).lower()
+
+
+def update_search_tokens_for_object_with_id(object_type, object_id, texts):
+    """
+    Replaces the search tokens of the object with the ones of the given texts, only changed tokens are written
+    """
+    SearchToken = get_search_token_model()
+
+    tokens = make_search_tokens(*texts)
+    object_tokens = SearchToken.objects.filter(object_type=object_type, object_id=object_id)
+    existing_tokens = set(object_tokens.values_list('token', flat=True))
+
+    stale_tokens = existing_tokens - tokens
+    if stale_tokens:
+        object_tokens.filter(token__in=stale_tokens).delete()
+
+    new_tokens = tokens - existing_tokens
+    if new_tokens:
+        # Tokens added meanwhile by a concurrent save are skipped
+        SearchToken.objects.bulk_create(
+            [SearchToken(object_type=object_type, object_id=object_id, token=token) for token in new_tokens],
+            ignore_conflicts=True)
+
+
+def create_search_tokens_for_objects(object_type, objects_texts):
+    """
+    Creates the search tokens of new objects in one query, given as a list of (object_id, texts)
+    """
+    SearchToken = get_search_token_model()
+
+    search_tokens = [SearchToken(object_type=object_type, object_id=object_id, token=token)
+                     for object_id, texts in objects_texts
+                     for token in make_search_tokens(*texts)]
+
+    if search_tokens:
+        SearchToken.objects.bulk_create(search_tokens, ignore_conflicts=True)
+
+
+def delete_search_tokens_for_object_with_id(object_type, object_id):
+    SearchToken = get_search_token_model()
+    SearchToken.objects.filter(object_type=object_type, object_id=object_id).delete()
+
+
+def _get_selective_search_tokens(object_type, tokens):
+    # Matching the tokens of too many objects reads more rows than comparing the fields of every object
+    SearchToken = get_search_token_model()
+    max_objects_count = settings.SEARCH_TOKEN_MAX_OBJECTS_COUNT
+
+    cache_keys = {token: '%s%s:%s' % (SEARCH_TOKEN_OBJECTS_COUNT_CACHE_KEY_PREFIX, object_type,
+                                      token.encode('utf-8').hex()) for token in tokens}
+    objects_counts = cache.get_many(cache_keys.values())
+    new_objects_counts = {}
+    selective_tokens = set()
+
+    for token, cache_key in cache_keys.items():
+        objects_count = objects_counts.get(cache_key)
+
+        if objects_count is None:
+            # Only counted up to the limit
+            objects_count = SearchToken.objects.filter(object_type=object_type, token=token)[
+                            :max_objects_count + 1].count()
+            new_objects_counts[cache_key] = objects_count
+
+        if objects_count <= max_objects_count:
+            selective_tokens.add(token)
+
+    if new_objects_counts and settings.SEARCH_TOKEN_OBJECTS_COUNT_CACHE_TIMEOUT > 0:
+        cache.set_many(new_objects_counts, settings.SEARCH_TOKEN_OBJECTS_COUNT_CACHE_TIMEOUT)
+
+    return selective_tokens
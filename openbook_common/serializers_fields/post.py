@@ -5,6 +5,11 @@ from openbook_communities.models import CommunityMembership
 from openbook_posts.models import PostReaction, PostCommentReaction
 
 
+def is_preloaded_post(context, post):
+    # See openbook_posts.helpers.make_posts_serializer_context
+    return post.pk in context.get('preloaded_posts_ids', ())
+
+
 class ReactionField(Field):
     def __init__(self, reaction_serializer=None, **kwargs):
         kwargs['source'] = '*'
@@ -19,11 +24,16 @@ class ReactionField(Field):
         serialized_reaction = None
 
         if not request_user.is_anonymous:
-            try:
-                reaction = request_user.get_reaction_for_post_with_id(post.pk)
-                serialized_reaction = self.reaction_serializer(reaction, context={'request': request}).data
-            except PostReaction.DoesNotExist:
-                pass
+            if is_preloaded_post(context=self.context, post=post):
+                reaction = self.context['posts_reactions'].get(post.pk)
+                if reaction:
+                    serialized_reaction = self.reaction_serializer(reaction, context={'request': request}).data
+            else:
+                try:
+                    reaction = request_user.get_reaction_for_post_with_id(post.pk)
+                    serialized_reaction = self.reaction_serializer(reaction, context={'request': request}).data
+                except PostReaction.DoesNotExist:
+                    pass
 
         return serialized_reaction
 
@@ -42,11 +52,14 @@ class CommentsCountField(Field):
 
         if request_user.is_anonymous:
             comments_count = post.count_comments()
+        elif is_preloaded_post(context=self.context, post=post):
+            comments_count = self.context['posts_comments_counts'].get(post.pk, 0)
         else:
             comments_count = request_user.get_comments_count_for_post(post=post)
 
         return comments_count
 
+
 class PostReactionsEmojiCountField(Field):
     def __init__(self, emoji_count_serializer=None, **kwargs):
         kwargs['source'] = '*'
@@ -64,6 +77,8 @@ class PostReactionsEmojiCountField(Field):
             if post.public_reactions:
                 Post = get_post_model()
                 reaction_emoji_count = Post.get_emoji_counts_for_post_with_id(post.pk)
+        elif is_preloaded_post(context=self.context, post=post):
+            reaction_emoji_count = self.context['posts_reactions_emoji_counts'].get(post.pk, [])
         else:
             reaction_emoji_count = request_user.get_emoji_counts_for_post_with_id(post.pk)
 
@@ -109,7 +124,11 @@ class PostCreatorField(Field):
 
         if post_community:
             try:
-                post_creator_membership = post_community.memberships.get(user_id=post_creator.pk)
+                if is_preloaded_post(context=self.context, post=post):
+                    post_creator_membership = self.context['communities_memberships'][
+                        (post_community.pk, post_creator.pk)]
+                else:
+                    post_creator_membership = post_community.memberships.get(user_id=post_creator.pk)
                 post_creator_serializer['communities_memberships'] = [
                     self.community_membership_serializer(
                         post_creator_membership,
@@ -117,7 +136,7 @@ class PostCreatorField(Field):
                         context={
                             "request": request}).data
                 ]
-            except CommunityMembership.DoesNotExist:
+            except (CommunityMembership.DoesNotExist, KeyError):
                 pass
 
         return post_creator_serializer
@@ -136,7 +155,10 @@ class PostIsMutedField(Field):
         is_muted = False
 
         if not request_user.is_anonymous:
-            is_muted = request_user.has_muted_post_with_id(post_id=post.pk)
+            if is_preloaded_post(context=self.context, post=post):
+                is_muted = post.pk in self.context['muted_posts_ids']
+            else:
+                is_muted = request_user.has_muted_post_with_id(post_id=post.pk)
 
         return is_muted
 
@@ -154,6 +176,9 @@ class IsEncircledField(Field):
         is_encircled = False
 
         if not request_user.is_anonymous:
-            is_encircled = post.is_encircled_post()
+            if is_preloaded_post(context=self.context, post=post):
+                is_encircled = not post.community_id and post.pk not in self.context['public_posts_ids']
+            else:
+                is_encircled = post.is_encircled_post()
 
         return is_encircled
@@ -4,6 +4,11 @@ from openbook_common.utils.model_loaders import get_post_comment_model
 from openbook_posts.models import PostCommentReaction
 
 
+def is_preloaded_post_comment(context, post_comment):
+    # See openbook_posts.helpers.make_post_comments_serializer_context
+    return post_comment.pk in context.get('preloaded_post_comments_ids', ())
+
+
 class PostCommenterField(Field):
     def __init__(self, community_membership_serializer, post_commenter_serializer, **kwargs):
         kwargs['source'] = '*'
@@ -21,7 +26,12 @@ class PostCommenterField(Field):
         post_commenter_serializer = self.post_commenter_serializer(post_commenter, context={"request": request}).data
 
         if post_community:
-            post_creator_memberships = post_community.memberships.filter(user=post_commenter).all()
+            if is_preloaded_post_comment(context=self.context, post_comment=post_comment):
+                post_creator_membership = self.context['communities_memberships'].get(
+                    (post_community.pk, post_commenter.pk))
+                post_creator_memberships = [post_creator_membership] if post_creator_membership else []
+            else:
+                post_creator_memberships = post_community.memberships.filter(user=post_commenter).all()
             post_commenter_serializer['communities_memberships'] = self.community_membership_serializer(
                 post_creator_memberships,
                 many=True,
@@ -43,6 +53,8 @@ class RepliesCountField(Field):
 
         if request_user.is_anonymous:
             replies_count = post_comment.count_replies()
+        elif is_preloaded_post_comment(context=self.context, post_comment=post_comment):
+            replies_count = self.context['post_comments_replies_counts'].get(post_comment.pk, 0)
         else:
             replies_count = request_user.get_replies_count_for_post_comment(post_comment=post_comment)
 
@@ -63,6 +75,8 @@ class PostCommentReactionsEmojiCountField(Field):
         if request_user.is_anonymous:
             PostComment = get_post_comment_model()
             reaction_emoji_count = PostComment.get_emoji_counts_for_post_comment_with_id(post_comment.pk)
+        elif is_preloaded_post_comment(context=self.context, post_comment=post_comment):
+            reaction_emoji_count = self.context['post_comments_reactions_emoji_counts'].get(post_comment.pk, [])
         else:
             reaction_emoji_count = request_user.get_emoji_counts_for_post_comment(post_comment=post_comment)
 
@@ -87,12 +101,18 @@ class PostCommentReactionField(Field):
         serialized_commentReaction = None
 
         if not request_user.is_anonymous:
-            try:
-                comment_reaction = request_user.get_reaction_for_post_comment_with_id(post_comment.pk)
-                serialized_commentReaction = self.comment_reaction_serializer(comment_reaction,
-                                                                              context={'request': request}).data
-            except PostCommentReaction.DoesNotExist:
-                pass
+            if is_preloaded_post_comment(context=self.context, post_comment=post_comment):
+                comment_reaction = self.context['post_comments_reactions'].get(post_comment.pk)
+                if comment_reaction:
+                    serialized_commentReaction = self.comment_reaction_serializer(comment_reaction,
+                                                                                  context={'request': request}).data
+            else:
+                try:
+                    comment_reaction = request_user.get_reaction_for_post_comment_with_id(post_comment.pk)
+                    serialized_commentReaction = self.comment_reaction_serializer(comment_reaction,
+                                                                                  context={'request': request}).data
+                except PostCommentReaction.DoesNotExist:
+                    pass
 
         return serialized_commentReaction
 
@@ -110,6 +130,9 @@ class PostCommentIsMutedField(Field):
         is_muted = False
 
         if not request_user.is_anonymous:
-            is_muted = request_user.has_muted_post_comment_with_id(post_comment_id=post_comment.pk)
+            if is_preloaded_post_comment(context=self.context, post_comment=post_comment):
+                is_muted = post_comment.pk in self.context['muted_post_comments_ids']
+            else:
+                is_muted = request_user.has_muted_post_comment_with_id(post_comment_id=post_comment.pk)
 
         return is_muted
@@ -7,6 +7,9 @@ class OpenbookAPITestCase(APITestCase):
     def setUp(self):
         self.patcher = patch('openbook_notifications.helpers._send_notification_to_user')
         self.mock_foo = self.patcher.start()
+        self.users_patcher = patch('openbook_notifications.helpers._send_notification_to_users')
+        self.mock_send_notification_to_users = self.users_patcher.start()
 
     def tearDown(self):
         self.patcher.stop()
+        self.users_patcher.stop()
@@ -1,4 +1,5 @@
 import colorsys
+import operator
 import os
 import random
 import re
@@ -7,6 +8,7 @@ import tempfile
 
 import magic
 import spectra
+from django.db import connections
 from django.http import QueryDict
 from imagekit.utils import get_cache
 from imagekit.models import ProcessedImageField
@@ -143,3 +145,21 @@ def write_in_memory_file_to_disk(in_memory_file):
     tmp_file.seek(0)
     tmp_file.close()
     return tmp_file
+
+
+def get_union_of_querysets(querysets, order_by):
+    """
+    Evaluates the sliced querysets of a model in a single UNION ALL query where the database supports it and in a
+    query each otherwise. Returns their objects sorted by the order_by field name, prefixed by - to sort descending.
+    """
+    if not querysets:
+        return []
+
+    first_queryset = querysets[0]
+
+    if len(querysets) > 1 and connections[first_queryset.db].features.supports_slicing_ordering_in_compound:
+        objects = list(first_queryset.union(*querysets[1:], all=True))
+    else:
+        objects = [obj for queryset in querysets for obj in queryset]
+
+    return sorted(objects, key=operator.attrgetter(order_by.lstrip('-')), reverse=order_by.startswith('-'))
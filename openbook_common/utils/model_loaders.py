@@ -17,6 +17,14 @@ def get_post_model():
     return apps.get_model('openbook_posts.Post')
 
 
+def get_post_image_model():
+    return apps.get_model('openbook_posts.PostImage')
+
+
+def get_post_video_model():
+    return apps.get_model('openbook_posts.PostVideo')
+
+
 def get_top_post_model():
     return apps.get_model('openbook_posts.TopPost')
 
@@ -25,6 +33,10 @@ def get_trending_post_model():
     return apps.get_model('openbook_posts.TrendingPost')
 
 
+def get_timeline_post_model():
+    return apps.get_model('openbook_posts.TimelinePost')
+
+
 def get_top_post_community_exclusion_model():
     return apps.get_model('openbook_posts.TopPostCommunityExclusion')
 
@@ -41,6 +53,10 @@ def get_proxy_blacklist_domain_model():
     return apps.get_model('openbook_common.ProxyBlacklistedDomain')
 
 
+def get_search_token_model():
+    return apps.get_model('openbook_common.SearchToken')
+
+
 def get_post_user_mention_model():
     return apps.get_model('openbook_posts.PostUserMention')
 
@@ -93,6 +109,14 @@ def get_post_comment_reaction_model():
     return apps.get_model('openbook_posts.PostCommentReaction')
 
 
+def get_post_reaction_emoji_count_model():
+    return apps.get_model('openbook_posts.PostReactionEmojiCount')
+
+
+def get_post_comment_reaction_emoji_count_model():
+    return apps.get_model('openbook_posts.PostCommentReactionEmojiCount')
+
+
 def get_emoji_model():
     return apps.get_model('openbook_common.Emoji')
 
@@ -0,0 +1,12 @@
+from django_rq import job
+
+from openbook_communities import trending_communities
+
+
+@job('low')
+def rebuild_trending_communities():
+    """
+    This job should be scheduled to rebuild the trending communities leaderboards. This brings back the communities
+    dropped from a full leaderboard which now have more members than the communities left in it.
+    """
+    trending_communities.rebuild_trending_communities()
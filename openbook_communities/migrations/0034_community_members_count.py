@@ -0,0 +1,31 @@
+# Generated by Django 2.2.5 on 2026-10-18 21:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Count, IntegerField
+from django.db.models.functions import Coalesce
+
+
+def populate_community_members_count(apps, schema_editor):
+    Community = apps.get_model('openbook_communities', 'Community')
+    CommunityMembership = apps.get_model('openbook_communities', 'CommunityMembership')
+
+    members_count = CommunityMembership.objects.filter(community_id=OuterRef('pk')).order_by().values(
+        'community_id').annotate(count=Count('id')).values('count')
+
+    Community.objects.update(members_count=Coalesce(Subquery(members_count, output_field=IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_communities', '0033_auto_20191209_1337'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='community',
+            name='members_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(populate_community_members_count, migrations.RunPython.noop),
+    ]
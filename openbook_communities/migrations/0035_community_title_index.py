@@ -0,0 +1,18 @@
+# Generated by Django 2.2.5 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_communities', '0034_community_members_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='community',
+            name='title',
+            field=models.CharField(db_index=True, max_length=32, verbose_name='title'),
+        ),
+    ]
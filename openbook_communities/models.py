@@ -4,11 +4,13 @@ from django.db import models
 
 # Create your models here.
 from django.utils import timezone
-from django.db.models import Q
-from django.db.models import Count
+from django.db.models import Q, F
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from pilkit.processors import ResizeToFill, ResizeToFit
 
 from openbook.settings import COLOR_ATTR_MAX_LENGTH
+from openbook_auth.authorization_contexts import invalidate_authorization_contexts_for_users_with_ids
 from openbook_auth.models import User
 from django.utils.translation import ugettext_lazy as _
 
@@ -16,23 +18,29 @@ from openbook_common.utils.model_loaders import get_community_invite_model, \
     get_community_log_model, get_category_model, get_user_model, get_moderated_object_model, \
     get_community_notifications_subscription_model, get_community_new_post_notification_model, \
     get_community_invite_notification_model
+from openbook_common.models import SearchToken, CounterFieldsMixin
+from openbook_common.search import make_search_query, order_by_search_rank, update_search_tokens_for_object_with_id, \
+    delete_search_tokens_for_object_with_id
 from openbook_common.validators import hex_color_validator
 from openbook_communities.helpers import upload_to_community_avatar_directory, upload_to_community_cover_directory
 from openbook_communities.queries import make_search_communities_query_for_user, \
-    make_search_joined_communities_query_for_user, make_get_joined_communities_query_for_user
+    make_search_joined_communities_query_for_user, make_get_joined_communities_query_for_user, \
+    SEARCH_COMMUNITIES_FIELDS
+from openbook_communities.trending_communities import get_trending_communities_ids, refresh_trending_community_with_id
 from openbook_communities.validators import community_name_characters_validator
 from openbook_moderation.models import ModeratedObject, ModerationCategory
 from openbook_posts.models import Post
 from imagekit.models import ProcessedImageField
 
 
-class Community(models.Model):
+class Community(CounterFieldsMixin, models.Model):
     moderated_object = GenericRelation(ModeratedObject, related_query_name='communities')
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_communities', null=False,
                                 blank=False)
     name = models.CharField(_('name'), max_length=settings.COMMUNITY_NAME_MAX_LENGTH, blank=False, null=False,
                             unique=True, validators=(community_name_characters_validator,))
-    title = models.CharField(_('title'), max_length=settings.COMMUNITY_TITLE_MAX_LENGTH, blank=False, null=False, )
+    title = models.CharField(_('title'), max_length=settings.COMMUNITY_TITLE_MAX_LENGTH, blank=False, null=False,
+                             db_index=True)
     description = models.CharField(_('description'), max_length=settings.COMMUNITY_DESCRIPTION_MAX_LENGTH, blank=False,
                                    null=True, )
     rules = models.TextField(_('rules'), max_length=settings.COMMUNITY_RULES_MAX_LENGTH, blank=False,
@@ -66,6 +74,9 @@ class Community(models.Model):
         _('is deleted'),
         default=False,
     )
+    members_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+
+    COUNTER_FIELDS = ('members_count',)
 
     class Meta:
         verbose_name_plural = 'communities'
@@ -122,9 +133,10 @@ class Community(models.Model):
 
     @classmethod
     def search_communities_with_query_for_user(cls, query, user, excluded_from_profile_posts=True):
-        query = make_search_communities_query_for_user(query=query, user=user,
-                                                       excluded_from_profile_posts=excluded_from_profile_posts)
-        return cls.objects.filter(query)
+        communities_query = make_search_communities_query_for_user(
+            query=query, user=user, excluded_from_profile_posts=excluded_from_profile_posts)
+        return order_by_search_rank(cls.objects.filter(communities_query), query=query,
+                                    fields=SEARCH_COMMUNITIES_FIELDS)
 
     @classmethod
     def search_joined_communities_with_query_for_user(cls, query, user, excluded_from_profile_posts=True):
@@ -156,8 +168,7 @@ class Community(models.Model):
 
     @classmethod
     def _get_trending_communities_with_query(cls, query):
-        return cls.objects.annotate(Count('memberships')).filter(query).order_by(
-            '-memberships__count', '-created')
+        return cls.objects.filter(query).order_by('-members_count', '-created')
 
     @classmethod
     def _make_trending_communities_query(cls, category_name=None):
@@ -166,8 +177,23 @@ class Community(models.Model):
         if category_name:
             trending_communities_query.add(Q(categories__name=category_name), Q.AND)
 
+        # Only look up the communities at the top of the leaderboards, when enabled
+        trending_communities_ids = get_trending_communities_ids(category_name=category_name)
+
+        if trending_communities_ids is not None:
+            trending_communities_query.add(Q(id__in=trending_communities_ids), Q.AND)
+
         return trending_communities_query
 
+    @classmethod
+    def update_members_count_of_community_with_id(cls, community_id, value):
+        counter_query = Q(pk=community_id)
+
+        if value < 0:
+            counter_query.add(Q(members_count__gte=-value), Q.AND)
+
+        cls.objects.filter(counter_query).update(members_count=F('members_count') + value)
+
     @classmethod
     def create_community(cls, name, title, creator, color, type=None, user_adjective=None, users_adjective=None,
                          avatar=None, cover=None, description=None, rules=None, categories_names=None,
@@ -218,8 +244,7 @@ class Community(models.Model):
     def search_community_with_name_members(cls, community_name, query, exclude_keywords=None):
         db_query = Q(communities_memberships__community__name=community_name)
 
-        community_members_query = Q(communities_memberships__user__username__icontains=query)
-        community_members_query.add(Q(communities_memberships__user__profile__name__icontains=query), Q.OR)
+        community_members_query = cls._make_search_community_members_names_query(query=query)
 
         db_query.add(community_members_query, Q.AND)
 
@@ -230,6 +255,12 @@ class Community(models.Model):
 
         return User.objects.filter(db_query)
 
+    @classmethod
+    def _make_search_community_members_names_query(cls, query):
+        return make_search_query(object_type=SearchToken.OBJECT_TYPE_USER, query=query,
+                                 fields=('communities_memberships__user__username',
+                                         'communities_memberships__user__profile__name'))
+
     @classmethod
     def _get_exclude_members_query_for_keywords(cls, exclude_keywords):
         query = Q()
@@ -257,8 +288,7 @@ class Community(models.Model):
         db_query = Q(communities_memberships__community__name=community_name,
                      communities_memberships__is_administrator=True)
 
-        community_members_query = Q(communities_memberships__user__username__icontains=query)
-        community_members_query.add(Q(communities_memberships__user__profile__name__icontains=query), Q.OR)
+        community_members_query = cls._make_search_community_members_names_query(query=query)
 
         db_query.add(community_members_query, Q.AND)
 
@@ -279,8 +309,7 @@ class Community(models.Model):
         db_query = Q(communities_memberships__community__name=community_name,
                      communities_memberships__is_moderator=True)
 
-        community_members_query = Q(communities_memberships__user__username__icontains=query)
-        community_members_query.add(Q(communities_memberships__user__profile__name__icontains=query), Q.OR)
+        community_members_query = cls._make_search_community_members_names_query(query=query)
 
         db_query.add(community_members_query, Q.AND)
 
@@ -299,14 +328,10 @@ class Community(models.Model):
     @classmethod
     def search_community_with_name_banned_users(cls, community_name, query):
         community = Community.objects.get(name=community_name)
-        community_banned_users_query = Q(username__icontains=query)
-        community_banned_users_query.add(Q(profile__name__icontains=query), Q.OR)
+        community_banned_users_query = make_search_query(object_type=SearchToken.OBJECT_TYPE_USER, query=query,
+                                                         fields=User.SEARCH_USERS_FIELDS)
         return community.banned_users.filter(community_banned_users_query)
 
-    @property
-    def members_count(self):
-        return self.memberships.all().count()
-
     def get_staff_members(self):
         User = get_user_model()
         staff_members_query = Q(communities_memberships__community_id=self.pk)
@@ -321,6 +346,8 @@ class Community(models.Model):
                user_adjective=None,
                users_adjective=None, rules=None, categories_names=None, invites_enabled=None):
 
+        is_renamed = name and name.lower() != self.name
+
         if name:
             self.name = name.lower()
 
@@ -353,6 +380,12 @@ class Community(models.Model):
 
         self.save()
 
+        if is_renamed:
+            # The authorization contexts refer to communities by name
+            users_ids = set(self.memberships.values_list('user_id', flat=True))
+            users_ids.update(self.banned_users.values_list('id', flat=True))
+            invalidate_authorization_contexts_for_users_with_ids(users_ids=users_ids)
+
     def add_moderator(self, user):
         user_membership = self.memberships.get(user=user)
         user_membership.is_moderator = True
@@ -553,6 +586,76 @@ class CommunityMembership(models.Model):
         return super(CommunityMembership, self).save(*args, **kwargs)
 
 
+@receiver(post_save, sender=CommunityMembership, dispatch_uid='invalidate_saved_membership_authorization_context')
+@receiver(post_delete, sender=CommunityMembership, dispatch_uid='invalidate_deleted_membership_authorization_context')
+def invalidate_membership_authorization_context(sender, instance=None, **kwargs):
+    invalidate_authorization_contexts_for_users_with_ids(users_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=CommunityMembership, dispatch_uid='increment_community_members_count')
+def increment_community_members_count(sender, instance=None, created=False, **kwargs):
+    if created:
+        _update_community_members_count_of_membership(membership=instance, value=1)
+
+
+@receiver(post_delete, sender=CommunityMembership, dispatch_uid='decrement_community_members_count')
+def decrement_community_members_count(sender, instance=None, **kwargs):
+    _update_community_members_count_of_membership(membership=instance, value=-1)
+
+
+def _update_community_members_count_of_membership(membership, value):
+    Community.update_members_count_of_community_with_id(community_id=membership.community_id, value=value)
+
+    # Keep the community the membership was made with up to date, eg. to serialize it once joined
+    if CommunityMembership.community.is_cached(membership):
+        community = membership.community
+        community.members_count = max(community.members_count + value, 0)
+
+    refresh_trending_community_with_id(community_id=membership.community_id)
+
+
+@receiver(post_save, sender=Community, dispatch_uid='refresh_trending_community')
+def refresh_trending_community(sender, instance=None, **kwargs):
+    # The community might have been made private or soft deleted
+    refresh_trending_community_with_id(community_id=instance.pk)
+
+
+@receiver(post_delete, sender=Community, dispatch_uid='remove_trending_community')
+def remove_trending_community(sender, instance=None, **kwargs):
+    refresh_trending_community_with_id(community_id=instance.pk)
+
+
+@receiver(post_save, sender=Community, dispatch_uid='update_community_search_tokens')
+def update_community_search_tokens(sender, instance=None, update_fields=None, **kwargs):
+    """
+    Index communities by their name and title for the communities searches
+    """
+    if update_fields is None or 'name' in update_fields or 'title' in update_fields:
+        update_search_tokens_for_object_with_id(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, object_id=instance.pk,
+                                                texts=(instance.name, instance.title))
+
+
+@receiver(post_delete, sender=Community, dispatch_uid='delete_community_search_tokens')
+def delete_community_search_tokens(sender, instance=None, **kwargs):
+    delete_search_tokens_for_object_with_id(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, object_id=instance.pk)
+
+
+@receiver(m2m_changed, sender=Community.banned_users.through, dispatch_uid='invalidate_ban_authorization_context')
+def invalidate_ban_authorization_context(sender, instance=None, action=None, reverse=False, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    if reverse:
+        # Changed from the user side
+        users_ids = [instance.pk]
+    elif action == 'pre_clear':
+        users_ids = list(instance.banned_users.values_list('id', flat=True))
+    else:
+        users_ids = list(pk_set)
+
+    invalidate_authorization_contexts_for_users_with_ids(users_ids=users_ids)
+
+
 class CommunityLog(models.Model):
     """
     A log for community moderators user actions such as banning/unbanning
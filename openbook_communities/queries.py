@@ -1,5 +1,10 @@
 from django.db.models import Q
 
+from openbook_common.search import make_search_query
+from openbook_common.utils.model_loaders import get_search_token_model
+
+SEARCH_COMMUNITIES_FIELDS = ('name', 'title')
+
 
 def make_search_joined_communities_query_for_user(query, user, excluded_from_profile_posts=True):
     joined_communities_query = make_get_joined_communities_query_for_user(
@@ -41,11 +46,16 @@ def make_search_communities_query_for_user(query, user, excluded_from_profile_po
 
 
 def make_search_communities_query(query):
-    communities_query = Q(name__icontains=query)
-    communities_query.add(Q(title__icontains=query), Q.OR)
+    communities_query = make_search_communities_names_query(query=query)
     communities_query.add(Q(is_deleted=False), Q.AND)
     return communities_query
 
 
+def make_search_communities_names_query(query):
+    SearchToken = get_search_token_model()
+    return make_search_query(object_type=SearchToken.OBJECT_TYPE_COMMUNITY, query=query,
+                             fields=SEARCH_COMMUNITIES_FIELDS)
+
+
 def make_exclude_excluded_communities_from_profile_posts_query_for_user(user):
     return ~Q(profile_posts_community_exclusions__user_id=user.pk)
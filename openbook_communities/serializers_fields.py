@@ -128,11 +128,18 @@ class CommunityMembershipsField(Field):
         request = self.context.get('request')
         request_user = request.user
 
-        if request_user.is_anonymous or not request_user.is_member_of_community_with_name(
-                community_name=community.name):
+        if request_user.is_anonymous:
             return None
 
-        membership = community.memberships.get(user=request_user)
+        if community.pk in self.context.get('preloaded_communities_ids', ()):
+            # See openbook_posts.helpers.make_posts_serializer_context
+            membership = self.context['communities_memberships'].get((community.pk, request_user.pk))
+            if not membership:
+                return None
+        elif not request_user.is_member_of_community_with_name(community_name=community.name):
+            return None
+        else:
+            membership = community.memberships.get(user=request_user)
 
         return self.community_membership_serializer([membership], context={"request": request}, many=True).data
 
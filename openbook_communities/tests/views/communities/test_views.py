@@ -1,6 +1,9 @@
 # Create your tests here.
 import random
 
+import django_rq
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from django.conf import settings
 from faker import Faker
@@ -16,6 +19,8 @@ from openbook_common.tests.helpers import make_user, make_authentication_headers
     make_community_user_adjective, make_community
 from openbook_common.utils.model_loaders import get_community_model
 from openbook_communities.models import Community
+from openbook_communities.trending_communities import rebuild_trending_communities, \
+    TRENDING_COMMUNITIES_LOADED_KEY, TRENDING_COMMUNITIES_REBUILD_ENQUEUED_CACHE_KEY
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -1544,6 +1549,124 @@ class TrendingCommunitiesAPITests(OpenbookAPITestCase):
 
         self.assertEqual(0, len(response_communities))
 
+    def test_displays_communities_by_members_count(self):
+        """
+        should display the communities with most members first, counting joins, leaves and bans and return 200
+        """
+        user = make_user()
+
+        communities = [make_community() for i in range(0, 3)]
+
+        for community, amount_of_members in zip(communities, [3, 1, 2]):
+            for i in range(0, amount_of_members):
+                make_user().join_community_with_name(community_name=community.name)
+
+        leaving_member = make_user()
+        leaving_member.join_community_with_name(community_name=communities[1].name)
+        leaving_member.leave_community_with_name(community_name=communities[1].name)
+
+        banned_member = make_user()
+        banned_member.join_community_with_name(community_name=communities[2].name)
+        communities[2].creator.ban_user_with_username_from_community_with_name(username=banned_member.username,
+                                                                               community_name=communities[2].name)
+
+        for community, members_count in zip(communities, [4, 2, 3]):
+            community.refresh_from_db()
+            self.assertEqual(community.members_count, members_count)
+
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(self._get_url(), **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_communities = json.loads(response.content)
+
+        self.assertEqual([response_community['id'] for response_community in response_communities],
+                         [communities[0].pk, communities[2].pk, communities[1].pk])
+        self.assertEqual([response_community['members_count'] for response_community in response_communities],
+                         [4, 3, 2])
+
+    @override_settings(TRENDING_COMMUNITIES_LEADERBOARD_SIZE=2)
+    def test_displays_communities_of_leaderboards(self):
+        """
+        should display the communities at the top of the leaderboards as their members change and return 200
+        """
+        rebuild_trending_communities()
+
+        user = make_user()
+        category = make_category()
+
+        communities = [make_community() for i in range(0, 3)]
+        communities[2].set_categories_with_names(categories_names=[category.name])
+
+        for community, amount_of_members in zip(communities, [2, 1, 0]):
+            for i in range(0, amount_of_members):
+                make_user().join_community_with_name(community_name=community.name)
+
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(self._get_url(), **headers)
+        response_communities = json.loads(response.content)
+
+        self.assertEqual([response_community['id'] for response_community in response_communities],
+                         [communities[0].pk, communities[1].pk])
+
+        for i in range(0, 3):
+            make_user().join_community_with_name(community_name=communities[2].name)
+
+        response = self.client.get(self._get_url(), **headers)
+        response_communities = json.loads(response.content)
+
+        self.assertEqual([response_community['id'] for response_community in response_communities],
+                         [communities[2].pk, communities[0].pk])
+
+        response = self.client.get(self._get_url(), {'category': category.name}, **headers)
+        response_communities = json.loads(response.content)
+
+        self.assertEqual([response_community['id'] for response_community in response_communities],
+                         [communities[2].pk])
+
+        communities[2].set_categories_with_names(categories_names=[])
+
+        response = self.client.get(self._get_url(), {'category': category.name}, **headers)
+
+        self.assertEqual(len(json.loads(response.content)), 0)
+
+    @override_settings(TRENDING_COMMUNITIES_LEADERBOARD_SIZE=2)
+    def test_displays_communities_while_leaderboards_are_missing(self):
+        """
+        should display the trending communities from the database and enqueue the leaderboards rebuild once while
+        they are missing and return 200
+        """
+        django_rq.get_connection().delete(TRENDING_COMMUNITIES_LOADED_KEY)
+        cache.delete(TRENDING_COMMUNITIES_REBUILD_ENQUEUED_CACHE_KEY)
+        queue = django_rq.get_queue('low')
+        queue.empty()
+
+        user = make_user()
+
+        communities = [make_community() for i in range(0, 2)]
+
+        make_user().join_community_with_name(community_name=communities[1].name)
+
+        headers = make_authentication_headers_for_user(user)
+
+        for i in range(0, 2):
+            response = self.client.get(self._get_url(), **headers)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response_communities = json.loads(response.content)
+
+            self.assertEqual([response_community['id'] for response_community in response_communities],
+                             [communities[1].pk, communities[0].pk])
+
+        self.assertEqual([job.func_name for job in queue.jobs],
+                         ['openbook_communities.jobs.rebuild_trending_communities'])
+
+        queue.empty()
+
     def _get_url(self):
         return reverse('trending-communities')
 
@@ -1,3 +1,7 @@
+from unittest.mock import patch
+
+import django_rq
+from django.test import override_settings
 from django.urls import reverse
 from faker import Faker
 from openbook_common.tests.models import OpenbookAPITestCase
@@ -7,12 +11,14 @@ import logging
 import json
 
 from openbook_common.tests.helpers import make_user, make_authentication_headers_for_user, \
-    make_community, make_fake_post_text, make_post_image, make_moderation_category
+    make_community, make_fake_post_text, make_post_image, make_moderation_category, make_users
 from openbook_communities.models import Community, CommunityNotificationsSubscription
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.models import CommunityNewPostNotification
+from openbook_posts.jobs import fan_out_new_post_notifications
 from openbook_posts.models import Post, PostUserMention
 from openbook_notifications.models import Notification
+from openbook_notifications.unread_notifications_counts import make_unread_notifications_count_key
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -739,6 +745,104 @@ class CommunityPostsAPITest(OpenbookAPITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    @override_settings(NEW_POST_NOTIFICATIONS_FAN_OUT_PAGE_SIZE=2)
+    def test_create_community_post_notifies_subscribers_in_pages(self):
+        """
+        should notify every subscriber once when creating a community post, batching the push notifications per page
+        """
+        community_admin = make_user()
+        community = make_community(creator=community_admin, type='P')
+
+        subscribers = make_users(amount=5)
+
+        for subscriber in subscribers:
+            subscriber.join_community_with_name(community_name=community.name)
+            subscriber.enable_new_post_notifications_for_community_with_name(community_name=community.name)
+
+        post = community_admin.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        for subscriber in subscribers:
+            self.assertEqual(Notification.objects.filter(owner_id=subscriber.pk,
+                                                         notification_type=Notification.COMMUNITY_NEW_POST).count(),
+                             1)
+
+        self.assertEqual(CommunityNewPostNotification.objects.filter(post_id=post.pk).count(), 5)
+
+        send_notification_to_users_calls = self.mock_send_notification_to_users.call_args_list
+        self.assertEqual(len(send_notification_to_users_calls), 3)
+
+    def test_new_post_notifications_fan_out_resumes_after_last_notified_subscriber(self):
+        """
+        should only notify the remaining subscribers when running the new post notifications fan-out again
+        """
+        community_admin = make_user()
+        community = make_community(creator=community_admin, type='P')
+
+        subscribers = make_users(amount=3)
+
+        for subscriber in subscribers:
+            subscriber.join_community_with_name(community_name=community.name)
+            subscriber.enable_new_post_notifications_for_community_with_name(community_name=community.name)
+
+        post = community_admin.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        # Simulate a fan-out interrupted after notifying the first subscriber
+        last_subscription = CommunityNotificationsSubscription.objects.filter(community=community).order_by(
+            'pk').last()
+        CommunityNewPostNotification.objects.filter(post_id=post.pk,
+                                                    community_notifications_subscription=last_subscription).delete()
+
+        fan_out_new_post_notifications(post_id=post.pk)
+
+        self.assertEqual(CommunityNewPostNotification.objects.filter(post_id=post.pk).count(), 3)
+        self.assertEqual(Notification.objects.filter(notification_type=Notification.COMMUNITY_NEW_POST).count(), 3)
+
+    def test_new_post_notifications_fan_out_skips_deleted_post(self):
+        """
+        should not notify anyone when the post was deleted before the new post notifications fan-out ran
+        """
+        community_admin = make_user()
+        community = make_community(creator=community_admin, type='P')
+
+        subscriber = make_user()
+        subscriber.join_community_with_name(community_name=community.name)
+        subscriber.enable_new_post_notifications_for_community_with_name(community_name=community.name)
+
+        with override_settings(NEW_POST_NOTIFICATIONS_JOBS_ASYNC=True):
+            post = community_admin.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        post_id = post.pk
+        post.delete()
+
+        fan_out_new_post_notifications(post_id=post_id)
+
+        self.assertFalse(Notification.objects.filter(notification_type=Notification.COMMUNITY_NEW_POST).exists())
+
+    def test_new_post_notifications_fan_out_counts_unread_notifications_once_committed(self):
+        """
+        should count the new post notifications of the subscribers once each page is committed
+        """
+        community_admin = make_user()
+        community = make_community(creator=community_admin, type='P')
+
+        subscriber = make_user()
+        subscriber.join_community_with_name(community_name=community.name)
+        subscriber.enable_new_post_notifications_for_community_with_name(community_name=community.name)
+
+        # Redis keeps the counts of the rolled back users of previous test cases
+        django_rq.get_connection().delete(make_unread_notifications_count_key(user_id=subscriber.pk))
+        self.assertEqual(subscriber.count_unread_notifications(), 0)
+
+        with patch('openbook_posts.jobs.transaction.on_commit') as on_commit_mock:
+            community_admin.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        self.assertEqual(subscriber.count_unread_notifications(), 0)
+
+        for call in on_commit_mock.call_args_list:
+            call[0][0]()
+
+        self.assertEqual(subscriber.count_unread_notifications(), 1)
+
     def test_create_community_post_does_not_notify_blocked_subscribers(self):
         """
         should NOT notify subscribers who are blocked by creator/have blocked creator when creating a community post
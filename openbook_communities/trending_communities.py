@@ -0,0 +1,133 @@
+import django_rq
+from django.conf import settings
+from django.core.cache import cache
+
+from openbook_common.utils.model_loaders import get_community_model, get_category_model
+
+TRENDING_COMMUNITIES_KEY = 'trending_communities'
+TRENDING_COMMUNITIES_CATEGORY_KEY_PREFIX = 'trending_communities:category:'
+# Set once the leaderboards were built, missing leaderboards are then known to be empty
+TRENDING_COMMUNITIES_LOADED_KEY = 'trending_communities:loaded'
+TRENDING_COMMUNITIES_REBUILD_ENQUEUED_CACHE_KEY = 'trending_communities:rebuild_enqueued'
+
+
+def get_trending_communities_ids(category_name=None):
+    """
+    Returns the ids of the TRENDING_COMMUNITIES_LEADERBOARD_READ_SIZE communities with most members, optionally of the
+    given category. They are kept in Redis sorted sets, so the lookup does not depend on the amount of communities.
+    Returns None if the leaderboards are disabled or not built yet, their rebuild is then enqueued.
+    """
+    if settings.TRENDING_COMMUNITIES_LEADERBOARD_SIZE <= 0:
+        return None
+
+    if category_name:
+        Category = get_category_model()
+        category_id = Category.objects.filter(name=category_name).values_list('id', flat=True).first()
+
+        if category_id is None:
+            return []
+
+        key = make_trending_communities_key(category_id=category_id)
+    else:
+        key = make_trending_communities_key()
+
+    connection = django_rq.get_connection()
+
+    if not connection.exists(TRENDING_COMMUNITIES_LOADED_KEY):
+        _enqueue_rebuild_trending_communities()
+        return None
+
+    return [int(community_id) for community_id in
+            connection.zrevrange(key, 0, settings.TRENDING_COMMUNITIES_LEADERBOARD_READ_SIZE - 1)]
+
+
+def refresh_trending_community_with_id(community_id):
+    """
+    Sets the members count of the community in the leaderboards of its categories, or removes it from them if it is no
+    longer public
+    """
+    if settings.TRENDING_COMMUNITIES_LEADERBOARD_SIZE <= 0:
+        return
+
+    Community = get_community_model()
+
+    community = Community.objects.filter(pk=community_id).values('type', 'is_deleted', 'members_count').first()
+    categories_ids = Community.categories.through.objects.filter(community_id=community_id).values_list(
+        'category_id', flat=True)
+
+    keys = [make_trending_communities_key()]
+    keys.extend([make_trending_communities_key(category_id=category_id) for category_id in categories_ids])
+
+    pipeline = django_rq.get_connection().pipeline(transaction=False)
+
+    if community and community['type'] == Community.COMMUNITY_TYPE_PUBLIC and not community['is_deleted']:
+        for key in keys:
+            pipeline.zadd(key, {community_id: community['members_count']})
+            # Communities which no longer make it to the top are dropped until the scheduled leaderboards rebuild
+            pipeline.zremrangebyrank(key, 0, -settings.TRENDING_COMMUNITIES_LEADERBOARD_SIZE - 1)
+    else:
+        for key in keys:
+            pipeline.zrem(key, community_id)
+
+    pipeline.execute()
+
+
+def remove_trending_communities_of_categories(communities_categories_ids):
+    """
+    Removes communities from the leaderboards of categories, given as a list of (community_id, category_id)
+    """
+    if settings.TRENDING_COMMUNITIES_LEADERBOARD_SIZE <= 0 or not communities_categories_ids:
+        return
+
+    pipeline = django_rq.get_connection().pipeline(transaction=False)
+
+    for community_id, category_id in communities_categories_ids:
+        pipeline.zrem(make_trending_communities_key(category_id=category_id), community_id)
+
+    pipeline.execute()
+
+
+def rebuild_trending_communities():
+    """
+    Rebuilds every leaderboard from the maintained members counts, with a query per category
+    """
+    Community = get_community_model()
+    Category = get_category_model()
+
+    leaderboard_size = settings.TRENDING_COMMUNITIES_LEADERBOARD_SIZE
+    trending_communities = Community.objects.filter(type=Community.COMMUNITY_TYPE_PUBLIC, is_deleted=False).order_by(
+        '-members_count', '-created')
+
+    leaderboards = {
+        make_trending_communities_key(): trending_communities.values_list('id', 'members_count')[:leaderboard_size]
+    }
+
+    for category_id in Category.objects.values_list('id', flat=True):
+        leaderboards[make_trending_communities_key(category_id=category_id)] = trending_communities.filter(
+            categories__id=category_id).values_list('id', 'members_count')[:leaderboard_size]
+
+    # Replaced in a transaction so readers never see a partially built leaderboard
+    pipeline = django_rq.get_connection().pipeline(transaction=True)
+
+    for key, communities_members_counts in leaderboards.items():
+        pipeline.delete(key)
+        communities_members_counts = dict(communities_members_counts)
+        if communities_members_counts:
+            pipeline.zadd(key, communities_members_counts)
+
+    pipeline.set(TRENDING_COMMUNITIES_LOADED_KEY, 1)
+    pipeline.execute()
+
+
+def make_trending_communities_key(category_id=None):
+    if category_id is None:
+        return TRENDING_COMMUNITIES_KEY
+
+    return '%s%d' % (TRENDING_COMMUNITIES_CATEGORY_KEY_PREFIX, category_id)
+
+
+def _enqueue_rebuild_trending_communities():
+    # Only once for all the requests finding the leaderboards missing, eg. after Redis was flushed
+    if cache.add(TRENDING_COMMUNITIES_REBUILD_ENQUEUED_CACHE_KEY, True,
+                 settings.TRENDING_COMMUNITIES_REBUILD_ENQUEUED_TIMEOUT):
+        django_rq.get_queue('low').enqueue('openbook_communities.jobs.rebuild_trending_communities')
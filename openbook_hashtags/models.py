@@ -3,6 +3,8 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 
 # Create your models here.
@@ -11,7 +13,9 @@ from imagekit.models import ProcessedImageField
 from pilkit.processors import ResizeToFit
 
 from openbook.storage_backends import S3PrivateMediaStorage
-from openbook_common.models import Emoji
+from openbook_common.models import Emoji, SearchToken
+from openbook_common.search import create_search_tokens_for_objects, update_search_tokens_for_object_with_id, \
+    delete_search_tokens_for_object_with_id
 from openbook_common.utils.helpers import delete_file_field, get_random_pastel_color
 from openbook_common.validators import hex_color_validator
 from openbook_communities.models import Community
@@ -70,6 +74,58 @@ class Hashtag(models.Model):
 
         return hashtag
 
+    @classmethod
+    def get_or_create_hashtags(cls, names, post=None):
+        """
+        Returns the hashtags with the given names in one query, the missing ones are inserted in bulk
+        """
+        names = list(dict.fromkeys(name.lower() for name in names))
+        hashtags = cls.objects.in_bulk(names, field_name='name')
+        missing_names = [name for name in names if name not in hashtags]
+
+        if missing_names:
+            missing_hashtags = []
+
+            for name in missing_names:
+                hashtag = cls(name=name, color=get_random_pastel_color(), created=timezone.now())
+                # bulk_create does not call save, which validates the hashtag
+                hashtag.clean_fields()
+                missing_hashtags.append(hashtag)
+
+            # Hashtags created meanwhile by a concurrent request are skipped and retrieved below
+            cls.objects.bulk_create(missing_hashtags, ignore_conflicts=True)
+            hashtags.update(cls.objects.in_bulk(missing_names, field_name='name'))
+
+            # bulk_create does not send post_save either
+            create_search_tokens_for_objects(object_type=SearchToken.OBJECT_TYPE_HASHTAG,
+                                             objects_texts=[(hashtags[name].pk, (name,)) for name in missing_names])
+
+        hashtags = [hashtags[name] for name in names]
+
+        if post:
+            cls.attempt_update_media_of_hashtags_with_post(hashtags=hashtags, post=post)
+
+        return hashtags
+
+    @classmethod
+    def attempt_update_media_of_hashtags_with_post(cls, hashtags, post):
+        hashtags_without_image = [hashtag for hashtag in hashtags if not hashtag.has_image()]
+
+        if not hashtags_without_image or not post or not post.is_publicly_visible():
+            return
+
+        post_first_media_image = post.get_first_media_image()
+
+        # The media image is only available once processed
+        if not post_first_media_image or not post_first_media_image.content_object.image:
+            return
+
+        for hashtag in hashtags_without_image:
+            image_copy = ContentFile(post_first_media_image.content_object.image.read())
+            image_copy.name = post_first_media_image.content_object.image.name
+            hashtag.image.save(image_copy.name, image_copy)
+            hashtag.save()
+
     @classmethod
     def hashtag_with_name_exists(cls, hashtag_name):
         return cls.objects.filter(name=hashtag_name).exists()
@@ -90,13 +146,7 @@ class Hashtag(models.Model):
         super(Hashtag, self).delete(*args, **kwargs)
 
     def attempt_update_media_with_post(self, post):
-        if not self.has_image() and post and post.is_publicly_visible():
-            post_first_media_image = post.get_first_media_image()
-            if post_first_media_image:
-                image_copy = ContentFile(post_first_media_image.content_object.image.read())
-                image_copy.name = post_first_media_image.content_object.image.name
-                self.image.save(image_copy.name, image_copy)
-                self.save()
+        Hashtag.attempt_update_media_of_hashtags_with_post(hashtags=[self], post=post)
 
     def count_posts(self):
         public_posts_query = make_only_public_posts_query()
@@ -113,3 +163,21 @@ class Hashtag(models.Model):
                 return True
 
         return False
+
+
+@receiver(post_save, sender=Hashtag, dispatch_uid='update_hashtag_search_tokens')
+def update_hashtag_search_tokens(sender, instance=None, created=False, update_fields=None, **kwargs):
+    """
+    Index hashtags by their name for the hashtags searches
+    """
+    if created:
+        create_search_tokens_for_objects(object_type=SearchToken.OBJECT_TYPE_HASHTAG,
+                                         objects_texts=[(instance.pk, (instance.name,))])
+    elif update_fields is None or 'name' in update_fields:
+        update_search_tokens_for_object_with_id(object_type=SearchToken.OBJECT_TYPE_HASHTAG, object_id=instance.pk,
+                                                texts=(instance.name,))
+
+
+@receiver(post_delete, sender=Hashtag, dispatch_uid='delete_hashtag_search_tokens')
+def delete_hashtag_search_tokens(sender, instance=None, **kwargs):
+    delete_search_tokens_for_object_with_id(object_type=SearchToken.OBJECT_TYPE_HASHTAG, object_id=instance.pk)
@@ -1,10 +1,12 @@
 from django.db.models import Q
 
-from openbook_common.utils.model_loaders import get_moderated_object_model
+from openbook_common.search import make_search_query
+from openbook_common.utils.model_loaders import get_moderated_object_model, get_search_token_model
 
 
 def make_search_hashtag_query_for_user_with_id(search_query, user_id):
-    query = Q(name__icontains=search_query)
+    SearchToken = get_search_token_model()
+    query = make_search_query(object_type=SearchToken.OBJECT_TYPE_HASHTAG, query=search_query, fields=('name',))
     query.add(make_exclude_reported_and_approved_hashtags_query(), Q.AND)
     query.add(make_exclude_reported_hashtags_by_user_with_id_query(user_id=user_id), Q.AND)
     return query
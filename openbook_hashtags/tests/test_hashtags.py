@@ -52,6 +52,25 @@ class SearchHashtagsAPITests(OpenbookAPITestCase):
             self.assertEqual(retrieved_hashtag['name'], hashtag_name.lower())
             hashtag.delete()
 
+    def test_can_search_hashtags_of_posts(self):
+        """
+        should be able to search for the hashtags created by posts by any part of their name
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        user.create_public_post(text='Hello #okunasearch and #okunaquery')
+
+        url = self._get_url()
+        response = self.client.get(url, {
+            'query': 'NASEA'
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parsed_response = json.loads(response.content)
+        self.assertEqual(len(parsed_response), 1)
+        self.assertEqual(parsed_response[0]['name'], 'okunasearch')
+
     def test_can_search_for_foreign_user_reported_hashtag(self):
         """
         should be able to search for a foreign usre reported hashtag and return 200
@@ -2,14 +2,17 @@ from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
 
 # Create your models here.
 from django.utils import timezone
 
+from openbook_auth.authorization_contexts import invalidate_authorization_contexts_for_users_with_ids
 from openbook_auth.models import User
 from openbook_common.utils.model_loaders import get_post_model, get_post_comment_model, get_community_model, \
-    get_user_model, get_moderation_penalty_model, get_hashtag_model
+    get_user_model, get_moderation_penalty_model, get_hashtag_model, get_top_post_model
 
 
 class ModerationCategory(models.Model):
@@ -278,6 +281,10 @@ class ModeratedObject(models.Model):
                 isinstance(content_object, Community):
             content_object.delete_notifications()
 
+        if isinstance(content_object, Post):
+            TopPost = get_top_post_model()
+            TopPost.demote_post(post=content_object)
+
         if isinstance(content_object, User) and moderation_severity == ModerationCategory.SEVERITY_CRITICAL:
             content_object.delete_outgoing_notifications()
 
@@ -377,6 +384,12 @@ class ModerationPenalty(models.Model):
                                   expiration=expiration)
 
 
+@receiver(post_save, sender=ModerationPenalty, dispatch_uid='invalidate_saved_penalty_authorization_context')
+@receiver(post_delete, sender=ModerationPenalty, dispatch_uid='invalidate_deleted_penalty_authorization_context')
+def invalidate_penalty_authorization_context(sender, instance=None, **kwargs):
+    invalidate_authorization_contexts_for_users_with_ids(users_ids=[instance.user_id])
+
+
 class ModeratedObjectLog(models.Model):
     actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', null=True)
 
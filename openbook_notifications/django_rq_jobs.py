@@ -1,32 +1,36 @@
-from hashlib import sha256
-import onesignal as onesignal_sdk
 from django.conf import settings
 from django_rq import job
 
-from openbook_common.utils.model_loaders import get_user_model
+from openbook_notifications.push_notifications import enqueue_push_notification
+from openbook_notifications.unread_notifications_counts import load_unread_notifications_counts_for_users_with_ids, \
+    get_users_ids_with_loaded_unread_notifications_counts
 
-onesignal_client = onesignal_sdk.Client(
-    app_id=settings.ONE_SIGNAL_APP_ID,
-    app_auth_key=settings.ONE_SIGNAL_API_KEY
-)
+
+# Push notifications are delivered in batches by the PushNotificationsDeliveryWorker, these jobs only forward
+# the ones enqueued before it was introduced
 
 
 @job('default')
 def send_notification_to_user_with_id(user_id, notification):
-    User = get_user_model()
-    user = User.objects.only('username', 'uuid', 'id').get(pk=user_id)
+    enqueue_push_notification(users_ids=[user_id], notification=notification)
+
 
-    for device in user.devices.all():
-        notification.set_parameter('ios_badgeType', 'Increase')
-        notification.set_parameter('ios_badgeCount', '1')
+@job('default')
+def send_notification_to_users_with_ids(users_ids, notification):
+    enqueue_push_notification(users_ids=users_ids, notification=notification)
 
-        user_id_contents = (str(user.uuid) + str(user.id)).encode('utf-8')
 
-        user_id = sha256(user_id_contents).hexdigest()
+@job('low')
+def reconcile_unread_notifications_counts():
+    """
+    Recomputes the stored unread notifications counts from the database, correcting the drift of counts
+    adjusted by transactions which were later rolled back
+    """
+    batch_size = settings.UNREAD_NOTIFICATIONS_COUNT_RECONCILE_BATCH_SIZE
+    # SCAN can return a key more than once
+    users_ids = list(set(get_users_ids_with_loaded_unread_notifications_counts(count=batch_size)))
 
-        notification.set_filters([
-            {"field": "tag", "key": "user_id", "relation": "=", "value": user_id},
-            {"field": "tag", "key": "device_uuid", "relation": "=", "value": device.uuid},
-        ])
+    for i in range(0, len(users_ids), batch_size):
+        load_unread_notifications_counts_for_users_with_ids(users_ids=users_ids[i:i + batch_size])
 
-        onesignal_client.send_notification(notification)
+    return 'Reconciled the unread notifications counts of %d users' % len(users_ids)
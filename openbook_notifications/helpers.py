@@ -1,10 +1,17 @@
 import django_rq
+from django.contrib.contenttypes.models import ContentType
 from django.utils import translation
 from django.utils.translation import ugettext_lazy as _
 import onesignal as onesignal_sdk
 
-from openbook_common.utils.model_loaders import get_notification_model
-from openbook_notifications.django_rq_jobs import send_notification_to_user_with_id
+from openbook_common.utils.model_loaders import get_notification_model, \
+    get_post_comment_notification_model, get_post_comment_reply_notification_model, \
+    get_post_comment_reaction_notification_model, get_post_reaction_notification_model, \
+    get_connection_request_notification_model, get_connection_confirmed_notification_model, \
+    get_follow_notification_model, get_post_comment_user_mention_notification_model, \
+    get_post_user_mention_notification_model, get_community_new_post_notification_model, \
+    get_user_new_post_notification_model, get_community_invite_notification_model
+from openbook_notifications.push_notifications import enqueue_push_notification
 from openbook_translation import translation_strategy
 
 import logging
@@ -288,6 +295,61 @@ def send_user_new_post_push_notification(user_notifications_subscription, post):
         _send_notification_to_user(notification=one_signal_notification, user=target_user)
 
 
+def send_community_new_post_push_notifications(community, target_users):
+    """
+    Batched variant of send_community_new_post_push_notification, one notification per language of the target users
+    """
+    target_users = [target_user for target_user in target_users if
+                    target_user.has_community_new_post_notifications_enabled()]
+
+    Notification = get_notification_model()
+
+    notification_data = {
+        'type': Notification.COMMUNITY_NEW_POST,
+    }
+
+    notification_group = NOTIFICATION_GROUP_HIGH_PRIORITY
+
+    for language_code, language_target_users in _group_target_users_by_notification_language_code(target_users):
+        with translation.override(language_code):
+            one_signal_notification = onesignal_sdk.Notification(
+                post_body={"contents": {"en": _('A new post was posted in c/%(community_name)s.') % {
+                    'community_name': community.name,
+                }}})
+
+        one_signal_notification.set_parameter('data', notification_data)
+        one_signal_notification.set_parameter('!thread_id', notification_group)
+        one_signal_notification.set_parameter('android_group', notification_group)
+
+        _send_notification_to_users(notification=one_signal_notification, users=language_target_users)
+
+
+def send_user_new_post_push_notifications(post_creator, target_users):
+    """
+    Batched variant of send_user_new_post_push_notification, one notification per language of the target users
+    """
+    target_users = [target_user for target_user in target_users if
+                    target_user.has_user_new_post_notifications_enabled()]
+
+    Notification = get_notification_model()
+
+    notification_data = {
+        'type': Notification.USER_NEW_POST,
+    }
+
+    for language_code, language_target_users in _group_target_users_by_notification_language_code(target_users):
+        with translation.override(language_code):
+            one_signal_notification = onesignal_sdk.Notification(
+                post_body={"contents": {"en": _('%(post_creator_name)s · @%(post_creator_username)s posted something.') % {
+                    'post_creator_username': post_creator.username,
+                    'post_creator_name': post_creator.profile.name,
+                }}})
+
+        one_signal_notification.set_parameter('data', notification_data)
+
+        _send_notification_to_users(notification=one_signal_notification, users=language_target_users)
+
+
 def get_notification_language_code_for_target_user(target_user):
     if target_user.language and translation.check_for_language(target_user.language.code):
         return target_user.language.code
@@ -295,5 +357,107 @@ def get_notification_language_code_for_target_user(target_user):
     return translation_strategy.get_default_translation_language_code()
 
 
+def _group_target_users_by_notification_language_code(target_users):
+    target_users_by_language_code = {}
+
+    for target_user in target_users:
+        target_users_by_language_code.setdefault(get_notification_language_code_for_target_user(target_user),
+                                                 []).append(target_user)
+
+    return target_users_by_language_code.items()
+
+
 def _send_notification_to_user(user, notification):
-    send_notification_to_user_with_id.delay(user_id=user.pk, notification=notification)
+    enqueue_push_notification(users_ids=[user.pk], notification=notification)
+
+
+def _send_notification_to_users(users, notification):
+    enqueue_push_notification(users_ids=[user.pk for user in users], notification=notification)
+
+
+def load_notifications_content_objects(notifications):
+    """
+    Loads the content objects of a page of notifications with one query per notification type, including
+    everything GetNotificationsNotificationSerializer walks, and sets them on the notifications
+    """
+    Notification = get_notification_model()
+
+    objects_ids_by_content_type_id = {}
+
+    for notification in notifications:
+        objects_ids_by_content_type_id.setdefault(notification.content_type_id, set()).add(notification.object_id)
+
+    objects_by_content_type_id = {}
+
+    for content_type_id, objects_ids in objects_ids_by_content_type_id.items():
+        notification_model = ContentType.objects.get_for_id(content_type_id).model_class()
+
+        if not notification_model:
+            continue
+
+        select_related, prefetch_related = _get_related_for_notification_model(notification_model)
+
+        objects_by_content_type_id[content_type_id] = notification_model.objects.select_related(
+            *select_related).prefetch_related(*prefetch_related).in_bulk(objects_ids)
+
+    for notification in notifications:
+        content_object = objects_by_content_type_id.get(notification.content_type_id, {}).get(notification.object_id)
+        if content_object:
+            Notification.content_object.set_cached_value(notification, content_object)
+
+    return notifications
+
+
+def _get_related_for_notification_model(notification_model):
+    related = {
+        get_post_comment_notification_model(): _make_post_comment_related('post_comment__'),
+        get_post_comment_reply_notification_model(): _make_post_comment_related('post_comment__'),
+        get_post_comment_reaction_notification_model(): _merge_related(
+            _make_user_related('post_comment_reaction__reactor__'),
+            (('post_comment_reaction__emoji',), ()),
+            _make_post_comment_related('post_comment_reaction__post_comment__')),
+        get_post_reaction_notification_model(): _merge_related(
+            _make_user_related('post_reaction__reactor__'),
+            (('post_reaction__emoji',), ()),
+            _make_post_related('post_reaction__post__')),
+        get_connection_request_notification_model(): _make_user_related('connection_requester__'),
+        get_connection_confirmed_notification_model(): _make_user_related('connection_confirmator__'),
+        get_follow_notification_model(): _make_user_related('follower__'),
+        get_post_comment_user_mention_notification_model(): _merge_related(
+            _make_user_related('post_comment_user_mention__user__'),
+            _make_post_comment_related('post_comment_user_mention__post_comment__')),
+        get_post_user_mention_notification_model(): _merge_related(
+            _make_user_related('post_user_mention__user__'),
+            _make_post_related('post_user_mention__post__')),
+        get_community_new_post_notification_model(): _make_post_related('post__'),
+        get_user_new_post_notification_model(): _make_post_related('post__'),
+        get_community_invite_notification_model(): _merge_related(
+            _make_user_related('community_invite__creator__'),
+            (('community_invite__community',), ())),
+    }
+
+    return related.get(notification_model, ((), ()))
+
+
+def _make_user_related(prefix):
+    return (prefix + 'profile',), (prefix + 'profile__badges',)
+
+
+def _make_post_related(prefix):
+    return _merge_related(
+        _make_user_related(prefix + 'creator__'),
+        ((prefix + 'community', prefix + 'image'), ()))
+
+
+def _make_post_comment_related(prefix):
+    return _merge_related(
+        _make_user_related(prefix + 'commenter__'),
+        _make_user_related(prefix + 'parent_comment__commenter__'),
+        ((prefix + 'language', prefix + 'parent_comment__language'), (prefix + 'hashtags',)),
+        _make_post_related(prefix + 'post__'))
+
+
+def _merge_related(*related):
+    select_related = tuple(field for select_fields, prefetch_fields in related for field in select_fields)
+    prefetch_related = tuple(field for select_fields, prefetch_fields in related for field in prefetch_fields)
+    return select_related, prefetch_related
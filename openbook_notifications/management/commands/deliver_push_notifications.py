@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from openbook_notifications.push_notifications import PushNotificationsDeliveryWorker, \
+    get_push_notifications_delivery_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Delivers the pending push notifications in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='The amount of pending pushes to deliver at once')
+        parser.add_argument('--burst', action='store_true', help='Stop once there are no pending pushes left')
+        parser.add_argument('--name', help='The name of the worker, its processing pushes are delivered again once '
+                                           'restarted with it. Defaults to the host name')
+
+    def handle(self, *args, **options):
+        worker = PushNotificationsDeliveryWorker(batch_size=options['batch_size'], name=options['name'])
+
+        logger.info('Delivering push notifications')
+
+        worker.run(burst=options['burst'])
+
+        logger.info('Push notifications delivery metrics: %s' % get_push_notifications_delivery_metrics())
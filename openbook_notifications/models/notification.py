@@ -1,9 +1,13 @@
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.utils import timezone
 
 from openbook_auth.models import User
+from openbook_notifications.unread_notifications_counts import \
+    increment_unread_notifications_count_for_user_with_id, decrement_unread_notifications_count_for_user_with_id
 
 
 class Notification(models.Model):
@@ -60,3 +64,27 @@ class Notification(models.Model):
             self.created = timezone.now()
 
         return super(Notification, self).save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Notification, dispatch_uid='increment_unread_notifications_count')
+def increment_unread_notifications_count(sender, instance=None, created=False, **kwargs):
+    """
+    Count the created unread notifications once they are committed
+    """
+    if created and not instance.read:
+        owner_id = instance.owner_id
+        notification_type = instance.notification_type
+        transaction.on_commit(lambda: increment_unread_notifications_count_for_user_with_id(
+            user_id=owner_id, notification_type=notification_type))
+
+
+@receiver(post_delete, sender=Notification, dispatch_uid='decrement_unread_notifications_count')
+def decrement_unread_notifications_count(sender, instance=None, **kwargs):
+    """
+    Discount the deleted unread notifications once committed, also when cascaded from their typed notification
+    """
+    if not instance.read:
+        owner_id = instance.owner_id
+        notification_type = instance.notification_type
+        transaction.on_commit(lambda: decrement_unread_notifications_count_for_user_with_id(
+            user_id=owner_id, notification_type=notification_type))
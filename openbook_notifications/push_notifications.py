@@ -0,0 +1,331 @@
+import json
+import socket
+import time
+import uuid
+from functools import lru_cache
+from hashlib import sha256
+
+import django_rq
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from requests.adapters import HTTPAdapter
+
+from openbook_common.utils.model_loaders import get_device_model
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+PUSH_NOTIFICATIONS_DEVICES_PER_REQUEST_BUCKETS = (1, 10, 50, 100, 200)
+
+# The namespace of the OneSignal idempotency keys of the push requests
+PUSH_NOTIFICATIONS_IDEMPOTENCY_NAMESPACE = uuid.UUID('e70adf49-2cf1-4155-963b-74cc0f8129df')
+
+PUSH_REQUEST_SENT = 'sent'
+PUSH_REQUEST_REJECTED = 'rejected'
+PUSH_REQUEST_FAILED = 'failed'
+
+# Moves up to a batch of pending pushes to the processing pushes, which keep the ones left by a previous call
+MOVE_PENDING_PUSHES_TO_PROCESSING_SCRIPT = """
+local count = tonumber(ARGV[1]) - redis.call('LLEN', KEYS[2])
+if count > 0 then
+    local pending_pushes = redis.call('LRANGE', KEYS[1], 0, count - 1)
+    if #pending_pushes > 0 then
+        redis.call('LTRIM', KEYS[1], #pending_pushes, -1)
+        redis.call('RPUSH', KEYS[2], unpack(pending_pushes))
+    end
+end
+return redis.call('LRANGE', KEYS[2], 0, -1)
+"""
+
+
+def enqueue_push_notification(users_ids, notification):
+    """
+    Adds a push notification for the devices of the given users to the pending pushes queue, which is
+    drained in batches by the PushNotificationsDeliveryWorker
+    """
+    pending_push = json.dumps({
+        # Identifies the push in the idempotency keys of the requests delivering it
+        'id': uuid.uuid4().hex,
+        'users_ids': list(users_ids),
+        'post_body': notification.post_body,
+    }, cls=DjangoJSONEncoder)
+
+    django_rq.get_connection().rpush(settings.PUSH_NOTIFICATIONS_QUEUE_KEY, pending_push)
+
+
+def get_push_notifications_delivery_metrics():
+    metrics = django_rq.get_connection().hgetall(settings.PUSH_NOTIFICATIONS_METRICS_KEY)
+    return {key.decode('utf-8'): float(value) for key, value in metrics.items()}
+
+
+@lru_cache(maxsize=10000)
+def make_user_id_tag_value(user_uuid, user_id):
+    user_id_contents = (str(user_uuid) + str(user_id)).encode('utf-8')
+    return sha256(user_id_contents).hexdigest()
+
+
+class PushNotificationsDeliveryWorker():
+    """
+    Moves the pending pushes in batches to its processing pushes, coalesces the pushes with identical payloads and
+    sends each of them to the devices of all of its recipients with as few OneSignal requests as possible.
+    The localized contents are part of the payload, so pushes in different languages are never coalesced.
+    The processing pushes are only removed once delivered, a worker restarted with the same name delivers the ones
+    left by a crash again. The requests carry idempotency keys, so OneSignal does not send them twice.
+    """
+
+    def __init__(self, batch_size=None, name=None):
+        self.batch_size = batch_size or settings.PUSH_NOTIFICATIONS_DELIVERY_BATCH_SIZE
+        self.processing_key = '%s:processing:%s' % (settings.PUSH_NOTIFICATIONS_QUEUE_KEY,
+                                                    name or socket.gethostname())
+        self.connection = django_rq.get_connection()
+        self.move_pending_pushes_to_processing = self.connection.register_script(
+            MOVE_PENDING_PUSHES_TO_PROCESSING_SCRIPT)
+        self.metrics = PushNotificationsDeliveryMetrics(connection=self.connection)
+        self.notifications_url = '%s/notifications' % settings.ONE_SIGNAL_API_ROOT
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': 'Basic %s' % settings.ONE_SIGNAL_API_KEY,
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.PUSH_NOTIFICATIONS_DELIVERY_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def run(self, burst=False):
+        """
+        Delivers the pending pushes as they come. When burst is True, returns once the queue is empty.
+        """
+        try:
+            # The pushes left by a previous run are delivered alone, with the idempotency keys of their first attempt
+            self._deliver_processing_pushes(processing_pushes=self.connection.lrange(self.processing_key, 0, -1))
+
+            while True:
+                delivered_pushes_count = self.deliver_pending_pushes()
+
+                if delivered_pushes_count:
+                    continue
+
+                if burst:
+                    return
+
+                # Wait for the next push, it gets delivered along with the rest of its batch
+                self.connection.brpoplpush(settings.PUSH_NOTIFICATIONS_QUEUE_KEY, self.processing_key,
+                                           timeout=settings.PUSH_NOTIFICATIONS_DELIVERY_IDLE_TIMEOUT)
+        finally:
+            self.session.close()
+
+    def deliver_pending_pushes(self):
+        processing_pushes = self.move_pending_pushes_to_processing(
+            keys=[settings.PUSH_NOTIFICATIONS_QUEUE_KEY, self.processing_key], args=[self.batch_size])
+
+        return self._deliver_processing_pushes(processing_pushes=processing_pushes)
+
+    def _deliver_processing_pushes(self, processing_pushes):
+        if not processing_pushes:
+            return 0
+
+        start = time.monotonic()
+
+        pending_pushes = []
+
+        for processing_push in processing_pushes:
+            pending_push = json.loads(processing_push)
+            # Pushes enqueued before they had ids are identified by their contents
+            pending_push.setdefault('id', sha256(processing_push).hexdigest())
+            pending_pushes.append(pending_push)
+
+        pushes_by_payload = self._group_pending_pushes_by_payload(pending_pushes=pending_pushes)
+        failed_pushes = []
+
+        for post_body, users_ids, pushes in pushes_by_payload.values():
+            requests_results = self._send_push_to_users_with_ids(post_body=post_body, users_ids=users_ids,
+                                                                 pushes_ids=[push['id'] for push in pushes])
+
+            # Pushes partially sent are not sent again, their sent requests would be duplicated
+            if PUSH_REQUEST_FAILED in requests_results and PUSH_REQUEST_SENT not in requests_results:
+                failed_pushes.extend(pushes)
+
+        pipeline = self.connection.pipeline()
+        pipeline.delete(self.processing_key)
+
+        for failed_push in failed_pushes:
+            failed_push['attempts'] = failed_push.get('attempts', 1) + 1
+
+            if failed_push['attempts'] > settings.PUSH_NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS:
+                logger.error('Giving up push notification %s after %d attempts' % (
+                    failed_push['id'], settings.PUSH_NOTIFICATIONS_DELIVERY_MAX_ATTEMPTS))
+                continue
+
+            pipeline.rpush(settings.PUSH_NOTIFICATIONS_QUEUE_KEY, json.dumps(failed_push))
+
+        pipeline.execute()
+
+        self.metrics.record_batch(pushes_count=len(pending_pushes), payloads_count=len(pushes_by_payload),
+                                  latency=time.monotonic() - start)
+        self.metrics.flush()
+
+        return len(pending_pushes)
+
+    def _group_pending_pushes_by_payload(self, pending_pushes):
+        pushes_by_payload = {}
+
+        for pending_push in pending_pushes:
+            payload_key = json.dumps(pending_push['post_body'], sort_keys=True)
+
+            if payload_key not in pushes_by_payload:
+                pushes_by_payload[payload_key] = (pending_push['post_body'], set(), [])
+
+            pushes_by_payload[payload_key][1].update(pending_push['users_ids'])
+            pushes_by_payload[payload_key][2].append(pending_push)
+
+        return pushes_by_payload
+
+    def _send_push_to_users_with_ids(self, post_body, users_ids, pushes_ids):
+        """
+        Sends the push to the devices of the users and returns the results of its requests. The idempotency key of
+        each request is derived from the pushes and the devices it targets, the same on every attempt.
+        """
+        pushes_key = ','.join(sorted(pushes_ids))
+        requests_results = []
+
+        for index, devices_filters in enumerate(make_devices_filters_for_users_with_ids(users_ids=users_ids)):
+            request_body = dict(post_body)
+            request_body['app_id'] = settings.ONE_SIGNAL_APP_ID
+            request_body['ios_badgeType'] = 'Increase'
+            request_body['ios_badgeCount'] = '1'
+            request_body['filters'] = devices_filters
+            request_body['external_id'] = str(
+                uuid.uuid5(PUSH_NOTIFICATIONS_IDEMPOTENCY_NAMESPACE, '%s:%d' % (pushes_key, index)))
+
+            requests_results.append(self._post_notification(request_body=request_body,
+                                                            devices_count=(len(devices_filters) + 1) // 3))
+
+        return requests_results
+
+    def _post_notification(self, request_body, devices_count):
+        start = time.monotonic()
+        attempt = 0
+
+        while True:
+            retry_after = None
+
+            try:
+                response = self.session.post(self.notifications_url, json=request_body,
+                                             timeout=settings.PUSH_NOTIFICATIONS_DELIVERY_REQUEST_TIMEOUT)
+            except requests.RequestException as e:
+                logger.warning('Push notification request failed with %s' % e)
+            else:
+                if response.status_code < 400:
+                    self.metrics.record_request(devices_count=devices_count, latency=time.monotonic() - start,
+                                                retries_count=attempt, succeeded=True)
+                    return PUSH_REQUEST_SENT
+
+                if response.status_code != 429 and response.status_code < 500:
+                    logger.error('Push notification rejected with status %d: %s' % (
+                        response.status_code, response.text))
+                    self.metrics.record_request(devices_count=devices_count, latency=time.monotonic() - start,
+                                                retries_count=attempt, succeeded=False)
+                    return PUSH_REQUEST_REJECTED
+
+                retry_after = response.headers.get('Retry-After')
+
+            if attempt >= settings.PUSH_NOTIFICATIONS_DELIVERY_MAX_RETRIES:
+                logger.error('Giving up push notification after %d retries' % attempt)
+                break
+
+            time.sleep(self._get_retry_delay(attempt=attempt, retry_after=retry_after))
+            attempt += 1
+
+        self.metrics.record_request(devices_count=devices_count, latency=time.monotonic() - start,
+                                    retries_count=attempt, succeeded=False)
+        return PUSH_REQUEST_FAILED
+
+    def _get_retry_delay(self, attempt, retry_after=None):
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+
+        return settings.PUSH_NOTIFICATIONS_DELIVERY_RETRY_BACKOFF * (2 ** attempt)
+
+
+def make_devices_filters_for_users_with_ids(users_ids):
+    """
+    Yields the OneSignal filters targeting the devices of the given users, in chunks of at most
+    PUSH_NOTIFICATIONS_MAX_DEVICES_PER_REQUEST devices
+    """
+    Device = get_device_model()
+
+    # Ordered so the devices of each request are the same on every attempt
+    devices = Device.objects.filter(owner_id__in=users_ids).order_by('id').values_list('owner__uuid', 'owner_id',
+                                                                                        'uuid')
+
+    devices_filters = []
+    devices_count = 0
+
+    for owner_uuid, owner_id, device_uuid in devices.iterator():
+        if devices_filters:
+            devices_filters.append({"operator": "OR"})
+
+        devices_filters.extend([
+            {"field": "tag", "key": "user_id", "relation": "=",
+             "value": make_user_id_tag_value(user_uuid=owner_uuid, user_id=owner_id)},
+            {"field": "tag", "key": "device_uuid", "relation": "=", "value": device_uuid},
+        ])
+        devices_count += 1
+
+        if devices_count == settings.PUSH_NOTIFICATIONS_MAX_DEVICES_PER_REQUEST:
+            yield devices_filters
+            devices_filters = []
+            devices_count = 0
+
+    if devices_filters:
+        yield devices_filters
+
+
+class PushNotificationsDeliveryMetrics():
+    """
+    Accumulates the delivery counters and latencies in memory and adds them to a Redis hash on flush,
+    so the metrics of every worker end up in PUSH_NOTIFICATIONS_METRICS_KEY
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.counters = {}
+
+    def record_batch(self, pushes_count, payloads_count, latency):
+        self._increment('batches')
+        self._increment('pushes', pushes_count)
+        self._increment('payloads', payloads_count)
+        self._increment('batch_latency_seconds', latency)
+
+    def record_request(self, devices_count, latency, retries_count, succeeded):
+        self._increment('requests' if succeeded else 'failed_requests')
+        self._increment('retries', retries_count)
+        self._increment('devices', devices_count)
+        self._increment('request_latency_seconds', latency)
+
+        for bucket in PUSH_NOTIFICATIONS_DEVICES_PER_REQUEST_BUCKETS:
+            if devices_count <= bucket:
+                self._increment('devices_per_request_le_%d' % bucket)
+                break
+        else:
+            self._increment('devices_per_request_le_inf')
+
+    def flush(self):
+        if not self.counters:
+            return
+
+        pipeline = self.connection.pipeline()
+
+        for name, value in self.counters.items():
+            if isinstance(value, float):
+                pipeline.hincrbyfloat(settings.PUSH_NOTIFICATIONS_METRICS_KEY, name, value)
+            else:
+                pipeline.hincrby(settings.PUSH_NOTIFICATIONS_METRICS_KEY, name, value)
+
+        pipeline.execute()
+        self.counters = {}
+
+    def _increment(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
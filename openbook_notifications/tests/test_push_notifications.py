@@ -0,0 +1,202 @@
+import json
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import django_rq
+import onesignal as onesignal_sdk
+from django.test import override_settings
+from openbook_common.tests.models import OpenbookAPITestCase
+
+from openbook_common.tests.helpers import make_user, make_device
+from openbook_notifications.push_notifications import enqueue_push_notification, PushNotificationsDeliveryWorker, \
+    get_push_notifications_delivery_metrics, make_user_id_tag_value
+
+
+class FakeOneSignalRequestHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        content_length = int(self.headers['Content-Length'])
+        self.server.received_requests.append(json.loads(self.rfile.read(content_length).decode('utf-8')))
+
+        status = self.server.responses_statuses.pop(0) if self.server.responses_statuses else 200
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(PUSH_NOTIFICATIONS_QUEUE_KEY='test_push_notifications:pending',
+                   PUSH_NOTIFICATIONS_METRICS_KEY='test_push_notifications:metrics',
+                   PUSH_NOTIFICATIONS_DELIVERY_RETRY_BACKOFF=0)
+class PushNotificationsDeliveryWorkerTests(OpenbookAPITestCase):
+    """
+    PushNotificationsDeliveryWorker
+    """
+
+    def setUp(self):
+        super(PushNotificationsDeliveryWorkerTests, self).setUp()
+        self.server = HTTPServer(('127.0.0.1', 0), FakeOneSignalRequestHandler)
+        self.server.received_requests = []
+        self.server.responses_statuses = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.settings_override = override_settings(
+            ONE_SIGNAL_API_ROOT='http://127.0.0.1:%d/api/v1' % self.server.server_port)
+        self.settings_override.enable()
+        self._clear_redis_keys()
+
+    def tearDown(self):
+        self._clear_redis_keys()
+        self.settings_override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+        super(PushNotificationsDeliveryWorkerTests, self).tearDown()
+
+    def test_coalesces_pushes_with_the_same_payload(self):
+        """
+        should send a single request for pushes with the same payload to different users
+        """
+        users = [make_user() for i in range(0, 3)]
+        devices = [make_device(owner=user) for user in users]
+
+        for user in users:
+            enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hello'))
+
+        PushNotificationsDeliveryWorker().run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 1)
+
+        filters = self.server.received_requests[0]['filters']
+        devices_uuids = [device_filter['value'] for device_filter in filters if
+                         device_filter.get('key') == 'device_uuid']
+        self.assertEqual(sorted(devices_uuids), sorted([device.uuid for device in devices]))
+
+        users_tags = [device_filter['value'] for device_filter in filters if device_filter.get('key') == 'user_id']
+        self.assertIn(make_user_id_tag_value(user_uuid=users[0].uuid, user_id=users[0].pk), users_tags)
+
+    def test_does_not_coalesce_pushes_with_different_payloads(self):
+        """
+        should send a request per payload when the pushes have different payloads
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hello'))
+        enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hola'))
+
+        PushNotificationsDeliveryWorker().run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 2)
+        self.assertEqual({request['contents']['en'] for request in self.server.received_requests},
+                         {'hello', 'hola'})
+
+    @override_settings(PUSH_NOTIFICATIONS_MAX_DEVICES_PER_REQUEST=2)
+    def test_splits_devices_across_requests(self):
+        """
+        should target at most PUSH_NOTIFICATIONS_MAX_DEVICES_PER_REQUEST devices per request
+        """
+        users = [make_user() for i in range(0, 5)]
+
+        for user in users:
+            make_device(owner=user)
+
+        enqueue_push_notification(users_ids=[user.pk for user in users],
+                                  notification=self._make_notification(text='hello'))
+
+        PushNotificationsDeliveryWorker().run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 3)
+
+        metrics = get_push_notifications_delivery_metrics()
+        self.assertEqual(metrics['requests'], 3)
+        self.assertEqual(metrics['devices'], 5)
+        self.assertEqual(metrics['devices_per_request_le_1'], 1)
+        self.assertEqual(metrics['devices_per_request_le_10'], 2)
+        self.assertEqual(metrics['batches'], 1)
+
+    def test_retries_failed_requests(self):
+        """
+        should retry the requests failing with a server error
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        self.server.responses_statuses = [503, 500]
+
+        enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hello'))
+
+        PushNotificationsDeliveryWorker().run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 3)
+        # OneSignal sends the retried request once, whichever attempt reached it
+        self.assertEqual(len({request['external_id'] for request in self.server.received_requests}), 1)
+
+        metrics = get_push_notifications_delivery_metrics()
+        self.assertEqual(metrics['requests'], 1)
+        self.assertEqual(metrics['retries'], 2)
+
+    @override_settings(PUSH_NOTIFICATIONS_DELIVERY_MAX_RETRIES=0)
+    def test_queues_again_pushes_whose_requests_failed(self):
+        """
+        should queue again the pushes whose requests all failed and deliver them with the same idempotency keys
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        self.server.responses_statuses = [503]
+
+        enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hello'))
+
+        PushNotificationsDeliveryWorker().run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 2)
+        self.assertEqual(len({request['external_id'] for request in self.server.received_requests}), 1)
+        self.assertEqual(django_rq.get_connection().llen('test_push_notifications:pending'), 0)
+
+    def test_delivers_pushes_left_by_a_previous_run(self):
+        """
+        should deliver the processing pushes left by a previous run of a worker with the same name
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hello'))
+
+        # A run which crashed after taking the pushes
+        crashed_worker = PushNotificationsDeliveryWorker(name='test')
+        crashed_worker.move_pending_pushes_to_processing(
+            keys=['test_push_notifications:pending', crashed_worker.processing_key], args=[10])
+
+        PushNotificationsDeliveryWorker(name='test').run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 1)
+        self.assertEqual(django_rq.get_connection().llen(crashed_worker.processing_key), 0)
+
+    def test_does_not_retry_rejected_requests(self):
+        """
+        should not retry the requests rejected with a client error
+        """
+        user = make_user()
+        make_device(owner=user)
+
+        self.server.responses_statuses = [400]
+
+        enqueue_push_notification(users_ids=[user.pk], notification=self._make_notification(text='hello'))
+
+        PushNotificationsDeliveryWorker().run(burst=True)
+
+        self.assertEqual(len(self.server.received_requests), 1)
+        self.assertEqual(get_push_notifications_delivery_metrics()['failed_requests'], 1)
+
+    def _make_notification(self, text):
+        return onesignal_sdk.Notification(post_body={
+            "contents": {"en": text}
+        })
+
+    def _clear_redis_keys(self):
+        connection = django_rq.get_connection()
+        connection.delete('test_push_notifications:pending', 'test_push_notifications:metrics',
+                          *connection.keys('test_push_notifications:pending:processing:*'))
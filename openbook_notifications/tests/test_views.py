@@ -1,5 +1,9 @@
 import json
+from unittest.mock import patch
 
+import django_rq
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
@@ -7,6 +11,7 @@ from openbook_common.tests.models import OpenbookAPITestCase
 
 from openbook_common.tests.helpers import make_user, make_authentication_headers_for_user, make_notification
 from openbook_notifications.models import Notification
+from openbook_notifications.unread_notifications_counts import make_unread_notifications_count_key
 
 fake = Faker()
 
@@ -112,6 +117,34 @@ class NotificationsAPITests(OpenbookAPITestCase):
 
         self.assertFalse(Notification.objects.filter(owner=user).exists())
 
+    def test_retrieving_notifications_queries_do_not_grow_with_notifications(self):
+        """
+        should load the content objects of the notifications with the same amount of queries regardless of their amount
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        make_user().follow_user_with_id(user_id=user.pk)
+
+        with CaptureQueriesContext(connection) as single_notification_queries:
+            response = self.client.get(self._get_url(), **headers)
+
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+        followers = [make_user() for i in range(0, 4)]
+
+        for follower in followers:
+            follower.follow_user_with_id(user_id=user.pk)
+
+        with CaptureQueriesContext(connection) as several_notifications_queries:
+            response = self.client.get(self._get_url(), **headers)
+
+        response_notifications = json.loads(response.content)
+
+        self.assertEqual(len(response_notifications), 5)
+        self.assertEqual(response_notifications[0]['content_object']['follower']['username'], followers[-1].username)
+        self.assertEqual(len(several_notifications_queries), len(single_notification_queries))
+
     def _get_url(self):
         return reverse('notifications')
 
@@ -332,6 +365,16 @@ class UnreadNotificationsCountAPITests(OpenbookAPITestCase):
     UnreadNotificationsCountAPI
     """
 
+    def setUp(self):
+        super(UnreadNotificationsCountAPITests, self).setUp()
+        # The counts are changed once committed, which test cases never do
+        self.on_commit_patcher = patch('django.db.transaction.on_commit', side_effect=lambda func: func())
+        self.on_commit_patcher.start()
+
+    def tearDown(self):
+        self.on_commit_patcher.stop()
+        super(UnreadNotificationsCountAPITests, self).tearDown()
+
     def test_should_be_able_to_get_unread_notifications_count(self):
         """
         should be able to get all unread count notifications and return 200
@@ -417,6 +460,58 @@ class UnreadNotificationsCountAPITests(OpenbookAPITestCase):
 
         self.assertEqual(parsed_response['count'], len(valid_ids))
 
+    def test_unread_notifications_count_does_not_query_notifications(self):
+        """
+        should get the unread notifications count without querying the notifications
+        """
+        user = make_user()
+
+        for i in range(0, 3):
+            make_notification(owner=user)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        with CaptureQueriesContext(connection) as captured_queries:
+            response = self.client.get(url, {}, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)['count'], 3)
+        self.assertFalse(any(Notification._meta.db_table in query['sql'] for query in captured_queries))
+
+    def test_unread_notifications_count_follows_reads_and_deletes(self):
+        """
+        should update the unread notifications count when notifications are read or deleted
+        """
+        user = make_user()
+
+        notifications = [make_notification(owner=user) for i in range(0, 5)]
+
+        user.read_notification_with_id(notification_id=notifications[0].pk)
+        user.read_notification_with_id(notification_id=notifications[0].pk)
+        user.delete_notification_with_id(notification_id=notifications[1].pk)
+
+        self.assertEqual(self._get_unread_notifications_count(user=user), 3)
+
+        user.read_notifications(max_id=notifications[3].pk)
+
+        self.assertEqual(self._get_unread_notifications_count(user=user), 1)
+
+    def test_unread_notifications_count_is_recomputed_when_missing(self):
+        """
+        should recompute the unread notifications count from the notifications when it is not stored
+        """
+        user = make_user()
+
+        for i in range(0, 2):
+            make_notification(owner=user)
+
+        django_rq.get_connection().delete(make_unread_notifications_count_key(user_id=user.pk))
+
+        make_notification(owner=user)
+
+        self.assertEqual(self._get_unread_notifications_count(user=user), 3)
+
     def test_should_not_be_able_to_get_unread_notifications_count_with_bad_type(self):
         """
         should return 400 if an invalid notification type is specified
@@ -440,3 +535,9 @@ class UnreadNotificationsCountAPITests(OpenbookAPITestCase):
 
     def _get_url(self):
             return reverse('unread-notifications-count')
+
+    def _get_unread_notifications_count(self, user):
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+        response = self.client.get(url, {}, **headers)
+        return json.loads(response.content)['count']
@@ -0,0 +1,120 @@
+import django_rq
+from django.conf import settings
+from django.db.models import Count
+
+from openbook_common.utils.model_loaders import get_notification_model
+
+# Only adjusts the counters of users which are loaded, a missing counter is recomputed from the database when read
+INCREMENT_LOADED_UNREAD_NOTIFICATIONS_COUNT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+end
+return nil
+"""
+
+
+def get_unread_notifications_count_for_user_with_id(user_id, types=None):
+    """
+    Returns the unread notifications count of the user, optionally only of the given notification types.
+    The counts are kept per notification type in a Redis hash, so the lookup does not depend on the amount of
+    notifications of the user.
+    """
+    Notification = get_notification_model()
+    types = types or Notification.get_notification_types_values()
+
+    connection = django_rq.get_connection()
+    counts = connection.hmget(make_unread_notifications_count_key(user_id=user_id), types)
+
+    if None in counts:
+        loaded_counts = load_unread_notifications_counts_for_users_with_ids(users_ids=[user_id],
+                                                                            connection=connection)[user_id]
+        counts = [loaded_counts[notification_type] for notification_type in types]
+
+    # A counter can drift below zero until it is reconciled
+    return max(sum(int(count) for count in counts), 0)
+
+
+def increment_unread_notifications_count_for_user_with_id(user_id, notification_type, amount=1):
+    increment_unread_notifications_counts({(user_id, notification_type): amount})
+
+
+def decrement_unread_notifications_count_for_user_with_id(user_id, notification_type, amount=1):
+    increment_unread_notifications_counts({(user_id, notification_type): -amount})
+
+
+def increment_unread_notifications_counts(counts):
+    """
+    Increments the unread notifications counts given as a dict of {(user_id, notification_type): amount}
+    """
+    if not counts:
+        return
+
+    connection = django_rq.get_connection()
+    increment_script = connection.register_script(INCREMENT_LOADED_UNREAD_NOTIFICATIONS_COUNT_SCRIPT)
+
+    pipeline = connection.pipeline(transaction=False)
+
+    for (user_id, notification_type), amount in counts.items():
+        increment_script(keys=[make_unread_notifications_count_key(user_id=user_id)],
+                         args=[notification_type, amount], client=pipeline)
+
+    pipeline.execute()
+
+
+def reset_unread_notifications_counts_for_user_with_id(user_id):
+    """
+    Sets all the unread notifications counts of a user to zero, eg. for a newly created user
+    """
+    Notification = get_notification_model()
+
+    _set_unread_notifications_counts(counts={
+        user_id: {notification_type: 0 for notification_type in Notification.get_notification_types_values()}
+    }, connection=django_rq.get_connection())
+
+
+def load_unread_notifications_counts_for_users_with_ids(users_ids, connection=None):
+    """
+    Recomputes the unread notifications counts of the given users from the database and stores them
+    """
+    Notification = get_notification_model()
+    notification_types = Notification.get_notification_types_values()
+
+    counts = {user_id: {notification_type: 0 for notification_type in notification_types} for user_id in
+              users_ids}
+
+    unread_notifications_counts = Notification.objects.filter(owner_id__in=users_ids, read=False).values(
+        'owner_id', 'notification_type').annotate(count=Count('id')).order_by()
+
+    for unread_notifications_count in unread_notifications_counts:
+        counts[unread_notifications_count['owner_id']][unread_notifications_count['notification_type']] = \
+            unread_notifications_count['count']
+
+    _set_unread_notifications_counts(counts=counts, connection=connection or django_rq.get_connection())
+
+    return counts
+
+
+def get_users_ids_with_loaded_unread_notifications_counts(count=None):
+    """
+    Iterates over the ids of the users whose unread notifications counts are stored
+    """
+    connection = django_rq.get_connection()
+    key_prefix = settings.UNREAD_NOTIFICATIONS_COUNT_KEY_PREFIX
+
+    for key in connection.scan_iter(match='%s*' % key_prefix, count=count):
+        yield int(key.decode('utf-8')[len(key_prefix):])
+
+
+def make_unread_notifications_count_key(user_id):
+    return '%s%d' % (settings.UNREAD_NOTIFICATIONS_COUNT_KEY_PREFIX, user_id)
+
+
+def _set_unread_notifications_counts(counts, connection):
+    pipeline = connection.pipeline(transaction=False)
+
+    for user_id, user_counts in counts.items():
+        key = make_unread_notifications_count_key(user_id=user_id)
+        pipeline.hmset(key, user_counts)
+        pipeline.expire(key, settings.UNREAD_NOTIFICATIONS_COUNT_TTL)
+
+    pipeline.execute()
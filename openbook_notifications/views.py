@@ -7,6 +7,7 @@ from rest_framework.views import APIView
 
 from openbook_common.utils.helpers import normalize_list_value_in_request_data
 from openbook_moderation.permissions import IsNotSuspended
+from openbook_notifications.helpers import load_notifications_content_objects
 from openbook_notifications.serializers import GetNotificationsSerializer, GetNotificationsNotificationSerializer, \
     DeleteNotificationSerializer, ReadNotificationSerializer, ReadNotificationsSerializer, \
     UnreadNotificationsCountSerializer
@@ -30,7 +31,9 @@ class Notifications(APIView):
         max_id = data.get('max_id')
         types = data.get('types')
 
-        notifications = user.get_notifications(max_id=max_id, types=types).order_by('-created')[:count]
+        notifications = list(user.get_notifications(max_id=max_id, types=types).order_by('-created')[:count])
+
+        load_notifications_content_objects(notifications=notifications)
 
         response_serializer = GetNotificationsNotificationSerializer(notifications, many=True,
                                                                      context={"request": request})
@@ -87,9 +90,12 @@ class UnreadNotificationsCount(APIView):
         max_id = data.get('max_id')
         types = data.get('types')
 
-        notifications = user.get_unread_notifications(max_id=max_id, types=types)
+        if max_id:
+            count = user.get_unread_notifications(max_id=max_id, types=types).count()
+        else:
+            count = user.count_unread_notifications(types=types)
 
-        return Response({'count': notifications.count()}, status=status.HTTP_200_OK)
+        return Response({'count': count}, status=status.HTTP_200_OK)
 
 
 class NotificationItem(APIView):
@@ -1,3 +1,4 @@
+from PIL import Image
 from django.conf import settings
 from rest_framework.exceptions import ValidationError
 from django.utils.translation import ugettext_lazy as _
@@ -54,3 +55,13 @@ def check_can_be_published(post):
 def check_mimetype_is_supported_media_mimetypes(mimetype):
     if not mimetype in settings.SUPPORTED_MEDIA_MIMETYPES:
         raise ValidationError(_('%s is not a supported mimetype') % mimetype, )
+
+
+def check_media_image_can_be_read(image):
+    # Only checks the structure of the image, it is decoded once processed by the process_post_media job
+    try:
+        Image.open(image).verify()
+    except Exception:
+        raise ValidationError(_('The image could not be read'))
+    finally:
+        image.seek(0)
@@ -1,6 +1,11 @@
 import uuid
 from os.path import splitext
 
+from django.db.models import prefetch_related_objects
+
+from openbook_common.utils.model_loaders import get_post_model, get_post_reaction_model, get_circle_model, \
+    get_community_membership_model, get_post_comment_model, get_post_comment_reaction_model
+
 
 def upload_to_post_directory(post, filename):
     return _upload_to_post_directory_directory(post=post, filename=filename)
@@ -25,3 +30,119 @@ def _upload_to_post_directory_directory(post, filename):
 
     return '%(path)s%(new_filename)s' % {'path': path,
                                          'new_filename': new_filename, }
+
+
+def make_posts_serializer_context(request, posts):
+    """
+    Preloads the request user data of a page of posts in a handful of grouped queries.
+    The fields at openbook_common.serializers_fields.post read it from the context instead of querying per post.
+    """
+    context = {'request': request}
+
+    request_user = request.user
+
+    if request_user.is_anonymous or not posts:
+        return context
+
+    Post = get_post_model()
+    PostReaction = get_post_reaction_model()
+    Circle = get_circle_model()
+    CommunityMembership = get_community_membership_model()
+
+    posts_ids = [post.pk for post in posts]
+
+    context['preloaded_posts_ids'] = set(posts_ids)
+
+    context['posts_reactions'] = {
+        post_reaction.post_id: post_reaction for post_reaction in
+        request_user.post_reactions.select_related('emoji').filter(post_id__in=posts_ids)
+    }
+
+    context['posts_comments_counts'] = Post.count_comments_for_posts_with_user(posts=posts, user=request_user)
+
+    context['posts_reactions_emoji_counts'] = PostReaction.get_emoji_counts_for_posts_with_user(posts=posts,
+                                                                                              user=request_user)
+
+    context['muted_posts_ids'] = set(
+        request_user.post_mutes.filter(post_id__in=posts_ids).values_list('post_id', flat=True))
+
+    context['public_posts_ids'] = set(
+        Circle.posts.through.objects.filter(post_id__in=posts_ids, circle_id=Circle.get_world_circle_id()).values_list(
+            'post_id', flat=True))
+
+    communities_ids = {post.community_id for post in posts if post.community_id}
+
+    # Memberships of the posts creators and of the request user in the posts communities
+    communities_memberships_users_ids = {post.creator_id for post in posts if post.community_id}
+    communities_memberships_users_ids.add(request_user.pk)
+
+    context['preloaded_communities_ids'] = communities_ids
+
+    context['communities_memberships'] = {
+        (community_membership.community_id, community_membership.user_id): community_membership for
+        community_membership in
+        CommunityMembership.objects.filter(community_id__in=communities_ids,
+                                           user_id__in=communities_memberships_users_ids)
+    } if communities_ids else {}
+
+    return context
+
+
+def make_post_comments_serializer_context(request, post, post_comments, sort_query, replies_count):
+    """
+    Preloads a page of comments of a post with the first replies_count replies of each, along with the request user
+    data of all of them, in a fixed number of queries. The fields at openbook_common.serializers_fields.post_comment
+    read it from the context instead of querying per comment.
+    """
+    context = {'request': request, 'sort_query': sort_query}
+
+    request_user = request.user
+
+    if request_user.is_anonymous or not post_comments:
+        return context
+
+    PostComment = get_post_comment_model()
+    PostCommentReaction = get_post_comment_reaction_model()
+    CommunityMembership = get_community_membership_model()
+
+    post_comments_replies = request_user.get_first_replies_for_post_comments_with_post(post=post,
+                                                                                       post_comments=post_comments,
+                                                                                       sort_query=sort_query,
+                                                                                       count=replies_count)
+
+    replies = [reply for post_comment_replies in post_comments_replies.values() for reply in post_comment_replies]
+    all_post_comments = list(post_comments) + replies
+    all_post_comments_ids = [post_comment.pk for post_comment in all_post_comments]
+
+    prefetch_related_objects(all_post_comments, 'post__community', 'commenter__profile__badges', 'language',
+                             'hashtags')
+    prefetch_related_objects(replies, 'parent_comment__language')
+
+    context['preloaded_post_comments_ids'] = set(all_post_comments_ids)
+
+    context['post_comments_replies'] = post_comments_replies
+
+    context['post_comments_replies_counts'] = PostComment.count_replies_for_post_comments_with_user(
+        post_comments=post_comments, user=request_user)
+
+    context['post_comments_reactions'] = {
+        post_comment_reaction.post_comment_id: post_comment_reaction for post_comment_reaction in
+        request_user.post_comment_reactions.select_related('emoji').filter(post_comment_id__in=all_post_comments_ids)
+    }
+
+    context['post_comments_reactions_emoji_counts'] = PostCommentReaction.get_emoji_counts_for_post_comments_with_user(
+        post_comments=all_post_comments, user=request_user)
+
+    context['muted_post_comments_ids'] = set(
+        request_user.post_comment_mutes.filter(post_comment_id__in=all_post_comments_ids).values_list(
+            'post_comment_id', flat=True))
+
+    context['communities_memberships'] = {
+        (community_membership.community_id, community_membership.user_id): community_membership for
+        community_membership in
+        CommunityMembership.objects.filter(community_id=post.community_id,
+                                           user_id__in={post_comment.commenter_id for post_comment in
+                                                        all_post_comments})
+    } if post.community_id else {}
+
+    return context
@@ -1,47 +1,243 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from django.utils import timezone
 from django_rq import job
 from video_encoding import tasks
 from datetime import timedelta
-from django.db.models import Q, Count
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q, Count, Max, OuterRef, Subquery, IntegerField
+from django.db.models.functions import Coalesce
+from rq import get_current_job
 from django.conf import settings
 from cursor_pagination import CursorPaginator
 
 from openbook_common.utils.model_loaders import get_post_model, get_post_media_model, get_community_model, \
-    get_top_post_model, get_post_comment_model, get_moderated_object_model, get_trending_post_model
+    get_top_post_model, get_moderated_object_model, get_trending_post_model, \
+    get_timeline_post_model, get_user_model, get_notification_model, get_community_new_post_notification_model, \
+    get_user_new_post_notification_model, get_post_image_model, get_post_video_model, get_post_comment_model, \
+    get_post_reaction_model, get_post_comment_reaction_model, get_post_reaction_emoji_count_model, \
+    get_post_comment_reaction_emoji_count_model
+from openbook_common.helpers import get_language_for_text
+from openbook_common.utils.helpers import delete_file_field
+from openbook_notifications.helpers import send_community_new_post_push_notifications, \
+    send_user_new_post_push_notifications
+from openbook_notifications.unread_notifications_counts import increment_unread_notifications_counts
+from openbook_posts.queries import make_only_top_post_candidates_query, make_only_top_post_eligible_posts_query
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 @job('low')
-def flush_draft_posts():
+def flush_draft_posts(min_id=None):
     """
-    This job should be scheduled to get all pending draft posts for a day and remove them
+    This job should be scheduled to get all pending draft posts for a day and remove them.
+    Draft posts are flushed in chunks ordered by id. Once DRAFT_POSTS_FLUSH_TIME_BUDGET is spent, the job enqueues
+    itself to continue after the last flushed chunk.
     """
     Post = get_post_model()
 
-    draft_posts = Post.objects.filter(status=Post.STATUS_DRAFT,
-                                      modified__lt=timezone.now() - timezone.timedelta(days=1)).all()
+    start = time.monotonic()
+    modified_before = timezone.now() - timezone.timedelta(days=1)
+
+    draft_posts_query = Q(status=Post.STATUS_DRAFT, modified__lt=modified_before)
+
+    if min_id:
+        draft_posts_query.add(Q(id__gt=min_id), Q.AND)
 
     flushed_posts = 0
 
-    for draft_post in draft_posts.iterator():
-        draft_post.delete()
-        flushed_posts = flushed_posts + 1
+    while True:
+        draft_posts_ids = list(Post.objects.filter(draft_posts_query).order_by('id').values_list('id', flat=True)[
+                               :settings.DRAFT_POSTS_FLUSH_BATCH_SIZE])
+
+        if not draft_posts_ids:
+            break
+
+        flushed_posts += _flush_draft_posts_with_ids(posts_ids=draft_posts_ids, modified_before=modified_before)
+
+        draft_posts_query = Q(status=Post.STATUS_DRAFT, modified__lt=modified_before, id__gt=draft_posts_ids[-1])
+
+        if time.monotonic() - start > settings.DRAFT_POSTS_FLUSH_TIME_BUDGET:
+            flush_draft_posts.delay(min_id=draft_posts_ids[-1])
+            return 'Flushed %s posts, continuing after post with id %d' % (str(flushed_posts), draft_posts_ids[-1])
 
     return 'Flushed %s posts' % str(flushed_posts)
 
 
+def _flush_draft_posts_with_ids(posts_ids, modified_before):
+    """
+    Deletes the draft posts with one bulk delete and then deletes their media files concurrently.
+    The files are only deleted once the posts are, so a failure never leaves posts without their files.
+    """
+    Post = get_post_model()
+
+    with transaction.atomic():
+        # Posts published since they were selected are left alone
+        draft_posts_ids = list(
+            Post.objects.select_for_update().filter(id__in=posts_ids, status=Post.STATUS_DRAFT,
+                                                    modified__lt=modified_before).values_list('id', flat=True))
+
+        media_files = _get_media_files_for_posts_with_ids(posts_ids=draft_posts_ids)
+
+        Post.objects.filter(id__in=draft_posts_ids).delete()
+
+    with ThreadPoolExecutor(max_workers=settings.DRAFT_POSTS_FLUSH_MEDIA_DELETION_THREADS) as executor:
+        for media_file, result in zip(media_files, executor.map(_delete_media_file, media_files)):
+            if not result:
+                logger.warning('Could not delete draft post media file %s' % media_file.name)
+
+    return len(draft_posts_ids)
+
+
+def _get_media_files_for_posts_with_ids(posts_ids):
+    PostImage = get_post_image_model()
+    PostVideo = get_post_video_model()
+
+    media_files = []
+
+    post_images = list(
+        PostImage.objects.filter(post_id__in=posts_ids).only('id', 'hash', 'image', 'thumbnail', 'raw_file'))
+
+    for post_image in post_images:
+        media_files.extend([post_image.image, post_image.thumbnail, post_image.raw_file])
+
+    post_videos = list(PostVideo.objects.filter(post_id__in=posts_ids).only('id', 'hash', 'file', 'thumbnail',
+                                                                            'raw_file').prefetch_related('format_set'))
+
+    for post_video in post_videos:
+        media_files.extend([post_video.file, post_video.thumbnail, post_video.raw_file])
+        media_files.extend([video_format.file for video_format in post_video.format_set.all()])
+
+    # Files are shared by the media with the same hash, they are kept while other posts still reference them
+    shared_files_names = PostImage.get_files_names_shared_with_other_posts(
+        hashes={post_image.hash for post_image in post_images if post_image.hash}, posts_ids=posts_ids)
+    shared_files_names.update(PostVideo.get_files_names_shared_with_other_posts(
+        hashes={post_video.hash for post_video in post_videos if post_video.hash}, posts_ids=posts_ids))
+
+    unshared_media_files = {}
+
+    for media_file in media_files:
+        if media_file and media_file.name not in shared_files_names:
+            unshared_media_files[media_file.name] = media_file
+
+    return list(unshared_media_files.values())
+
+
+def _delete_media_file(media_file):
+    try:
+        delete_file_field(media_file)
+    except Exception as e:
+        logger.exception(e)
+        return False
+    return True
+
+
+@job('low')
+def reconcile_posts_counters(min_id=0):
+    """
+    This job should be scheduled daily to recompute the maintained reactions and comments counters of posts and
+    post comments, correcting the drift of bulk changes which bypass them.
+    Posts are reconciled in ranges of ids. Once POSTS_COUNTERS_RECONCILE_TIME_BUDGET is spent, the job enqueues
+    itself to continue after the last reconciled range.
+    """
+    Post = get_post_model()
+
+    start = time.monotonic()
+    batch_size = settings.POSTS_COUNTERS_RECONCILE_BATCH_SIZE
+    max_post_id = Post.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+    for min_post_id in range(min_id, max_post_id + 1, batch_size):
+        reconcile_counters_of_posts_with_ids_in_range(min_post_id=min_post_id, max_post_id=min_post_id + batch_size)
+
+        if time.monotonic() - start > settings.POSTS_COUNTERS_RECONCILE_TIME_BUDGET:
+            reconcile_posts_counters.delay(min_id=min_post_id + batch_size)
+            return 'Reconciled posts with id up to %d, continuing after them' % (min_post_id + batch_size)
+
+    return 'Reconciled the counters of posts with id up to %d' % max_post_id
+
+
+def reconcile_counters_of_posts_with_ids_in_range(min_post_id, max_post_id):
+    Post = get_post_model()
+    PostComment = get_post_comment_model()
+    PostReaction = get_post_reaction_model()
+    PostCommentReaction = get_post_comment_reaction_model()
+    PostReactionEmojiCount = get_post_reaction_emoji_count_model()
+    PostCommentReactionEmojiCount = get_post_comment_reaction_emoji_count_model()
+
+    unique_reactors_count = PostReaction.objects.filter(post_id=OuterRef('pk')).order_by().values(
+        'post_id').annotate(count=Count('reactor_id', distinct=True)).values('count')
+
+    unique_commenters_count = PostComment.objects.filter(post_id=OuterRef('pk'),
+                                                         is_deleted=False).order_by().values(
+        'post_id').annotate(count=Count('commenter_id', distinct=True)).values('count')
+
+    comments_count = PostComment.objects.filter(post_id=OuterRef('pk'), parent_comment__isnull=True,
+                                                is_deleted=False).order_by().values('post_id').annotate(
+        count=Count('id')).values('count')
+
+    replies_count = PostComment.objects.filter(parent_comment_id=OuterRef('pk')).order_by().values(
+        'parent_comment_id').annotate(count=Count('id')).values('count')
+
+    with transaction.atomic():
+        Post.objects.filter(id__gte=min_post_id, id__lt=max_post_id).update(
+            unique_reactors_count=Coalesce(Subquery(unique_reactors_count, output_field=IntegerField()), 0),
+            unique_commenters_count=Coalesce(Subquery(unique_commenters_count, output_field=IntegerField()), 0),
+            comments_count=Coalesce(Subquery(comments_count, output_field=IntegerField()), 0),
+        )
+
+        PostComment.objects.filter(post_id__gte=min_post_id, post_id__lt=max_post_id).update(
+            replies_count=Coalesce(Subquery(replies_count, output_field=IntegerField()), 0))
+
+        PostReactionEmojiCount.objects.filter(post_id__gte=min_post_id, post_id__lt=max_post_id).delete()
+
+        post_reactions_emoji_counts = PostReaction.objects.filter(post_id__gte=min_post_id,
+                                                                  post_id__lt=max_post_id).order_by().values(
+            'post_id', 'emoji_id').annotate(count=Count('id'))
+
+        PostReactionEmojiCount.objects.bulk_create([
+            PostReactionEmojiCount(post_id=emoji_count['post_id'], emoji_id=emoji_count['emoji_id'],
+                                   count=emoji_count['count']) for emoji_count in post_reactions_emoji_counts
+        ])
+
+        PostCommentReactionEmojiCount.objects.filter(post_comment__post_id__gte=min_post_id,
+                                                     post_comment__post_id__lt=max_post_id).delete()
+
+        post_comment_reactions_emoji_counts = PostCommentReaction.objects.filter(
+            post_comment__post_id__gte=min_post_id, post_comment__post_id__lt=max_post_id).order_by().values(
+            'post_comment_id', 'emoji_id').annotate(count=Count('id'))
+
+        PostCommentReactionEmojiCount.objects.bulk_create([
+            PostCommentReactionEmojiCount(post_comment_id=emoji_count['post_comment_id'],
+                                          emoji_id=emoji_count['emoji_id'], count=emoji_count['count']) for
+            emoji_count in post_comment_reactions_emoji_counts
+        ])
+
+
 @job('high')
 def process_post_media(post_id):
     """
-    This job is called to process post media and mark it as published
+    This job is called to process post media and mark it as published.
+    The raw uploads are resized, thumbnailed and probed here instead of within the upload request.
     """
     Post = get_post_model()
     PostMedia = get_post_media_model()
-    post = Post.objects.get(pk=post_id)
+    # The language is detected by its own job meanwhile, saving the post must not write it back
+    post = Post.objects.defer('language').get(pk=post_id)
     logger.info('Processing media of post with id: %d' % post_id)
 
+    post._process_media()
+
+    if post.is_empty():
+        # None of the media could be processed, the creator can add media to the draft again
+        post.status = Post.STATUS_DRAFT
+        post.save()
+        logger.warning('Could not process any media of post with id: %d' % post_id)
+        return
+
     post_media_videos = post.media.filter(type=PostMedia.MEDIA_TYPE_VIDEO)
 
     for post_media_video in post_media_videos.iterator():
@@ -56,65 +252,36 @@ def process_post_media(post_id):
 @job('low')
 def curate_top_posts():
     """
-    Curates the top posts.
+    Curates the top posts that were not promoted when their counters crossed the criteria,
+    e.g. posts that were closed at the time and reopened since.
     This job should be scheduled to be run every n hours.
     """
     Post = get_post_model()
-    Community = get_community_model()
-    PostComment = get_post_comment_model()
-    ModeratedObject = get_moderated_object_model()
     TopPost = get_top_post_model()
     logger.info('Processing top posts at %s...' % timezone.now())
 
-    top_posts_community_query = Q(top_post__isnull=True)
-    top_posts_community_query.add(Q(community__isnull=False, community__type=Community.COMMUNITY_TYPE_PUBLIC), Q.AND)
-    top_posts_community_query.add(Q(is_closed=False, is_deleted=False, status=Post.STATUS_PUBLISHED), Q.AND)
-    top_posts_community_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
-
-    top_posts_criteria_query = Q(total_comments_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) | \
-                               Q(reactions_count__gte=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
+    top_posts_query = Q(top_post__isnull=True)
+    top_posts_query.add(make_only_top_post_candidates_query(), Q.AND)
+    top_posts_query.add(make_only_top_post_eligible_posts_query(), Q.AND)
 
-    posts_select_related = 'community'
-    posts_prefetch_related = ('comments__commenter', 'reactions__reactor')
-    posts_only = ('id', 'status', 'is_deleted', 'is_closed', 'community__type')
-
-    posts = Post.objects. \
-        select_related(posts_select_related). \
-        prefetch_related(*posts_prefetch_related). \
-        only(*posts_only). \
-        filter(top_posts_community_query). \
-        annotate(total_comments_count=Count('comments__commenter_id'),
-                 reactions_count=Count('reactions__reactor_id')). \
-        filter(top_posts_criteria_query)
+    posts_ids = Post.objects.filter(top_posts_query).values_list('id', flat=True)
 
     top_posts_objects = []
     total_checked_posts = 0
     total_curated_posts = 0
 
-    for post in _chunked_queryset_iterator(posts, 1000):
+    for post_id in posts_ids.iterator():
         total_checked_posts = total_checked_posts + 1
-        if not post.reactions_count >= settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT:
-            unique_comments_count = PostComment.objects.filter(post=post). \
-                values('commenter_id'). \
-                annotate(user_comments_count=Count('commenter_id')).count()
-
-            if unique_comments_count >= settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT:
-                top_post = _add_post_to_top_post(post=post)
-                if top_post is not None:
-                    top_posts_objects.append(top_post)
-        else:
-            top_post = _add_post_to_top_post(post=post)
-            if top_post is not None:
-                top_posts_objects.append(top_post)
+        top_posts_objects.append(TopPost(post_id=post_id, created=timezone.now()))
 
         if len(top_posts_objects) > 1000:
-            TopPost.objects.bulk_create(top_posts_objects)
+            TopPost.objects.bulk_create(top_posts_objects, ignore_conflicts=True)
             total_curated_posts += len(top_posts_objects)
             top_posts_objects = []
 
     if len(top_posts_objects) > 0:
         total_curated_posts += len(top_posts_objects)
-        TopPost.objects.bulk_create(top_posts_objects)
+        TopPost.objects.bulk_create(top_posts_objects, ignore_conflicts=True)
 
     return 'Checked: %d. Curated: %d' % (total_checked_posts, total_curated_posts)
 
@@ -127,7 +294,6 @@ def clean_top_posts():
     Post = get_post_model()
     Community = get_community_model()
     TopPost = get_top_post_model()
-    PostComment = get_post_comment_model()
     ModeratedObject = get_moderated_object_model()
 
     # if any of these is true, we will remove the top post
@@ -138,64 +304,12 @@ def clean_top_posts():
     top_posts_community_query.add(Q(post__status=Post.STATUS_PROCESSING), Q.OR)
     top_posts_community_query.add(Q(post__moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.OR)
 
-    # counts less than minimum
-    top_posts_criteria_query = Q(total_comments_count__lt=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) & \
-                               Q(reactions_count__lt=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
-
-    posts_select_related = 'post__community'
-    posts_prefetch_related = ('post__comments__commenter', 'post__reactions__reactor')
-    posts_only = ('post__id', 'post__status', 'post__is_deleted', 'post__is_closed', 'post__community__type')
-
-    direct_removable_top_posts = TopPost.objects.select_related(posts_select_related). \
-        prefetch_related(*posts_prefetch_related). \
-        only(*posts_only). \
-        filter(top_posts_community_query). \
-        annotate(total_comments_count=Count('post__comments__commenter_id'),
-                 reactions_count=Count('post__reactions__reactor_id')). \
-        filter(top_posts_criteria_query)
-
-    # bulk delete all that definitely dont meet the criteria anymore
-    direct_removable_top_posts.delete()
-
-    # Now we need to only check the ones where the unique comments count might have dropped,
-    # while all other criteria is fine
+    # counts less than minimum, normally already demoted when the counters dropped
+    top_posts_community_query.add(Q(post__unique_reactors_count__lt=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT,
+                                    post__unique_commenters_count__lt=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT),
+                                  Q.OR)
 
-    top_posts_community_query = Q(post__community__isnull=False, post__community__type=Community.COMMUNITY_TYPE_PUBLIC)
-    top_posts_community_query.add(Q(post__is_closed=False, post__is_deleted=False, post__status=Post.STATUS_PUBLISHED),
-                                  Q.AND)
-    top_posts_community_query.add(~Q(post__moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
-
-    top_posts_criteria_query = Q(total_comments_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT) | \
-                               Q(reactions_count__gte=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT)
-
-    top_posts = TopPost.objects.select_related(posts_select_related). \
-        prefetch_related(*posts_prefetch_related). \
-        only(*posts_only). \
-        filter(top_posts_community_query). \
-        annotate(total_comments_count=Count('post__comments__commenter_id'),
-                 reactions_count=Count('post__reactions__reactor_id')). \
-        filter(top_posts_criteria_query)
-
-    delete_ids = []
-
-    for top_post in _chunked_queryset_iterator(top_posts, 1000):
-        if not top_post.reactions_count >= settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT:
-            unique_comments_count = PostComment.objects.filter(post=top_post.post). \
-                values('commenter_id'). \
-                annotate(user_comments_count=Count('commenter_id')).count()
-
-            if unique_comments_count < settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT:
-                delete_ids.append(top_post.pk)
-
-    # bulk delete ids
-    TopPost.objects.filter(id__in=delete_ids).delete()
-
-
-def _add_post_to_top_post(post):
-    TopPost = get_top_post_model()
-    if not TopPost.objects.filter(post=post).exists():
-        return TopPost(post=post, created=timezone.now())
-    return None
+    TopPost.objects.filter(top_posts_community_query).delete()
 
 
 @job('low')
@@ -347,6 +461,237 @@ def clean_trending_posts():
     TrendingPost.objects.filter(id__in=delete_ids).delete()
 
 
+@job('low')
+def detect_post_language(post_id):
+    Post = get_post_model()
+    post = Post.objects.filter(pk=post_id).only('id', 'text').first()
+
+    if post:
+        Post.objects.filter(pk=post_id).update(language=get_language_for_text(post.text))
+
+
+@job('low')
+def detect_post_comment_language(post_comment_id):
+    PostComment = get_post_comment_model()
+    post_comment = PostComment.objects.filter(pk=post_comment_id).only('id', 'text').first()
+
+    if post_comment:
+        PostComment.objects.filter(pk=post_comment_id).update(language=get_language_for_text(post_comment.text))
+
+
+@job('default')
+def process_post_mentions_and_hashtags(post_id):
+    Post = get_post_model()
+    post = Post.objects.filter(pk=post_id).first()
+
+    if post:
+        post.process_mentions_and_hashtags()
+
+
+@job('default')
+def process_post_comment_mentions_and_hashtags(post_comment_id):
+    PostComment = get_post_comment_model()
+    post_comment = PostComment.objects.filter(pk=post_comment_id).first()
+
+    if post_comment:
+        post_comment.process_mentions_and_hashtags()
+
+
+def enqueue_timeline_posts_job(timeline_posts_job, **kwargs):
+    """
+    Enqueues a timeline posts job, or runs it inline when TIMELINE_POSTS_JOBS_ASYNC is disabled
+    """
+    _enqueue_posts_job(timeline_posts_job, is_async=settings.TIMELINE_POSTS_JOBS_ASYNC, **kwargs)
+
+
+def enqueue_new_post_notifications_job(new_post_notifications_job, **kwargs):
+    """
+    Enqueues a new post notifications job, or runs it inline when NEW_POST_NOTIFICATIONS_JOBS_ASYNC is disabled
+    """
+    _enqueue_posts_job(new_post_notifications_job, is_async=settings.NEW_POST_NOTIFICATIONS_JOBS_ASYNC, **kwargs)
+
+
+def _enqueue_posts_job(posts_job, is_async, **kwargs):
+    if is_async:
+        # The job must not run before the rows it reads are visible to the worker
+        transaction.on_commit(lambda: posts_job.delay(**kwargs))
+    else:
+        posts_job(**kwargs)
+
+
+@job('default')
+def fan_out_new_post_notifications(post_id):
+    """
+    Creates the new post notifications of the subscribers of the post creator or community and sends their push
+    notifications, in pages of NEW_POST_NOTIFICATIONS_FAN_OUT_PAGE_SIZE subscriptions.
+    Pages are committed in subscription id order, so an interrupted fan-out resumes after its last committed page.
+    """
+    Post = get_post_model()
+    Notification = get_notification_model()
+
+    post = Post.objects.select_related('creator__profile', 'community').filter(pk=post_id).first()
+
+    if not post:
+        # Deleted since the fan-out was enqueued
+        return 'Post %d no longer exists' % post_id
+
+    if post.community_id:
+        NewPostNotification = get_community_new_post_notification_model()
+        subscriptions = Post.get_community_notification_target_subscriptions(post=post)
+        subscription_field = 'community_notifications_subscription_id'
+        notification_type = Notification.COMMUNITY_NEW_POST
+    else:
+        NewPostNotification = get_user_new_post_notification_model()
+        subscriptions = Post.get_user_notification_target_subscriptions(post=post)
+        subscription_field = 'user_notifications_subscription_id'
+        notification_type = Notification.USER_NEW_POST
+
+    new_post_notification_content_type = ContentType.objects.get_for_model(NewPostNotification)
+
+    last_subscription_id = NewPostNotification.objects.filter(post_id=post_id).aggregate(
+        last_subscription_id=Max(subscription_field))['last_subscription_id'] or 0
+
+    subscriptions = subscriptions.select_related('subscriber__notifications_settings', 'subscriber__language'). \
+        order_by('pk')
+
+    total_notified_subscribers = 0
+
+    while True:
+        subscriptions_page = list(
+            subscriptions.filter(pk__gt=last_subscription_id)[:settings.NEW_POST_NOTIFICATIONS_FAN_OUT_PAGE_SIZE])
+
+        if not subscriptions_page:
+            break
+
+        subscribers_ids = {subscription.pk: subscription.subscriber_id for subscription in subscriptions_page}
+
+        with transaction.atomic():
+            NewPostNotification.objects.bulk_create([
+                NewPostNotification(post_id=post_id, **{subscription_field: subscription_id}) for subscription_id in
+                subscribers_ids
+            ])
+
+            # bulk_create does not set the primary keys on MySQL
+            new_post_notifications = NewPostNotification.objects.filter(
+                post_id=post_id, **{'%s__in' % subscription_field: subscribers_ids.keys()}).values_list(
+                'id', subscription_field)
+
+            now = timezone.now()
+
+            Notification.objects.bulk_create([
+                Notification(notification_type=notification_type, content_type=new_post_notification_content_type,
+                             object_id=new_post_notification_id, owner_id=subscribers_ids[subscription_id],
+                             created=now) for new_post_notification_id, subscription_id in new_post_notifications
+            ])
+
+            # bulk_create does not send post_save signals, counted along with the commit of the page as a resumed
+            # fan-out skips it
+            transaction.on_commit(partial(increment_unread_notifications_counts, {
+                (subscriber_id, notification_type): 1 for subscriber_id in subscribers_ids.values()
+            }))
+
+        # Pushes are sent at most once, a page is only retried if its notifications were not committed
+        target_users = [subscription.subscriber for subscription in subscriptions_page]
+
+        if post.community_id:
+            send_community_new_post_push_notifications(community=post.community, target_users=target_users)
+        else:
+            send_user_new_post_push_notifications(post_creator=post.creator, target_users=target_users)
+
+        last_subscription_id = subscriptions_page[-1].pk
+        total_notified_subscribers += len(subscriptions_page)
+        _report_job_progress(notified_subscribers=total_notified_subscribers,
+                             last_subscription_id=last_subscription_id)
+
+    return 'Notified %d subscribers' % total_notified_subscribers
+
+
+def _report_job_progress(**progress):
+    current_job = get_current_job()
+
+    if current_job:
+        current_job.meta['progress'] = progress
+        current_job.save_meta()
+
+    logger.info('Job progress: %s' % progress)
+
+
+@job('default')
+def fan_out_post_to_timelines(post_id):
+    """
+    Adds a freshly published post to the timeline of everyone that can see it
+    """
+    Post = get_post_model()
+    TimelinePost = get_timeline_post_model()
+
+    post = Post.objects.only('id', 'creator_id', 'community_id').get(pk=post_id)
+    fanned_out_count = TimelinePost.add_post_to_timelines(post=post)
+
+    return 'Fanned out post %d to %d timelines' % (post_id, fanned_out_count)
+
+
+@job('default')
+def refresh_timeline_posts_between_users(user_a_id, user_b_id):
+    """
+    Backfills or purges the timelines of both users after a follow, connection or block change between them
+    """
+    TimelinePost = get_timeline_post_model()
+    TimelinePost.refresh_timeline_of_owner_for_creator(owner_id=user_a_id, creator_id=user_b_id)
+    TimelinePost.refresh_timeline_of_owner_for_creator(owner_id=user_b_id, creator_id=user_a_id)
+
+
+@job('default')
+def add_community_posts_to_timeline(user_id, community_id):
+    TimelinePost = get_timeline_post_model()
+    TimelinePost.add_community_posts_to_timeline_of_owner(owner_id=user_id, community_id=community_id)
+
+
+@job('default')
+def remove_community_posts_from_timeline(user_id, community_id):
+    TimelinePost = get_timeline_post_model()
+    TimelinePost.remove_community_posts_from_timeline_of_owner(owner_id=user_id, community_id=community_id)
+
+
+@job('low')
+def trim_timeline_posts():
+    """
+    Trims the timelines longer than TIMELINE_POSTS_MAX_LENGTH.
+    This job should be scheduled to be run every n hours.
+    """
+    TimelinePost = get_timeline_post_model()
+
+    owners = TimelinePost.objects.values('owner_id'). \
+        annotate(timeline_posts_count=Count('id')). \
+        filter(timeline_posts_count__gt=settings.TIMELINE_POSTS_MAX_LENGTH)
+
+    total_trimmed_timelines = 0
+    total_trimmed_posts = 0
+
+    for owner in owners.iterator():
+        total_trimmed_posts += TimelinePost.trim_timeline_of_owner(owner_id=owner['owner_id'])
+        total_trimmed_timelines += 1
+
+    return 'Trimmed timelines: %d. Trimmed posts: %d' % (total_trimmed_timelines, total_trimmed_posts)
+
+
+@job('low')
+def bootstrap_timeline_posts():
+    """
+    Bootstraps the timeline posts of every user.
+    This job should be run exactly ONCE
+    """
+    User = get_user_model()
+    TimelinePost = get_timeline_post_model()
+
+    total_bootstrapped_timelines = 0
+
+    for user in _chunked_queryset_iterator(User.objects.only('id', 'username'), 1000):
+        TimelinePost.rebuild_timeline_of_owner(owner=user)
+        total_bootstrapped_timelines += 1
+
+    return 'Bootstrapped: %d timelines' % total_bootstrapped_timelines
+
+
 def _chunked_queryset_iterator(queryset, size, *, ordering=('id',)):
     """
     Split a queryset into chunks.
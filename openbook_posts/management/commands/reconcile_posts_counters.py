@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from django.db.models import Max
+
+from openbook_common.utils.model_loaders import get_post_model
+from openbook_posts.jobs import reconcile_counters_of_posts_with_ids_in_range
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the maintained reactions and comments counters of posts and post comments in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='The amount of posts to reconcile at once')
+
+    def handle(self, *args, **options):
+        Post = get_post_model()
+
+        batch_size = options['batch_size']
+        max_post_id = Post.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+
+        for min_post_id in range(0, max_post_id + 1, batch_size):
+            reconcile_counters_of_posts_with_ids_in_range(min_post_id=min_post_id,
+                                                          max_post_id=min_post_id + batch_size)
+            logger.info('Reconciled posts with id up to %d' % min(min_post_id + batch_size, max_post_id))
+
+        logger.info('Finished reconciling the counters of %d posts' % max_post_id)
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.5 on 2026-10-18 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('openbook_posts', '0068_profilepostscommunityexclusion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelinePost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(db_index=True, editable=False)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_posts', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_posts', to='openbook_posts.Post')),
+            ],
+            options={
+                'unique_together': {('owner', 'post')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.5 on 2026-10-18 17:56
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Count, IntegerField
+from django.db.models.functions import Coalesce
+
+
+def populate_post_unique_reactors_commenters_count(apps, schema_editor):
+    Post = apps.get_model('openbook_posts', 'Post')
+    PostReaction = apps.get_model('openbook_posts', 'PostReaction')
+    PostComment = apps.get_model('openbook_posts', 'PostComment')
+
+    unique_reactors_count = PostReaction.objects.filter(post_id=OuterRef('pk')).order_by().values('post_id').annotate(
+        count=Count('reactor_id', distinct=True)).values('count')
+
+    unique_commenters_count = PostComment.objects.filter(post_id=OuterRef('pk'), is_deleted=False).order_by().values(
+        'post_id').annotate(count=Count('commenter_id', distinct=True)).values('count')
+
+    Post.objects.update(
+        unique_reactors_count=Coalesce(Subquery(unique_reactors_count, output_field=IntegerField()), 0),
+        unique_commenters_count=Coalesce(Subquery(unique_commenters_count, output_field=IntegerField()), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_posts', '0069_timelinepost'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='unique_commenters_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='unique_reactors_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(populate_post_unique_reactors_commenters_count, migrations.RunPython.noop),
+    ]
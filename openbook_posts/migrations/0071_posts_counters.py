@@ -0,0 +1,49 @@
+# Generated by Django 2.2.5 on 2026-10-18 18:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_common', '0021_auto_20190917_1806'),
+        ('openbook_posts', '0070_post_unique_reactors_commenters_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='PostReactionEmojiCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('emoji', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_reactions_emoji_counts', to='openbook_common.Emoji')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emoji_counts', to='openbook_posts.Post')),
+            ],
+            options={
+                'unique_together': {('post', 'emoji')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PostCommentReactionEmojiCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('emoji', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_comment_reactions_emoji_counts', to='openbook_common.Emoji')),
+                ('post_comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='emoji_counts', to='openbook_posts.PostComment')),
+            ],
+            options={
+                'unique_together': {('post_comment', 'emoji')},
+            },
+        ),
+    ]
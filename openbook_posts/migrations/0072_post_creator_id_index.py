@@ -0,0 +1,20 @@
+# Generated by Django 2.2.5 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('openbook_communities', '0033_auto_20191209_1337'),
+        ('openbook_posts', '0071_posts_counters'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='post',
+            index_together={('creator', 'id'), ('creator', 'community')},
+        ),
+    ]
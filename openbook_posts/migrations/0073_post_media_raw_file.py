@@ -0,0 +1,44 @@
+# Generated by Django 2.2.5 on 2026-10-18 19:55
+
+from django.db import migrations, models
+import openbook_posts.helpers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('openbook_posts', '0072_post_creator_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postimage',
+            name='raw_file',
+            field=models.FileField(null=True, upload_to=openbook_posts.helpers.upload_to_post_image_directory),
+        ),
+        migrations.AddField(
+            model_name='postvideo',
+            name='raw_file',
+            field=models.FileField(null=True, upload_to=openbook_posts.helpers.upload_to_post_video_directory),
+        ),
+        migrations.AlterField(
+            model_name='postimage',
+            name='height',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='postimage',
+            name='width',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='postvideo',
+            name='thumbnail_height',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='postvideo',
+            name='thumbnail_width',
+            field=models.PositiveIntegerField(editable=False, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 # Create your models here.
+import logging
 import os
 import tempfile
 import uuid
@@ -9,8 +10,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.core.files import File
 from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile, SimpleUploadedFile
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction, IntegrityError
+from django.db.models import Q, F
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 from django.db.models import Count
@@ -27,11 +28,12 @@ from openbook_posts.validators import post_text_validators, post_comment_text_va
 from video_encoding.backends import get_backend
 from video_encoding.fields import VideoField
 from video_encoding.models import Format
+from video_encoding.utils import get_fieldfile_local_path
 
 from openbook.storage_backends import S3PrivateMediaStorage
 from openbook_auth.models import User
 
-from openbook_common.models import Emoji, Language
+from openbook_common.models import Emoji, Language, CounterFieldsMixin
 from openbook_common.utils.helpers import delete_file_field, sha256sum, extract_usernames_from_string, get_magic, \
     write_in_memory_file_to_disk, extract_hashtags_from_string
 from openbook_common.utils.model_loaders import get_emoji_model, \
@@ -41,26 +43,33 @@ from openbook_common.utils.model_loaders import get_emoji_model, \
     get_post_user_mention_model, get_post_comment_user_mention_model, get_community_notifications_subscription_model, \
     get_community_new_post_notification_model, get_user_new_post_notification_model, \
     get_hashtag_model, get_user_notifications_subscription_model, get_trending_post_model, \
-    get_post_comment_reaction_notification_model
+    get_post_comment_reaction_notification_model, get_community_membership_model, get_follow_model, \
+    get_connection_model, get_user_block_model
 from imagekit.models import ProcessedImageField
 
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.helpers import send_post_comment_user_mention_push_notification, \
-    send_post_user_mention_push_notification, send_community_new_post_push_notification, \
-    send_user_new_post_push_notification
+    send_post_user_mention_push_notification
 from openbook_posts.checkers import check_can_be_updated, check_can_add_media, check_can_be_published, \
-    check_mimetype_is_supported_media_mimetypes
+    check_mimetype_is_supported_media_mimetypes, check_media_image_can_be_read
 from openbook_posts.helpers import upload_to_post_image_directory, upload_to_post_video_directory, \
     upload_to_post_directory
-from openbook_posts.jobs import process_post_media
+from openbook_posts.queries import make_only_items_of_users_blocked_with_user_for_posts_query, \
+    make_only_top_post_eligible_posts_query, make_exclude_reported_posts_for_user_query, \
+    make_exclude_blocked_posts_for_user_query, make_exclude_community_posts_banned_from_for_user_query
+from openbook_posts.jobs import process_post_media, fan_out_post_to_timelines, enqueue_timeline_posts_job, \
+    fan_out_new_post_notifications, enqueue_new_post_notifications_job, detect_post_language, \
+    detect_post_comment_language, process_post_mentions_and_hashtags, process_post_comment_mentions_and_hashtags
 
 magic = get_magic()
 from openbook_common.helpers import get_language_for_text
 
 post_image_storage = S3PrivateMediaStorage() if settings.IS_PRODUCTION else default_storage
 
+logger = logging.getLogger(__name__)
 
-class Post(models.Model):
+
+class Post(CounterFieldsMixin, models.Model):
     moderated_object = GenericRelation(ModeratedObject, related_query_name='posts')
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
     text = models.TextField(_('text'), max_length=settings.POST_MAX_LENGTH, blank=False, null=True,
@@ -92,17 +101,47 @@ class Post(models.Model):
                                           upload_to=upload_to_post_directory,
                                           blank=False, null=True, format='JPEG', options={'quality': 30},
                                           processors=[ResizeToFit(width=512, upscale=False)])
+    # Maintained on reaction/comment writes to curate the top posts, see Post.update_unique_reactors_count
+    unique_reactors_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+    unique_commenters_count = models.PositiveIntegerField(default=0, editable=False, db_index=True)
+    # Top level, not soft deleted comments
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('unique_reactors_count', 'unique_commenters_count', 'comments_count',)
 
     class Meta:
         index_together = [
             ('creator', 'community'),
+            # Profile posts are paginated by descending id
+            ('creator', 'id'),
         ]
 
+    @classmethod
+    def meets_top_post_counts_criteria(cls, unique_reactors_count, unique_commenters_count):
+        return unique_reactors_count >= settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT or \
+               unique_commenters_count >= settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT
+
     @classmethod
     def get_post_id_for_post_with_uuid(cls, post_uuid):
         post = cls.objects.values('id').get(uuid=post_uuid)
         return post['id']
 
+    @classmethod
+    def get_translatable_posts_with_ids(cls, posts_ids):
+        """
+        The public and community posts with a text and a language, in the order of the given ids
+        """
+        Circle = get_circle_model()
+
+        translatable_posts_query = Q(id__in=posts_ids, text__isnull=False, language__isnull=False,
+                                     status=cls.STATUS_PUBLISHED, is_deleted=False)
+        translatable_posts_query.add(Q(community__isnull=False) | Q(circles__id=Circle.get_world_circle_id()),
+                                     Q.AND)
+
+        posts = cls.objects.select_related('language').filter(translatable_posts_query).in_bulk()
+
+        return [posts[post_id] for post_id in dict.fromkeys(posts_ids) if post_id in posts]
+
     @classmethod
     def post_with_id_has_public_reactions(cls, post_id):
         return Post.objects.filter(pk=post_id, public_reactions=True).exists()
@@ -128,7 +167,7 @@ class Post(models.Model):
 
         if text:
             post.text = text
-            post.language = get_language_for_text(text)
+            post._set_language_for_text(text)
 
         if image:
             post.add_media(file=image)
@@ -156,7 +195,7 @@ class Post(models.Model):
         return Emoji.get_emoji_counts_for_post_with_id(post_id=post_id, emoji_id=emoji_id, reactor_id=reactor_id)
 
     @classmethod
-    def get_trending_posts_for_user_with_id(cls, user_id, max_id=None, min_id=None):
+    def get_trending_posts_for_user(cls, user, max_id=None, min_id=None):
         """
         Gets trending posts (communities only) for authenticated user excluding reported, closed, blocked users posts
         """
@@ -177,16 +216,17 @@ class Post(models.Model):
                       'post__community__avatar',
                       'post__community__color', 'post__community__title')
 
-        reported_posts_exclusion_query = ~Q(post__moderated_object__reports__reporter_id=user_id)
+        reported_posts_exclusion_query = make_exclude_reported_posts_for_user_query(user=user, post_field='post')
 
         trending_community_posts_query = Q(post__is_closed=False,
                                            post__is_deleted=False,
                                            post__status=Post.STATUS_PUBLISHED)
 
-        trending_community_posts_query.add(~Q(Q(post__creator__blocked_by_users__blocker_id=user_id) | Q(
-            post__creator__user_blocks__blocked_user_id=user_id)), Q.AND)
+        trending_community_posts_query.add(make_exclude_blocked_posts_for_user_query(user=user, post_field='post'),
+                                           Q.AND)
         trending_community_posts_query.add(Q(post__community__type=Community.COMMUNITY_TYPE_PUBLIC), Q.AND)
-        trending_community_posts_query.add(~Q(post__community__banned_users__id=user_id), Q.AND)
+        trending_community_posts_query.add(
+            make_exclude_community_posts_banned_from_for_user_query(user=user, post_field='post'), Q.AND)
 
         if max_id:
             trending_community_posts_query.add(Q(id__lt=max_id), Q.AND)
@@ -207,17 +247,16 @@ class Post(models.Model):
         return trending_community_posts_queryset
 
     @classmethod
-    def get_trending_posts_old_for_user_with_id(cls, user_id):
+    def get_trending_posts_old_for_user(cls, user):
         """
         For backwards compatibility reasons
         """
         trending_posts_query = cls._get_trending_posts_old_query()
-        trending_posts_query.add(~Q(community__banned_users__id=user_id), Q.AND)
+        trending_posts_query.add(make_exclude_community_posts_banned_from_for_user_query(user=user), Q.AND)
 
-        trending_posts_query.add(~Q(Q(creator__blocked_by_users__blocker_id=user_id) | Q(
-            creator__user_blocks__blocked_user_id=user_id)), Q.AND)
+        trending_posts_query.add(make_exclude_blocked_posts_for_user_query(user=user), Q.AND)
 
-        trending_posts_query.add(~Q(moderated_object__reports__reporter_id=user_id), Q.AND)
+        trending_posts_query.add(make_exclude_reported_posts_for_user_query(user=user), Q.AND)
 
         trending_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
@@ -314,7 +353,10 @@ class Post(models.Model):
                    exclude_self_query
                    )
 
-        results = target_subscriptions_excluding_blocked.union(target_subscriptions_with_staff)
+        # Not a union, so that it can be paged through when fanning out the notifications
+        results = CommunityNotificationsSubscription.objects.filter(
+            Q(pk__in=target_subscriptions_excluding_blocked.values('pk')) | Q(
+                pk__in=target_subscriptions_with_staff.values('pk')))
 
         return results
 
@@ -338,41 +380,50 @@ class Post(models.Model):
         # Subscriptions after excluding blocked users
         target_subscriptions = UserNotificationsSubscription.objects. \
             filter(user_subscriptions_query). \
-            exclude(exclude_blocked_users_query)
+            exclude(exclude_blocked_users_query). \
+            distinct()
 
         return target_subscriptions
 
     def count_comments(self):
-        return PostComment.count_comments_for_post_with_id(self.pk)
+        return self.comments_count
 
     def count_comments_with_user(self, user):
-        # Count comments excluding users blocked by authenticated user
-        count_query = ~Q(Q(commenter__blocked_by_users__blocker_id=user.pk) | Q(
-            commenter__user_blocks__blocked_user_id=user.pk))
-
-        if self.community:
-            if not user.is_staff_of_community_with_name(community_name=self.community.name):
-                # Dont retrieve comments except from staff members
-                blocked_users_query_staff_members = Q(
-                    commenter__communities_memberships__community_id=self.community.pk)
-                blocked_users_query_staff_members.add(Q(commenter__communities_memberships__is_administrator=True) | Q(
-                    commenter__communities_memberships__is_moderator=True), Q.AND)
+        return Post.count_comments_for_posts_with_user(posts=[self], user=user).get(self.pk, 0)
 
-                count_query.add(~blocked_users_query_staff_members, Q.AND)
-
-            # Don't count items that have been reported and approved by community moderators
-            ModeratedObject = get_moderated_object_model()
-            count_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
+    @classmethod
+    def count_comments_for_posts_with_user(cls, posts, user):
+        """
+        Counts the comments of a page of posts in a single grouped query, as seen by user.
+        Returns a dict of post id to comments count.
+        """
+        posts_ids = [post.pk for post in posts]
 
         # Dont count soft deleted items
-        count_query.add(Q(is_deleted=False), Q.AND)
+        count_query = Q(post_id__in=posts_ids, is_deleted=False)
 
         # Dont count items we have reported
         count_query.add(~Q(moderated_object__reports__reporter_id=user.pk), Q.AND)
 
-        return self.comments.filter(count_query).count()
+        # Don't count items that have been reported and approved by community moderators
+        ModeratedObject = get_moderated_object_model()
+        count_query.add(~Q(post__community__isnull=False, moderated_object__status=ModeratedObject.STATUS_APPROVED),
+                        Q.AND)
+
+        # Count comments excluding users blocked by authenticated user, except community staff members
+        blocked_users_query = make_only_items_of_users_blocked_with_user_for_posts_query(
+            user=user, posts=posts, item_user_field='commenter_id', include_for_community_staff=False)
+
+        if blocked_users_query:
+            count_query.add(~blocked_users_query, Q.AND)
+
+        comments_counts = PostComment.objects.filter(count_query).values('post_id').annotate(
+            comments_count=Count('id')).order_by()
+
+        return {comments_count['post_id']: comments_count['comments_count'] for comments_count in comments_counts}
 
     def count_reactions(self, reactor_id=None):
+        # Not unique_reactors_count, the reactions of deleted reactors are not counted
         return PostReaction.count_reactions_for_post_with_id(self.pk, reactor_id=reactor_id)
 
     def is_text_only_post(self):
@@ -429,9 +480,17 @@ class Post(models.Model):
         check_can_be_updated(post=self, text=text)
         self.text = text
         self.is_edited = True
-        self.language = get_language_for_text(text)
+        self._set_language_for_text(text)
         self.save()
 
+    def _set_language_for_text(self, text):
+        if settings.LANGUAGE_DETECTION_JOBS_ASYNC:
+            self.language = None
+            post_id = self.pk
+            transaction.on_commit(lambda: detect_post_language.delay(post_id=post_id))
+        else:
+            self.language = get_language_for_text(text)
+
     def get_media(self):
         return self.media
 
@@ -474,20 +533,12 @@ class Post(models.Model):
             file = File(file=converted_gif_file)
             file_mime_type = 'video'
 
-        has_other_media = self.media.exists()
-
+        # The raw upload is only stored, it is processed by the process_post_media job once published
         if file_mime_type == 'image':
-            post_image = self._add_media_image(image=file, order=order)
-            if not has_other_media:
-                self.media_width = post_image.width
-                self.media_height = post_image.height
-                self.media_thumbnail = file
+            check_media_image_can_be_read(image=file)
+            self._add_media_image(image=file, order=order)
         elif file_mime_type == 'video':
-            post_video = self._add_media_video(video=file, order=order)
-            if not has_other_media:
-                self.media_width = post_video.width
-                self.media_height = post_video.height
-                self.media_thumbnail = post_video.thumbnail.file
+            self._add_media_video(video=file, order=order)
         else:
             raise ValidationError(
                 _('Unsupported media file type')
@@ -513,6 +564,51 @@ class Post(models.Model):
     def count_media(self):
         return self.media.count()
 
+    def _process_media(self):
+        """
+        Processes the raw uploads of the post media and takes the post media thumbnail and dimensions from the
+        first one
+        """
+        for post_media in self.media.all():
+            media = post_media.content_object
+
+            try:
+                media.process()
+            except Exception as e:
+                # A corrupt upload can pass the checks of the upload request, the post goes on without it
+                logger.exception(e)
+                self._delete_unprocessable_media(post_media=post_media)
+                continue
+
+            if self.media_thumbnail:
+                continue
+
+            self.media_width = media.width
+            self.media_height = media.height
+
+            if post_media.type == PostMedia.MEDIA_TYPE_IMAGE:
+                self.media_thumbnail = media.image.file
+            else:
+                self.media_thumbnail = media.thumbnail.file
+
+        self.save()
+
+    def _delete_unprocessable_media(self, post_media):
+        media = post_media.content_object
+        media_files = [media.raw_file, media.thumbnail, media.image if post_media.type == PostMedia.MEDIA_TYPE_IMAGE
+                       else media.file]
+
+        with transaction.atomic():
+            shared_files_names = type(media).get_files_names_shared_with_other_posts(hashes=[media.hash],
+                                                                                     posts_ids=[self.pk])
+
+            post_media.delete()
+            media.delete()
+
+            for media_file in media_files:
+                if media_file and media_file.name not in shared_files_names:
+                    delete_file_field(media_file)
+
     def publish(self):
         check_can_be_published(post=self)
 
@@ -527,8 +623,11 @@ class Post(models.Model):
     def _publish(self):
         self.status = Post.STATUS_PUBLISHED
         self.created = timezone.now()
-        self._process_post_subscribers()
         self.save()
+        self._process_post_subscribers()
+        # The creator sees the post right away, the other timelines get it once fanned out
+        TimelinePost.add_post_to_timeline_of_owner(owner_id=self.creator_id, post_id=self.pk)
+        enqueue_timeline_posts_job(fan_out_post_to_timelines, post_id=self.pk)
 
     def is_draft(self):
         return self.status == Post.STATUS_DRAFT
@@ -548,18 +647,63 @@ class Post(models.Model):
 
         post = super(Post, self).save(*args, **kwargs)
 
-        self._process_post_mentions()
-        self._process_post_hashtags()
+        if settings.MENTIONS_AND_HASHTAGS_JOBS_ASYNC:
+            post_id = self.pk
+            transaction.on_commit(lambda: process_post_mentions_and_hashtags.delay(post_id=post_id))
+        else:
+            self.process_mentions_and_hashtags()
 
         return post
 
+    def process_mentions_and_hashtags(self):
+        self._process_post_mentions()
+        self._process_post_hashtags()
+
     def delete(self, *args, **kwargs):
         self.delete_media()
         super(Post, self).delete(*args, **kwargs)
 
+    def update_comments_count(self, value):
+        self._update_counter(counter_field='comments_count', value=value)
+
+    def update_unique_reactors_count(self, value):
+        self._update_top_post_counter(counter_field='unique_reactors_count', value=value)
+
+    def update_unique_commenters_count(self, value):
+        self._update_top_post_counter(counter_field='unique_commenters_count', value=value)
+
+    def _update_counter(self, counter_field, value):
+        counter_query = Q(pk=self.pk)
+
+        if value < 0:
+            counter_query.add(Q(**{'%s__gte' % counter_field: -value}), Q.AND)
+
+        return Post.objects.filter(counter_query).update(**{counter_field: F(counter_field) + value}) > 0
+
+    def _update_top_post_counter(self, counter_field, value):
+        if not self._update_counter(counter_field=counter_field, value=value):
+            return
+
+        self.refresh_from_db(fields=self.COUNTER_FIELDS)
+
+        counts = {
+            'unique_reactors_count': self.unique_reactors_count,
+            'unique_commenters_count': self.unique_commenters_count,
+        }
+        meets_top_post_counts_criteria = Post.meets_top_post_counts_criteria(**counts)
+
+        counts[counter_field] = counts[counter_field] - value
+        met_top_post_counts_criteria = Post.meets_top_post_counts_criteria(**counts)
+
+        # Only touch the top posts when the counters cross the criteria
+        if meets_top_post_counts_criteria and not met_top_post_counts_criteria:
+            TopPost.promote_post(post=self)
+        elif met_top_post_counts_criteria and not meets_top_post_counts_criteria:
+            TopPost.demote_post(post=self)
+
     def delete_media(self):
         if self.has_image():
-            delete_file_field(self.image.image)
+            self.image.delete_files()
 
     def soft_delete(self):
         self.delete_notifications()
@@ -715,85 +859,167 @@ class Post(models.Model):
 
         return result
 
+    def get_users_ids_who_can_see(self, users_ids):
+        """
+        The ids of the given users who can see the post, User.can_see_post evaluated for all of them at once.
+        Changes to the visibility rules of User.can_see_post have to be made here too.
+        """
+        users_ids = set(users_ids)
+
+        if self.community_id:
+            return self._get_users_ids_who_can_see_community_post(users_ids=users_ids)
+
+        if self.is_deleted:
+            return set()
+
+        visible_users_ids = users_ids & {self.creator_id}
+        users_ids = users_ids - visible_users_ids
+
+        if not users_ids or self.status != Post.STATUS_PUBLISHED:
+            return visible_users_ids
+
+        Circle = get_circle_model()
+        circles_ids = set(self.circles.values_list('id', flat=True))
+
+        if Circle.get_world_circle_id() not in circles_ids:
+            # Confirmed connections in one of the circles of the post
+            Connection = get_connection_model()
+            users_ids = set(Connection.objects.filter(target_user_id__in=users_ids, circles__id__in=circles_ids,
+                                                      target_connection__circles__isnull=False).values_list(
+                'target_user_id', flat=True))
+
+        users_ids -= self._get_reporters_ids(users_ids=users_ids)
+
+        UserBlock = get_user_block_model()
+        users_ids -= UserBlock.get_users_ids_blocked_with_user_with_id(user_id=self.creator_id, users_ids=users_ids)
+
+        return visible_users_ids | users_ids
+
+    def _get_users_ids_who_can_see_community_post(self, users_ids):
+        visible_users_ids = users_ids & {self.creator_id}
+        users_ids = users_ids - visible_users_ids
+
+        if not users_ids or self.is_deleted or self.status != Post.STATUS_PUBLISHED or \
+                self.moderated_object.filter(status=ModeratedObject.STATUS_APPROVED).exists():
+            return visible_users_ids
+
+        users_ids -= self._get_reporters_ids(users_ids=users_ids)
+
+        Community = get_community_model()
+        users_ids -= set(Community.banned_users.through.objects.filter(community_id=self.community_id,
+                                                                       user_id__in=users_ids).values_list(
+            'user_id', flat=True))
+
+        members_ids, staff_ids = self._get_community_members_and_staff_ids(users_ids=users_ids)
+
+        if self.community.type != Community.COMMUNITY_TYPE_PUBLIC:
+            users_ids &= members_ids
+
+        # Closed posts and posts of blocked users are still visible to the community staff
+        not_staff_ids = users_ids - staff_ids
+
+        if self.is_closed:
+            users_ids -= not_staff_ids
+        elif not_staff_ids and not self._get_community_members_and_staff_ids(users_ids=[self.creator_id])[1]:
+            UserBlock = get_user_block_model()
+            users_ids -= UserBlock.get_users_ids_blocked_with_user_with_id(user_id=self.creator_id,
+                                                                          users_ids=not_staff_ids)
+
+        return visible_users_ids | users_ids
+
+    def _get_community_members_and_staff_ids(self, users_ids):
+        """
+        The ids of the given users who are members of the community of the post, and of those who are staff
+        """
+        CommunityMembership = get_community_membership_model()
+        memberships = CommunityMembership.objects.filter(community_id=self.community_id,
+                                                         user_id__in=users_ids).values_list('user_id',
+                                                                                            'is_administrator',
+                                                                                            'is_moderator')
+        members_ids = set()
+        staff_ids = set()
+
+        for user_id, is_administrator, is_moderator in memberships:
+            members_ids.add(user_id)
+            if is_administrator or is_moderator:
+                staff_ids.add(user_id)
+
+        return members_ids, staff_ids
+
+    def _get_reporters_ids(self, users_ids):
+        if not users_ids:
+            return set()
+
+        return set(self.moderated_object.filter(reports__reporter_id__in=users_ids).values_list(
+            'reports__reporter_id', flat=True))
+
     def _process_post_mentions(self):
-        if not self.text:
+        usernames = {username.lower() for username in extract_usernames_from_string(string=self.text)} \
+            if self.text else None
+
+        if not usernames:
             self.user_mentions.all().delete()
-        else:
-            usernames = extract_usernames_from_string(string=self.text)
-            if not usernames:
-                self.user_mentions.all().delete()
-            else:
-                existing_mention_usernames = []
-                for existing_mention in self.user_mentions.only('id', 'user__username').all().iterator():
-                    existing_mention_username = existing_mention.user.username.lower()
-                    if existing_mention_username not in usernames:
-                        existing_mention.delete()
-                    else:
-                        existing_mention_usernames.append(existing_mention_username)
-
-                PostUserMention = get_post_user_mention_model()
-                User = get_user_model()
-
-                for username in usernames:
-                    username = username.lower()
-                    if username not in existing_mention_usernames:
-                        try:
-                            user = User.objects.only('id', 'username').get(username__iexact=username)
-                            user_is_post_creator = user.pk == self.creator_id
-                            if user.can_see_post(post=self) and not user_is_post_creator:
-                                PostUserMention.create_post_user_mention(user=user, post=self)
-                                existing_mention_usernames.append(username)
-                        except User.DoesNotExist:
-                            pass
+            return
+
+        PostUserMention = get_post_user_mention_model()
+
+        existing_mentions = self.user_mentions.values_list('id', 'user__username')
+        removed_mentions_ids = [mention_id for mention_id, username in existing_mentions if
+                                username.lower() not in usernames]
+
+        if removed_mentions_ids:
+            PostUserMention.objects.filter(id__in=removed_mentions_ids).delete()
+
+        usernames -= {username.lower() for mention_id, username in existing_mentions}
+
+        if not usernames:
+            return
+
+        users = _get_users_with_usernames(usernames=usernames, exclude_user_id=self.creator_id)
+        visible_users_ids = self.get_users_ids_who_can_see(users_ids=[user.pk for user in users])
+
+        for user in users:
+            if user.pk in visible_users_ids:
+                PostUserMention.create_post_user_mention(user=user, post=self)
 
     def _process_post_hashtags(self):
-        if not self.text:
+        hashtags_names = {hashtag.lower() for hashtag in extract_hashtags_from_string(string=self.text)} \
+            if self.text else None
+
+        if not hashtags_names:
             self.hashtags.all().delete()
-        else:
-            hashtags = extract_hashtags_from_string(string=self.text)
-            if not hashtags:
-                self.hashtags.all().delete()
-            else:
-                existing_hashtags = []
-                for existing_hashtag in self.hashtags.only('id', 'name').all().iterator():
-                    if existing_hashtag.name not in hashtags:
-                        self.hashtags.remove(existing_hashtag)
-                    else:
-                        existing_hashtags.append(existing_hashtag.name)
+            return
 
-                Hashtag = get_hashtag_model()
+        existing_hashtags = self.hashtags.values_list('id', 'name')
+        removed_hashtags_ids = [hashtag_id for hashtag_id, name in existing_hashtags if name not in hashtags_names]
 
-                for hashtag in hashtags:
-                    hashtag = hashtag.lower()
-                    hashtag_obj = Hashtag.get_or_create_hashtag(name=hashtag, post=self)
-                    if hashtag not in existing_hashtags:
-                        self.hashtags.add(hashtag_obj)
+        if removed_hashtags_ids:
+            self.hashtags.remove(*removed_hashtags_ids)
 
-    def _process_post_subscribers(self):
-        if self.community:
-            CommunityNewPostNotification = get_community_new_post_notification_model()
-            community_subscriptions = Post.get_community_notification_target_subscriptions(post=self)
-
-            for subscription in community_subscriptions:
-                CommunityNewPostNotification.create_community_new_post_notification(
-                    post_id=self.pk,
-                    owner_id=subscription.subscriber.pk, community_notifications_subscription_id=subscription.pk)
-                send_community_new_post_push_notification(community_notifications_subscription=subscription)
-        else:
-            UserNewPostNotification = get_user_new_post_notification_model()
-            user_subscriptions = Post.get_user_notification_target_subscriptions(post=self)
+        existing_hashtags_names = {name for hashtag_id, name in existing_hashtags}
 
-            for subscription in user_subscriptions:
-                UserNewPostNotification.create_user_new_post_notification(
-                    post_id=self.pk, owner_id=subscription.subscriber.pk,
-                    user_notifications_subscription_id=subscription.pk)
-                send_user_new_post_push_notification(user_notifications_subscription=subscription, post=self)
+        Hashtag = get_hashtag_model()
+        hashtags = Hashtag.get_or_create_hashtags(names=hashtags_names, post=self)
+
+        self.hashtags.add(*[hashtag for hashtag in hashtags if hashtag.name not in existing_hashtags_names])
+
+    def _process_post_subscribers(self):
+        enqueue_new_post_notifications_job(fan_out_new_post_notifications, post_id=self.pk)
 
 
 class TopPost(models.Model):
     post = models.OneToOneField(Post, on_delete=models.CASCADE, related_name='top_post')
     created = models.DateTimeField(editable=False, db_index=True)
 
+    @classmethod
+    def promote_post(cls, post):
+        if Post.objects.filter(make_only_top_post_eligible_posts_query(), pk=post.pk).exists():
+            cls.objects.get_or_create(post=post)
+
+    @classmethod
+    def demote_post(cls, post):
+        cls.objects.filter(post=post).delete()
+
     def save(self, *args, **kwargs):
         ''' On save, update timestamps '''
         if not self.id:
@@ -816,6 +1042,180 @@ class TrendingPost(models.Model):
         return super(TrendingPost, self).save(*args, **kwargs)
 
 
+class TimelinePost(models.Model):
+    """
+    A post materialized into the home timeline of its owner at publish time (fan-out on write).
+    Visibility filters that can change after publishing (deletion, closing, moderation, reports)
+    are applied when reading the timeline.
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_posts')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_posts')
+    created = models.DateTimeField(editable=False, db_index=True)
+
+    class Meta:
+        unique_together = ('owner', 'post',)
+
+    @classmethod
+    def add_post_to_timelines(cls, post):
+        owners_ids = cls._get_owners_ids_for_post(post=post)
+        cls._bulk_create_timeline_posts(owners_ids=owners_ids, posts_ids=[post.pk])
+        return len(owners_ids)
+
+    @classmethod
+    def add_post_to_timeline_of_owner(cls, owner_id, post_id):
+        cls._bulk_create_timeline_posts(owners_ids=[owner_id], posts_ids=[post_id])
+
+    @classmethod
+    def refresh_timeline_of_owner_for_creator(cls, owner_id, creator_id):
+        """
+        Brings the timeline entries of owner for the posts of creator in line with the follow, connection,
+        community and block relationships between both, adding newly visible posts and removing stale ones.
+        """
+        visible_posts_query = cls._make_creator_posts_visible_to_owner_query(owner_id=owner_id,
+                                                                             creator_id=creator_id)
+
+        if visible_posts_query is None:
+            visible_posts_ids = []
+        else:
+            visible_posts_ids = list(
+                Post.objects.filter(visible_posts_query).order_by('-id').values_list('id', flat=True).distinct()[
+                :settings.TIMELINE_POSTS_MAX_LENGTH])
+
+        cls.objects.filter(owner_id=owner_id, post__creator_id=creator_id).exclude(
+            post_id__in=visible_posts_ids).delete()
+
+        cls._bulk_create_timeline_posts(owners_ids=[owner_id], posts_ids=visible_posts_ids)
+        cls.trim_timeline_of_owner(owner_id=owner_id)
+
+    @classmethod
+    def add_community_posts_to_timeline_of_owner(cls, owner_id, community_id):
+        UserBlock = get_user_block_model()
+
+        blocked_users_ids = UserBlock.objects.filter(Q(blocker_id=owner_id) | Q(blocked_user_id=owner_id)).values_list(
+            'blocker_id', 'blocked_user_id')
+
+        excluded_creators_ids = set()
+        for blocker_id, blocked_user_id in blocked_users_ids:
+            excluded_creators_ids.add(blocked_user_id if blocker_id == owner_id else blocker_id)
+
+        community_posts_ids = list(Post.objects.filter(community_id=community_id,
+                                                       status=Post.STATUS_PUBLISHED).exclude(
+            creator_id__in=excluded_creators_ids).order_by('-id').values_list('id', flat=True)[
+                                   :settings.TIMELINE_POSTS_MAX_LENGTH])
+
+        cls._bulk_create_timeline_posts(owners_ids=[owner_id], posts_ids=community_posts_ids)
+        cls.trim_timeline_of_owner(owner_id=owner_id)
+
+    @classmethod
+    def remove_community_posts_from_timeline_of_owner(cls, owner_id, community_id):
+        cls.objects.filter(owner_id=owner_id, post__community_id=community_id).delete()
+
+    @classmethod
+    def rebuild_timeline_of_owner(cls, owner):
+        cls.objects.filter(owner_id=owner.pk).delete()
+
+        max_length = settings.TIMELINE_POSTS_MAX_LENGTH
+        timeline_posts_ids = [post.pk for post in
+                              owner._compute_timeline_posts_with_no_filters().order_by('-id')[:max_length]]
+
+        cls._bulk_create_timeline_posts(owners_ids=[owner.pk], posts_ids=timeline_posts_ids)
+
+        # A full timeline can be missing older posts
+        boundary_post_id = timeline_posts_ids[-1] if len(timeline_posts_ids) == max_length else 0
+        User.objects.filter(pk=owner.pk).update(timeline_posts_boundary_post_id=boundary_post_id)
+
+    @classmethod
+    def trim_timeline_of_owner(cls, owner_id):
+        """
+        Drops the entries of owner past TIMELINE_POSTS_MAX_LENGTH and records the oldest kept post as the boundary
+        of the timeline. Older posts are computed on read.
+        """
+        max_length = settings.TIMELINE_POSTS_MAX_LENGTH
+        oldest_kept_post_id = cls.objects.filter(owner_id=owner_id).order_by('-post_id').values_list(
+            'post_id', flat=True)[max_length - 1:max_length].first()
+
+        if oldest_kept_post_id is None:
+            return 0
+
+        trimmed_count, _ = cls.objects.filter(owner_id=owner_id, post_id__lt=oldest_kept_post_id).delete()
+
+        if trimmed_count:
+            User.objects.filter(pk=owner_id, timeline_posts_boundary_post_id__lt=oldest_kept_post_id).update(
+                timeline_posts_boundary_post_id=oldest_kept_post_id)
+
+        return trimmed_count
+
+    @classmethod
+    def _get_owners_ids_for_post(cls, post):
+        if post.community_id:
+            CommunityMembership = get_community_membership_model()
+
+            members_query = Q(community_id=post.community_id)
+            # Dont fan out to users blocking or blocked by the creator
+            members_query.add(~Q(user__blocked_by_users__blocker_id=post.creator_id), Q.AND)
+            members_query.add(~Q(user__user_blocks__blocked_user_id=post.creator_id), Q.AND)
+
+            return list(CommunityMembership.objects.filter(members_query).values_list('user_id', flat=True))
+
+        Circle = get_circle_model()
+        Follow = get_follow_model()
+
+        followers_query = Q(followed_user_id=post.creator_id)
+
+        if not post.circles.filter(pk=Circle.get_world_circle_id()).exists():
+            # Only followers the creator is confirmed connected with in one of the post circles
+            Connection = get_connection_model()
+            connected_users_ids = Connection.objects.filter(user_id=post.creator_id,
+                                                            circles__posts__id=post.pk,
+                                                            target_connection__circles__isnull=False).values(
+                'target_user_id')
+            followers_query.add(Q(user_id__in=connected_users_ids), Q.AND)
+
+        owners_ids = set(Follow.objects.filter(followers_query).values_list('user_id', flat=True))
+        owners_ids.add(post.creator_id)
+
+        return list(owners_ids)
+
+    @classmethod
+    def _make_creator_posts_visible_to_owner_query(cls, owner_id, creator_id):
+        community_posts_query = Q(community__memberships__user_id=owner_id)
+
+        if owner_id == creator_id:
+            visible_posts_query = Q(community__isnull=True)
+            visible_posts_query.add(community_posts_query, Q.OR)
+        else:
+            UserBlock = get_user_block_model()
+            if UserBlock.users_are_blocked(user_a_id=owner_id, user_b_id=creator_id):
+                return None
+
+            visible_posts_query = community_posts_query
+
+            Follow = get_follow_model()
+            if Follow.objects.filter(user_id=owner_id, followed_user_id=creator_id).exists():
+                Circle = get_circle_model()
+                followed_user_posts_query = Q(community__isnull=True)
+                followed_user_posts_query.add(
+                    Q(circles__id=Circle.get_world_circle_id()) | Q(circles__connections__target_user_id=owner_id,
+                                                                    circles__connections__target_connection__circles__isnull=False),
+                    Q.AND)
+                visible_posts_query.add(followed_user_posts_query, Q.OR)
+
+        creator_posts_query = Q(creator_id=creator_id, status=Post.STATUS_PUBLISHED)
+        creator_posts_query.add(visible_posts_query, Q.AND)
+
+        return creator_posts_query
+
+    @classmethod
+    def _bulk_create_timeline_posts(cls, owners_ids, posts_ids):
+        created = timezone.now()
+
+        timeline_posts = [cls(owner_id=owner_id, post_id=post_id, created=created) for owner_id in owners_ids for
+                          post_id in posts_ids]
+
+        cls.objects.bulk_create(timeline_posts, batch_size=settings.TIMELINE_POSTS_BULK_CREATE_BATCH_SIZE,
+                                ignore_conflicts=True)
+
+
 class TopPostCommunityExclusion(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='top_posts_community_exclusions')
     community = models.ForeignKey('openbook_communities.Community', on_delete=models.CASCADE,
@@ -884,13 +1284,16 @@ class PostImage(models.Model):
                                 height_field='height',
                                 blank=False, null=True, format='JPEG', options={'quality': 80},
                                 processors=[ResizeToFit(width=1024, upscale=False)])
-    width = models.PositiveIntegerField(editable=False, null=False, blank=False)
-    height = models.PositiveIntegerField(editable=False, null=False, blank=False)
-    hash = models.CharField(_('hash'), max_length=64, blank=False, null=True)
+    width = models.PositiveIntegerField(editable=False, null=True, blank=False)
+    height = models.PositiveIntegerField(editable=False, null=True, blank=False)
+    # Post images with the same hash share their stored files
+    hash = models.CharField(_('hash'), max_length=64, blank=False, null=True, db_index=True)
     thumbnail = ProcessedImageField(verbose_name=_('thumbnail'), storage=post_image_storage,
                                     upload_to=upload_to_post_image_directory,
                                     blank=False, null=True, format='JPEG', options={'quality': 30},
                                     processors=[ResizeToFit(width=1024, upscale=False)])
+    # The upload as received, until it is processed into the image and thumbnail
+    raw_file = models.FileField(storage=post_image_storage, upload_to=upload_to_post_image_directory, null=True)
 
     media = GenericRelation(PostMedia)
 
@@ -902,17 +1305,99 @@ class PostImage(models.Model):
     @classmethod
     def create_post_media_image(cls, image, post_id, order):
         hash = sha256sum(file=image.file)
-        post_image = cls.objects.create(image=image, post_id=post_id, hash=hash, thumbnail=image)
-        PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_IMAGE,
-                                    content_object=post_image,
-                                    post_id=post_id, order=order)
+
+        with transaction.atomic():
+            processed_post_image = cls.get_processed_post_image_with_hash(hash=hash)
+
+            if processed_post_image:
+                post_image = cls.objects.create(post_id=post_id, hash=hash,
+                                                **processed_post_image._get_processed_files_values())
+            else:
+                post_image = cls.objects.create(raw_file=image, post_id=post_id, hash=hash)
+
+            PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_IMAGE,
+                                        content_object=post_image,
+                                        post_id=post_id, order=order)
         return post_image
 
+    @classmethod
+    def get_processed_post_image_with_hash(cls, hash):
+        # Locked until the end of the transaction reusing its files, so they are not deleted meanwhile
+        return cls.objects.select_for_update().filter(hash=hash).exclude(Q(image__isnull=True) | Q(image='')).first()
+
+    @classmethod
+    def get_files_names_shared_with_other_posts(cls, hashes, posts_ids):
+        """
+        Returns the names of the files shared with the post images of other posts. All the post images with the
+        hashes are locked until the end of the transaction, so their files can't be reused while being deleted.
+        """
+        post_images = cls.objects.select_for_update().filter(hash__in=hashes).values_list('post_id', 'image',
+                                                                                           'thumbnail')
+        posts_ids = set(posts_ids)
+        files_names = set()
+
+        for post_id, image_name, thumbnail_name in post_images:
+            if post_id not in posts_ids:
+                files_names.update((image_name, thumbnail_name))
+
+        return files_names
+
+    def process(self):
+        """
+        Resizes the raw upload into the image and its thumbnail, unless an image with the same hash was
+        already processed
+        """
+        if not self.raw_file:
+            return
+
+        with transaction.atomic():
+            processed_post_image = PostImage.get_processed_post_image_with_hash(hash=self.hash)
+
+            if processed_post_image:
+                for field_name, value in processed_post_image._get_processed_files_values().items():
+                    setattr(self, field_name, value)
+                self.raw_file.delete(save=False)
+                self.save()
+                return
+
+        file_name = os.path.basename(self.raw_file.name)
+
+        with self.raw_file.open('rb') as raw_file:
+            self.image.save(file_name, File(raw_file), save=False)
+            self.thumbnail.save(file_name, File(raw_file), save=False)
+
+        self.raw_file.delete(save=False)
+        self.save()
+
+    def delete_files(self):
+        """
+        Deletes the stored files which are not shared with other post images
+        """
+        with transaction.atomic():
+            shared_files_names = PostImage.get_files_names_shared_with_other_posts(hashes=[self.hash],
+                                                                                   posts_ids=[self.post_id])
+
+            for file_field in (self.image, self.thumbnail, self.raw_file):
+                if file_field and file_field.name not in shared_files_names:
+                    delete_file_field(file_field)
+
+            # The post image can outlive its files, it must not be reused for them
+            PostImage.objects.filter(pk=self.pk).update(image=None, thumbnail=None, raw_file=None)
+
+    def _get_processed_files_values(self):
+        return {
+            'image': self.image.name,
+            'thumbnail': self.thumbnail.name,
+            'width': self.width,
+            'height': self.height,
+        }
+
 
 class PostVideo(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='videos', null=True)
 
-    hash = models.CharField(_('hash'), max_length=64, blank=False, null=True)
+    # Post videos with the same hash share their stored files and formats
+    hash = models.CharField(_('hash'), max_length=64, blank=False, null=True, db_index=True)
 
     media = GenericRelation(PostMedia)
 
@@ -933,30 +1418,128 @@ class PostVideo(models.Model):
                                     blank=False, null=True, format='JPEG', options={'quality': 30},
                                     processors=[ResizeToFit(width=1024, upscale=False)])
 
-    thumbnail_width = models.PositiveIntegerField(editable=False, null=False, blank=False)
-    thumbnail_height = models.PositiveIntegerField(editable=False, null=False, blank=False)
+    thumbnail_width = models.PositiveIntegerField(editable=False, null=True, blank=False)
+    thumbnail_height = models.PositiveIntegerField(editable=False, null=True, blank=False)
+
+    # The upload as received, until it is probed and thumbnailed
+    raw_file = models.FileField(storage=post_image_storage, upload_to=upload_to_post_video_directory, null=True)
 
     @classmethod
     def create_post_media_video(cls, file, post_id, order):
         hash = sha256sum(file=file.file)
-        video_backend = get_backend()
 
-        if isinstance(file, InMemoryUploadedFile):
-            # If its in memory, doing read shouldn't be an issue as the file should be small.
-            in_disk_file = write_in_memory_file_to_disk(file)
-            thumbnail_path = video_backend.get_thumbnail(video_path=in_disk_file.name, at_time=0.0)
-        else:
-            thumbnail_path = video_backend.get_thumbnail(video_path=file.file.name, at_time=0.0)
+        with transaction.atomic():
+            processed_post_video = cls.get_processed_post_video_with_hash(hash=hash)
+
+            if processed_post_video:
+                post_video = cls.objects.create(post_id=post_id, hash=hash,
+                                                **processed_post_video._get_processed_files_values())
+                post_video._copy_formats_of_post_video(post_video=processed_post_video)
+            else:
+                post_video = cls.objects.create(raw_file=file, post_id=post_id, hash=hash)
 
-        with open(thumbnail_path, 'rb+') as thumbnail_file:
-            post_video = cls.objects.create(file=file, post_id=post_id, hash=hash, thumbnail=File(thumbnail_file), )
-        PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_VIDEO,
-                                    content_object=post_video,
-                                    post_id=post_id, order=order)
+            PostMedia.create_post_media(type=PostMedia.MEDIA_TYPE_VIDEO,
+                                        content_object=post_video,
+                                        post_id=post_id, order=order)
         return post_video
 
+    @classmethod
+    def get_processed_post_video_with_hash(cls, hash):
+        # Locked until the end of the transaction reusing its files, so they are not deleted meanwhile
+        return cls.objects.select_for_update().filter(hash=hash).exclude(Q(file__isnull=True) | Q(file='')).first()
+
+    @classmethod
+    def get_files_names_shared_with_other_posts(cls, hashes, posts_ids):
+        """
+        Returns the names of the files shared with the post videos of other posts. All the post videos with the
+        hashes are locked until the end of the transaction, so their files can't be reused while being deleted.
+        """
+        post_videos = cls.objects.select_for_update().filter(hash__in=hashes).values_list('id', 'post_id', 'file',
+                                                                                           'thumbnail')
+        posts_ids = set(posts_ids)
+        files_names = set()
+        shared_post_videos_ids = []
+
+        for post_video_id, post_id, file_name, thumbnail_name in post_videos:
+            if post_id not in posts_ids:
+                files_names.update((file_name, thumbnail_name))
+                shared_post_videos_ids.append(post_video_id)
+
+        if shared_post_videos_ids:
+            files_names.update(Format.objects.filter(content_type=ContentType.objects.get_for_model(cls),
+                                                     object_id__in=shared_post_videos_ids).values_list('file',
+                                                                                                       flat=True))
+
+        return files_names
+
+    def process(self):
+        """
+        Probes the raw upload and extracts its thumbnail, the raw upload then becomes the video file as is.
+        A video with the same hash which was already processed is reused instead, along with its formats.
+        """
+        if not self.raw_file:
+            return
+
+        with transaction.atomic():
+            processed_post_video = PostVideo.get_processed_post_video_with_hash(hash=self.hash)
+
+            if processed_post_video:
+                for field_name, value in processed_post_video._get_processed_files_values().items():
+                    setattr(self, field_name, value)
+                self.raw_file.delete(save=False)
+                self.save()
+                self._copy_formats_of_post_video(post_video=processed_post_video)
+                return
+
+        video_backend = get_backend()
+        local_path, local_temp_file = get_fieldfile_local_path(fieldfile=self.raw_file)
+
+        try:
+            media_info = video_backend.get_media_info(local_path)
+            thumbnail_path = video_backend.get_thumbnail(video_path=local_path, at_time=0.0)
+        finally:
+            if local_temp_file:
+                local_temp_file.close()
+                os.unlink(local_temp_file.name)
+
+        try:
+            with open(thumbnail_path, 'rb') as thumbnail_file:
+                self.thumbnail.save(os.path.basename(thumbnail_path), File(thumbnail_file), save=False)
+        finally:
+            os.remove(thumbnail_path)
+
+        # Assigned to the field file instead of the field, as the field would probe the video again
+        self.file.name = self.raw_file.name
+        self.width = media_info['width']
+        self.height = media_info['height']
+        self.duration = media_info['duration']
+        self.raw_file = None
+        self.save()
+
+    def _get_processed_files_values(self):
+        return {
+            'file': self.file.name,
+            'width': self.width,
+            'height': self.height,
+            'duration': self.duration,
+            'thumbnail': self.thumbnail.name,
+            'thumbnail_width': self.thumbnail_width,
+            'thumbnail_height': self.thumbnail_height,
+        }
+
+    def _copy_formats_of_post_video(self, post_video):
+        """
+        Copies the encoded formats of another post video, the formats still being encoded are encoded again
+        """
+        Format.objects.bulk_create([
+            Format(object_id=self.pk, content_type=video_format.content_type, field_name=video_format.field_name,
+                   format=video_format.format, file=video_format.file.name, width=video_format.width,
+                   height=video_format.height, duration=video_format.duration, progress=100) for video_format in
+            post_video.format_set.complete().exclude(Q(file__isnull=True) | Q(file=''))
+        ])
+
 
-class PostComment(models.Model):
+class PostComment(CounterFieldsMixin, models.Model):
     moderated_object = GenericRelation(ModeratedObject, related_query_name='post_comments')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     parent_comment = models.ForeignKey('self', on_delete=models.CASCADE, related_name='replies', null=True, blank=True)
@@ -969,14 +1552,25 @@ class PostComment(models.Model):
     is_edited = models.BooleanField(default=False, null=False, blank=False)
     # This only happens if the comment was reported and found with critical severity content
     is_deleted = models.BooleanField(default=False)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('replies_count',)
 
     @classmethod
     def create_comment(cls, text, commenter, post, parent_comment=None):
         post_comment = PostComment.objects.create(text=text, commenter=commenter, post=post,
                                                   parent_comment=parent_comment)
-        post_comment.language = get_language_for_text(text)
+        post_comment._set_language_for_text(text)
         post_comment.save()
 
+        if parent_comment:
+            parent_comment.update_replies_count(1)
+        else:
+            post.update_comments_count(1)
+
+        if not post_comment._commenter_has_other_comments_in_post():
+            post.update_unique_commenters_count(1)
+
         return post_comment
 
     @classmethod
@@ -991,41 +1585,53 @@ class PostComment(models.Model):
                                                                reactor_id=reactor_id)
 
     def count_replies(self):
-        return self.replies.count()
+        return self.replies_count
 
-    def count_replies_with_user(self, user):
-        # Count replies excluding users blocked by authenticated user
-        count_query = ~Q(Q(commenter__blocked_by_users__blocker_id=user.pk) | Q(
-            commenter__user_blocks__blocked_user_id=user.pk))
+    def update_replies_count(self, value):
+        counter_query = Q(pk=self.pk)
 
-        if self.post.community:
-            if not user.is_staff_of_community_with_name(community_name=self.post.community.name):
-                # Dont retrieve comments except from staff members
-                blocked_users_query_staff_members = Q(
-                    commenter__communities_memberships__community_id=self.post.community.pk)
-                blocked_users_query_staff_members.add(Q(commenter__communities_memberships__is_administrator=True) | Q(
-                    commenter__communities_memberships__is_moderator=True), Q.AND)
+        if value < 0:
+            counter_query.add(Q(replies_count__gte=-value), Q.AND)
 
-                count_query.add(~blocked_users_query_staff_members, Q.AND)
+        PostComment.objects.filter(counter_query).update(replies_count=F('replies_count') + value)
 
-            # Don't count items that have been reported and approved by community moderators
-            ModeratedObject = get_moderated_object_model()
-            count_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
+    def count_replies_with_user(self, user):
+        return PostComment.count_replies_for_post_comments_with_user(post_comments=[self], user=user).get(self.pk, 0)
+
+    @classmethod
+    def count_replies_for_post_comments_with_user(cls, post_comments, user):
+        """
+        Counts the replies of a page of post comments in a single grouped query, as seen by user.
+        Returns a dict of post comment id to replies count.
+        """
+        post_comments_ids = [post_comment.pk for post_comment in post_comments]
 
         # Dont count soft deleted items
-        count_query.add(Q(is_deleted=False), Q.AND)
+        count_query = Q(parent_comment_id__in=post_comments_ids, is_deleted=False)
 
         # Dont count items we have reported
         count_query.add(~Q(moderated_object__reports__reporter_id=user.pk), Q.AND)
 
-        return self.replies.filter(count_query).count()
+        # Don't count items that have been reported and approved by community moderators
+        count_query.add(~Q(post__community__isnull=False, moderated_object__status=ModeratedObject.STATUS_APPROVED),
+                        Q.AND)
 
-    def reply_to_comment(self, commenter, text):
-        post_comment = PostComment.create_comment(text=text, commenter=commenter, post=self.post, parent_comment=self)
-        post_comment.language = get_language_for_text(text)
-        post_comment.save()
+        # Count replies excluding users blocked by authenticated user, except community staff members
+        blocked_users_query = make_only_items_of_users_blocked_with_user_for_posts_query(
+            user=user, posts=[post_comment.post for post_comment in post_comments], item_user_field='commenter_id',
+            include_for_community_staff=False)
 
-        return post_comment
+        if blocked_users_query:
+            count_query.add(~blocked_users_query, Q.AND)
+
+        replies_counts = cls.objects.filter(count_query).values('parent_comment_id').annotate(
+            replies_count=Count('id')).order_by()
+
+        return {replies_count['parent_comment_id']: replies_count['replies_count'] for replies_count in
+                replies_counts}
+
+    def reply_to_comment(self, commenter, text):
+        return PostComment.create_comment(text=text, commenter=commenter, post=self.post, parent_comment=self)
 
     def react(self, reactor, emoji_id):
         return PostCommentReaction.create_reaction(reactor=reactor, emoji_id=emoji_id, post_comment=self)
@@ -1041,98 +1647,176 @@ class PostComment(models.Model):
 
         post_comment = super(PostComment, self).save(*args, **kwargs)
 
+        if settings.MENTIONS_AND_HASHTAGS_JOBS_ASYNC:
+            post_comment_id = self.pk
+            transaction.on_commit(
+                lambda: process_post_comment_mentions_and_hashtags.delay(post_comment_id=post_comment_id))
+        else:
+            self.process_mentions_and_hashtags()
+
+        return post_comment
+
+    def process_mentions_and_hashtags(self):
         self._process_post_comment_mentions()
         self._process_post_comment_hashtags()
 
-        return post_comment
+    def get_users_ids_who_can_see(self, users_ids):
+        """
+        The ids of the given users who can see the comment, User.can_see_post_comment evaluated for all of them at once.
+        Changes to the visibility rules of User.can_see_post_comment have to be made here too.
+        """
+        users_ids = self.post.get_users_ids_who_can_see(users_ids=users_ids)
+
+        if not users_ids or self.is_deleted:
+            return set()
+
+        users_ids -= set(self.moderated_object.filter(reports__reporter_id__in=users_ids).values_list(
+            'reports__reporter_id', flat=True))
+
+        blocked_users_ids = users_ids
+
+        if self.post.community_id:
+            # Community staff can see every comment, other users can see the comments of blocked staff
+            blocked_users_ids = users_ids - self.post._get_community_members_and_staff_ids(users_ids=users_ids)[1]
+
+            if not blocked_users_ids:
+                return users_ids
+
+            if self.moderated_object.filter(status=ModeratedObject.STATUS_APPROVED).exists():
+                return users_ids - blocked_users_ids
+
+            if self.post._get_community_members_and_staff_ids(users_ids=[self.commenter_id])[1]:
+                return users_ids
+
+        UserBlock = get_user_block_model()
+        return users_ids - UserBlock.get_users_ids_blocked_with_user_with_id(user_id=self.commenter_id,
+                                                                            users_ids=blocked_users_ids)
 
     def _process_post_comment_mentions(self):
-        usernames = extract_usernames_from_string(string=self.text)
+        usernames = {username.lower() for username in extract_usernames_from_string(string=self.text)}
 
         if not usernames:
             self.user_mentions.all().delete()
+            return
+
+        PostCommentUserMention = get_post_comment_user_mention_model()
+
+        existing_mentions = self.user_mentions.values_list('id', 'user__username')
+        removed_mentions_ids = [mention_id for mention_id, username in existing_mentions if
+                                username.lower() not in usernames]
+
+        if removed_mentions_ids:
+            PostCommentUserMention.objects.filter(id__in=removed_mentions_ids).delete()
+
+        usernames -= {username.lower() for mention_id, username in existing_mentions}
+
+        if not usernames:
+            return
+
+        users = _get_users_with_usernames(usernames=usernames, exclude_user_id=self.commenter_id)
+        users_ids = self.get_users_ids_who_can_see(users_ids=[user.pk for user in users])
+
+        if self.parent_comment_id:
+            # Its a reply to a comment, if the user previously replied to the comment
+            # or if he's the creator of the parent comment he will already be alerted of the reply,
+            # no need for mention
+            users_ids -= {self.parent_comment.commenter_id}
+            already_commented_users_ids = self.parent_comment.replies.filter(commenter_id__in=users_ids)
         else:
-            existing_mention_usernames = []
-            for existing_mention in self.user_mentions.only('id', 'user__username').all().iterator():
-                existing_mention_username = existing_mention.user.username.lower()
-                if existing_mention_username not in usernames:
-                    existing_mention.delete()
-                else:
-                    existing_mention_usernames.append(existing_mention_username)
-
-            PostCommentUserMention = get_post_comment_user_mention_model()
-            User = get_user_model()
-
-            for username in usernames:
-                username = username.lower()
-                if username not in existing_mention_usernames:
-                    try:
-                        user = User.objects.only('id', 'username').get(username__iexact=username)
-                        user_can_see_post_comment = user.can_see_post_comment(post_comment=self)
-                        user_is_commenter = user.pk == self.commenter_id
-
-                        if not user_can_see_post_comment or user_is_commenter:
-                            continue
-
-                        if self.parent_comment:
-                            user_is_parent_comment_creator = self.parent_comment.commenter_id == user.pk
-                            user_has_replied_before = self.parent_comment.replies.filter(commenter_id=user.pk).exists()
-
-                            if user_has_replied_before or user_is_parent_comment_creator:
-                                # Its a reply to a comment, if the user previously replied to the comment
-                                # or if he's the creator of the parent comment he will already be alerted of the reply,
-                                # no need for mention
-                                continue
-                        else:
-                            user_has_commented_before = self.post.comments.filter(commenter_id=user.pk).exists()
-                            if user_has_commented_before:
-                                # Its a comment to a post, if the user previously commented on the post
-                                # he will already be alerted of the comment, no need for mention
-                                continue
-
-                        PostCommentUserMention.create_post_comment_user_mention(user=user, post_comment=self)
-                        existing_mention_usernames.append(username)
-                    except User.DoesNotExist:
-                        pass
+            # Its a comment to a post, if the user previously commented on the post
+            # he will already be alerted of the comment, no need for mention
+            already_commented_users_ids = self.post.comments.filter(commenter_id__in=users_ids)
+
+        users_ids -= set(already_commented_users_ids.values_list('commenter_id', flat=True))
+
+        for user in users:
+            if user.pk in users_ids:
+                PostCommentUserMention.create_post_comment_user_mention(user=user, post_comment=self)
 
     def _process_post_comment_hashtags(self):
-        if not self.text:
+        hashtags_names = {hashtag.lower() for hashtag in extract_hashtags_from_string(string=self.text)} \
+            if self.text else None
+
+        if not hashtags_names:
             self.hashtags.all().delete()
-        else:
-            hashtags = extract_hashtags_from_string(string=self.text)
-            if not hashtags:
-                self.hashtags.all().delete()
-            else:
-                existing_hashtags = []
-                for existing_hashtag in self.hashtags.only('id', 'name').all().iterator():
-                    if existing_hashtag.name not in hashtags:
-                        self.hashtags.remove(existing_hashtag)
-                    else:
-                        existing_hashtags.append(existing_hashtag.name)
+            return
+
+        existing_hashtags = self.hashtags.values_list('id', 'name')
+        removed_hashtags_ids = [hashtag_id for hashtag_id, name in existing_hashtags if name not in hashtags_names]
+
+        if removed_hashtags_ids:
+            self.hashtags.remove(*removed_hashtags_ids)
 
-                Hashtag = get_hashtag_model()
+        existing_hashtags_names = {name for hashtag_id, name in existing_hashtags}
+        new_hashtags_names = hashtags_names - existing_hashtags_names
 
-                for hashtag in hashtags:
-                    hashtag = hashtag.lower()
-                    if hashtag not in existing_hashtags:
-                        hashtag_obj = Hashtag.get_or_create_hashtag(name=hashtag)
-                        self.hashtags.add(hashtag_obj)
+        if new_hashtags_names:
+            Hashtag = get_hashtag_model()
+            self.hashtags.add(*Hashtag.get_or_create_hashtags(names=new_hashtags_names))
 
     def update_comment(self, text):
         self.text = text
         self.is_edited = True
-        self.language = get_language_for_text(text)
+        self._set_language_for_text(text)
         self.save()
 
+    def _set_language_for_text(self, text):
+        if settings.LANGUAGE_DETECTION_JOBS_ASYNC:
+            self.language = None
+            post_comment_id = self.pk
+            transaction.on_commit(lambda: detect_post_comment_language.delay(post_comment_id=post_comment_id))
+        else:
+            self.language = get_language_for_text(text)
+
+    def delete(self, *args, **kwargs):
+        commenters_ids = set(
+            PostComment.objects.filter(Q(pk=self.pk) | Q(parent_comment_id=self.pk), is_deleted=False).values_list(
+                'commenter_id', flat=True))
+
+        super(PostComment, self).delete(*args, **kwargs)
+
+        if self.parent_comment_id:
+            PostComment.objects.filter(pk=self.parent_comment_id, replies_count__gt=0).update(
+                replies_count=F('replies_count') - 1)
+        elif not self.is_deleted:
+            self.post.update_comments_count(-1)
+
+        remaining_commenters_ids = set(
+            PostComment.objects.filter(post_id=self.post_id, commenter_id__in=commenters_ids,
+                                       is_deleted=False).values_list('commenter_id', flat=True))
+
+        removed_commenters_count = len(commenters_ids - remaining_commenters_ids)
+
+        if removed_commenters_count:
+            self.post.update_unique_commenters_count(-removed_commenters_count)
+
     def soft_delete(self):
+        was_deleted = self.is_deleted
         self.is_deleted = True
         self.delete_notifications()
         self.save()
 
+        if not was_deleted:
+            if not self.parent_comment_id:
+                self.post.update_comments_count(-1)
+            if not self._commenter_has_other_comments_in_post():
+                self.post.update_unique_commenters_count(-1)
+
     def unsoft_delete(self):
+        was_deleted = self.is_deleted
         self.is_deleted = False
         self.save()
 
+        if was_deleted:
+            if not self.parent_comment_id:
+                self.post.update_comments_count(1)
+            if not self._commenter_has_other_comments_in_post():
+                self.post.update_unique_commenters_count(1)
+
+    def _commenter_has_other_comments_in_post(self):
+        return PostComment.objects.filter(post_id=self.post_id, commenter_id=self.commenter_id,
+                                          is_deleted=False).exclude(pk=self.pk).exists()
+
     def delete_notifications(self):
         # Delete all post comment notifications
         PostCommentNotification = get_post_comment_notification_model()
@@ -1207,11 +1891,88 @@ class PostReaction(models.Model):
 
         return cls.objects.filter(count_query).count()
 
+    @classmethod
+    def get_emoji_counts_for_posts_with_user(cls, posts, user, emoji_id=None):
+        """
+        Counts the reactions emojis of a page of posts as seen by user, from the maintained emoji counts minus the
+        reactions of the users blocked with user. The reactions are only queried if user has blocks.
+        Returns a dict of post id to a list of {'emoji', 'count'} ordered by count.
+        """
+        posts_ids = [post.pk for post in posts]
+
+        emoji_counts_query = Q(post_id__in=posts_ids, count__gt=0)
+
+        if emoji_id:
+            emoji_counts_query.add(Q(emoji_id=emoji_id), Q.AND)
+
+        emoji_counts = PostReactionEmojiCount.objects.filter(emoji_counts_query).values_list('post_id', 'emoji_id',
+                                                                                             'count')
+
+        blocked_emoji_counts = []
+
+        # Exclude blocked users reactions, except those of community staff members
+        blocked_users_query = make_only_items_of_users_blocked_with_user_for_posts_query(
+            user=user, posts=posts, item_user_field='reactor_id')
+
+        if blocked_users_query:
+            blocked_reactions_query = Q(post_id__in=posts_ids)
+
+            if emoji_id:
+                blocked_reactions_query.add(Q(emoji_id=emoji_id), Q.AND)
+
+            blocked_reactions_query.add(blocked_users_query, Q.AND)
+
+            blocked_emoji_counts = cls.objects.filter(blocked_reactions_query).values('post_id', 'emoji_id').annotate(
+                emoji_count=Count('id')).values_list('post_id', 'emoji_id', 'emoji_count')
+
+        return _make_items_emoji_counts(emoji_counts=emoji_counts, blocked_emoji_counts=blocked_emoji_counts)
+
+    @classmethod
+    def get_emoji_counts_for_posts_with_ids_with_user(cls, posts_ids, user, emoji_id=None):
+        posts = Post.objects.only('id', 'community_id').filter(pk__in=posts_ids)
+        return cls.get_emoji_counts_for_posts_with_user(posts=list(posts), user=user, emoji_id=emoji_id)
+
     def save(self, *args, **kwargs):
         ''' On save, update timestamps '''
+        previous_emoji_id = None
+
         if not self.id:
             self.created = timezone.now()
-        return super(PostReaction, self).save(*args, **kwargs)
+        else:
+            previous_emoji_id = PostReaction.objects.filter(pk=self.pk).values_list('emoji_id', flat=True).first()
+
+        post_reaction = super(PostReaction, self).save(*args, **kwargs)
+
+        if previous_emoji_id != self.emoji_id:
+            if previous_emoji_id:
+                PostReactionEmojiCount.update_count(post_id=self.post_id, emoji_id=previous_emoji_id, value=-1)
+            else:
+                self.post.update_unique_reactors_count(1)
+            PostReactionEmojiCount.update_count(post_id=self.post_id, emoji_id=self.emoji_id, value=1)
+
+        return post_reaction
+
+    def delete(self, *args, **kwargs):
+        super(PostReaction, self).delete(*args, **kwargs)
+        PostReactionEmojiCount.update_count(post_id=self.post_id, emoji_id=self.emoji_id, value=-1)
+        self.post.update_unique_reactors_count(-1)
+
+
+class PostReactionEmojiCount(models.Model):
+    """
+    The reactions count of a post for an emoji, maintained on PostReaction writes
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='emoji_counts')
+    emoji = models.ForeignKey(Emoji, on_delete=models.CASCADE, related_name='post_reactions_emoji_counts')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'emoji',)
+
+    @classmethod
+    def update_count(cls, post_id, emoji_id, value):
+        _update_reactions_emoji_count(reactions_emoji_count_model=cls, value=value, post_id=post_id,
+                                      emoji_id=emoji_id)
 
 
 class PostCommentReaction(models.Model):
@@ -1227,6 +1988,44 @@ class PostCommentReaction(models.Model):
     def create_reaction(cls, reactor, emoji_id, post_comment):
         return PostCommentReaction.objects.create(reactor=reactor, emoji_id=emoji_id, post_comment=post_comment)
 
+    @classmethod
+    def get_emoji_counts_for_post_comments_with_user(cls, post_comments, user, emoji_id=None):
+        """
+        Counts the reactions emojis of post comments as seen by user, like
+        PostReaction.get_emoji_counts_for_posts_with_user
+        """
+        post_comments_ids = [post_comment.pk for post_comment in post_comments]
+
+        emoji_counts_query = Q(post_comment_id__in=post_comments_ids, count__gt=0)
+
+        if emoji_id:
+            emoji_counts_query.add(Q(emoji_id=emoji_id), Q.AND)
+
+        emoji_counts = PostCommentReactionEmojiCount.objects.filter(emoji_counts_query).values_list(
+            'post_comment_id', 'emoji_id', 'count')
+
+        blocked_emoji_counts = []
+
+        # Exclude blocked users reactions, except those of community staff members
+        blocked_users_query = make_only_items_of_users_blocked_with_user_for_posts_query(
+            user=user, posts=[post_comment.post for post_comment in post_comments], item_user_field='reactor_id',
+            item_post_field='post_comment__post')
+
+        if blocked_users_query:
+            blocked_reactions_query = Q(post_comment_id__in=post_comments_ids)
+
+            if emoji_id:
+                blocked_reactions_query.add(Q(emoji_id=emoji_id), Q.AND)
+
+            blocked_reactions_query.add(blocked_users_query, Q.AND)
+
+            blocked_emoji_counts = cls.objects.filter(blocked_reactions_query).values(
+                'post_comment_id', 'emoji_id').annotate(emoji_count=Count('id')).values_list('post_comment_id',
+                                                                                             'emoji_id',
+                                                                                             'emoji_count')
+
+        return _make_items_emoji_counts(emoji_counts=emoji_counts, blocked_emoji_counts=blocked_emoji_counts)
+
     @classmethod
     def count_reactions_for_post_with_id(cls, post_comment_id, reactor_id=None):
         count_query = Q(post_comment_id=post_comment_id, reactor__is_deleted=False)
@@ -1238,9 +2037,102 @@ class PostCommentReaction(models.Model):
 
     def save(self, *args, **kwargs):
         ''' On save, update timestamps '''
+        previous_emoji_id = None
+
         if not self.id:
             self.created = timezone.now()
-        return super(PostCommentReaction, self).save(*args, **kwargs)
+        else:
+            previous_emoji_id = PostCommentReaction.objects.filter(pk=self.pk).values_list('emoji_id',
+                                                                                            flat=True).first()
+
+        post_comment_reaction = super(PostCommentReaction, self).save(*args, **kwargs)
+
+        if previous_emoji_id != self.emoji_id:
+            if previous_emoji_id:
+                PostCommentReactionEmojiCount.update_count(post_comment_id=self.post_comment_id,
+                                                           emoji_id=previous_emoji_id, value=-1)
+            PostCommentReactionEmojiCount.update_count(post_comment_id=self.post_comment_id, emoji_id=self.emoji_id,
+                                                       value=1)
+
+        return post_comment_reaction
+
+    def delete(self, *args, **kwargs):
+        super(PostCommentReaction, self).delete(*args, **kwargs)
+        PostCommentReactionEmojiCount.update_count(post_comment_id=self.post_comment_id, emoji_id=self.emoji_id,
+                                                   value=-1)
+
+
+class PostCommentReactionEmojiCount(models.Model):
+    """
+    The reactions count of a post comment for an emoji, maintained on PostCommentReaction writes
+    """
+    post_comment = models.ForeignKey(PostComment, on_delete=models.CASCADE, related_name='emoji_counts')
+    emoji = models.ForeignKey(Emoji, on_delete=models.CASCADE, related_name='post_comment_reactions_emoji_counts')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post_comment', 'emoji',)
+
+    @classmethod
+    def update_count(cls, post_comment_id, emoji_id, value):
+        _update_reactions_emoji_count(reactions_emoji_count_model=cls, value=value, post_comment_id=post_comment_id,
+                                      emoji_id=emoji_id)
+
+
+def _get_users_with_usernames(usernames, exclude_user_id):
+    """
+    The users with the given case insensitive usernames in one query, eg. the mentioned ones
+    """
+    User = get_user_model()
+
+    usernames_query = Q()
+
+    for username in usernames:
+        usernames_query.add(Q(username__iexact=username), Q.OR)
+
+    return list(User.objects.only('id', 'username').filter(usernames_query).exclude(pk=exclude_user_id))
+
+
+def _make_items_emoji_counts(emoji_counts, blocked_emoji_counts):
+    """
+    Takes the (item id, emoji id, count) of the maintained emoji counts and of the reactions to discount.
+    Returns a dict of item id to a list of {'emoji', 'count'} ordered by count.
+    """
+    counts = {}
+
+    for item_id, emoji_id, count in emoji_counts:
+        counts[(item_id, emoji_id)] = count
+
+    for item_id, emoji_id, count in blocked_emoji_counts:
+        counts[(item_id, emoji_id)] = counts.get((item_id, emoji_id), 0) - count
+
+    emojis = Emoji.objects.in_bulk({emoji_id for (item_id, emoji_id), count in counts.items() if count > 0})
+
+    items_emoji_counts = {}
+
+    for (item_id, emoji_id), count in sorted(counts.items(), key=lambda item_count: item_count[1], reverse=True):
+        if count > 0:
+            items_emoji_counts.setdefault(item_id, []).append({'emoji': emojis[emoji_id], 'count': count})
+
+    return items_emoji_counts
+
+
+def _update_reactions_emoji_count(reactions_emoji_count_model, value, **lookup):
+    reactions_emoji_counts = reactions_emoji_count_model.objects.filter(**lookup)
+
+    if value < 0:
+        reactions_emoji_counts.filter(count__gte=-value).update(count=F('count') + value)
+        return
+
+    if reactions_emoji_counts.update(count=F('count') + value):
+        return
+
+    try:
+        with transaction.atomic():
+            reactions_emoji_count_model.objects.create(count=value, **lookup)
+    except IntegrityError:
+        # Created concurrently by another reaction
+        reactions_emoji_counts.update(count=F('count') + value)
 
 
 class PostMute(models.Model):
@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.db.models import Q
 
 from openbook_common.utils.model_loaders import get_post_model, get_moderated_object_model, get_community_model, \
-    get_circle_model
+    get_circle_model, get_community_membership_model
 
 
 def make_only_posts_with_max_id(max_id):
@@ -40,34 +41,57 @@ def make_exclude_reported_and_approved_posts_query():
     return ~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED)
 
 
-def make_exclude_reported_posts_by_user_with_id_query(user_id):
-    return ~Q(moderated_object__reports__reporter_id=user_id)
+def make_exclude_reported_posts_for_user_query(user, post_field=None):
+    reported_posts_ids = user.get_reported_posts_ids()
 
+    if not reported_posts_ids:
+        return Q()
 
-def make_exclude_community_posts_banned_from_for_user_with_id_query(user_id):
-    return ~Q(community__banned_users__id=user_id)
+    return ~Q(**{_make_post_field_lookup(post_field, 'id__in'): reported_posts_ids})
 
 
-def make_exclude_closed_posts_in_community_for_user_with_id_query(user_id):
-    return make_exclude_closed_posts_query() | Q(creator_id=user_id)
+def make_exclude_community_posts_banned_from_for_user_query(user, post_field=None):
+    banned_from_communities_ids = user.get_banned_from_communities_ids()
 
+    if not banned_from_communities_ids:
+        return Q()
 
-def make_exclude_closed_posts_query():
-    return Q(is_closed=False)
+    return ~Q(**{_make_post_field_lookup(post_field, 'community_id__in'): banned_from_communities_ids})
 
 
-def make_exclude_blocked_community_posts_for_user_and_community_with_ids(user_id, community_id):
-    # Don't retrieve posts of blocked users, except if they're staff members
-    blocked_users_query = ~Q(Q(creator__blocked_by_users__blocker_id=user_id) | Q(
-        creator__user_blocks__blocked_user_id=user_id))
+def make_exclude_blocked_posts_for_user_query(user, post_field=None):
+    blocked_users_ids = user.get_blocked_with_users_ids()
 
-    blocked_users_query_staff_members = Q(creator__communities_memberships__community_id=community_id)
-    blocked_users_query_staff_members.add(Q(creator__communities_memberships__is_administrator=True) | Q(
-        creator__communities_memberships__is_moderator=True), Q.AND)
+    if not blocked_users_ids:
+        return Q()
 
-    blocked_users_query.add(~blocked_users_query_staff_members, Q.AND)
+    return ~Q(**{_make_post_field_lookup(post_field, 'creator_id__in'): blocked_users_ids})
 
-    return blocked_users_query
+
+def make_exclude_communities_posts_query(communities_ids, post_field=None):
+    if not communities_ids:
+        return Q()
+
+    return ~Q(**{_make_post_field_lookup(post_field, 'community_id__in'): communities_ids})
+
+
+def _make_post_field_lookup(post_field, lookup):
+    # The exclusions are matched against the post columns directly, so no joins are needed for them
+    if not post_field:
+        return lookup
+
+    if lookup == 'id__in':
+        return '%s_id__in' % post_field
+
+    return '%s__%s' % (post_field, lookup)
+
+
+def make_exclude_closed_posts_in_community_for_user_with_id_query(user_id):
+    return make_exclude_closed_posts_query() | Q(creator_id=user_id)
+
+
+def make_exclude_closed_posts_query():
+    return Q(is_closed=False)
 
 
 def make_only_visible_community_posts_for_user_with_id_query(user_id):
@@ -82,11 +106,6 @@ def make_exclude_community_posts_query():
     return Q(community__isnull=True)
 
 
-def make_exclude_blocked_posts_for_user_with_id_query(user_id):
-    return ~Q(Q(creator__blocked_by_users__blocker_id=user_id) | Q(
-        creator__user_blocks__blocked_user_id=user_id))
-
-
 def make_only_public_community_posts_query():
     Community = get_community_model()
     return Q(community__type=Community.COMMUNITY_TYPE_PUBLIC, )
@@ -98,11 +117,27 @@ def make_only_world_circle_posts_query():
     return Q(circles__id=world_circle_id)
 
 
+def make_only_posts_in_circles_with_ids_query(circles_ids):
+    # A semi-join, posts in several of the circles are not duplicated
+    Circle = get_circle_model()
+    circles_posts_ids = Circle.posts.through.objects.filter(circle_id__in=circles_ids).values('post_id')
+    return Q(id__in=circles_posts_ids)
+
+
+def make_only_posts_in_communities_with_ids_or_public_query(communities_ids):
+    communities_posts_query = make_only_public_community_posts_query()
+
+    if communities_ids:
+        communities_posts_query.add(Q(community_id__in=communities_ids), Q.OR)
+
+    return communities_posts_query
+
+
 def make_only_public_posts_query():
     return make_only_public_community_posts_query() | make_only_world_circle_posts_query()
 
 
-def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
+def make_get_hashtag_posts_for_user_query(hashtag, user):
     # Retrieve posts with the given hashtag
     hashtag_posts_query = make_only_posts_with_hashtag_with_id_query(hashtag_id=hashtag.pk)
 
@@ -113,7 +148,7 @@ def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
     hashtag_posts_query.add(make_exclude_soft_deleted_posts_query(), Q.AND)
 
     # Dont retrieve posts from blocked people
-    hashtag_posts_query.add(make_exclude_blocked_posts_for_user_with_id_query(user_id=user_id), Q.AND)
+    hashtag_posts_query.add(make_exclude_blocked_posts_for_user_query(user=user), Q.AND)
 
     # Only retrieve published posts
     hashtag_posts_query.add(make_only_published_posts_query(), Q.AND)
@@ -122,10 +157,10 @@ def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
     hashtag_posts_query.add(make_exclude_reported_and_approved_posts_query(), Q.AND)
 
     # Dont retrieve items we have reported
-    hashtag_posts_query.add(make_exclude_reported_posts_by_user_with_id_query(user_id=user_id), Q.AND)
+    hashtag_posts_query.add(make_exclude_reported_posts_for_user_query(user=user), Q.AND)
 
     # Dont retrieve posts from communities we're  banned from
-    hashtag_posts_query.add(make_exclude_community_posts_banned_from_for_user_with_id_query(user_id=user_id), Q.AND)
+    hashtag_posts_query.add(make_exclude_community_posts_banned_from_for_user_query(user=user), Q.AND)
 
     # Dont retrieve closed posts
     hashtag_posts_query.add(make_exclude_closed_posts_query(), Q.AND)
@@ -133,12 +168,70 @@ def make_get_hashtag_posts_for_user_with_id_query(hashtag, user_id):
     return hashtag_posts_query
 
 
-def make_circles_posts_query_for_user(user):
-    target_user_circles_posts_query = make_only_posts_of_circles_part_for_user_with_id_query(
-        user_id=user.pk) | make_only_world_circle_posts_query()
+def make_only_items_of_users_blocked_with_user_for_posts_query(user, posts, item_user_field,
+                                                               include_for_community_staff=True,
+                                                               item_post_field='post'):
+    """
+    Matches the reactions/comments (given the field of their creator and of their post) on posts by users blocking
+    or blocked by user. Items of the staff members of a post community are not matched. If
+    include_for_community_staff, neither are any items on posts of communities user is a staff member of.
+    Returns None if user has no blocks.
+    """
+    blocked_users_ids = user.get_blocked_with_users_ids()
+
+    if not blocked_users_ids:
+        return None
+
+    blocked_users_query = Q(**{'%s__in' % item_user_field: blocked_users_ids})
+
+    communities_ids = {post.community_id for post in posts if post.community_id}
+
+    if not communities_ids:
+        return blocked_users_query
+
+    CommunityMembership = get_community_membership_model()
+
+    staff_memberships = CommunityMembership.objects.filter(Q(is_administrator=True) | Q(is_moderator=True),
+                                                           community_id__in=communities_ids,
+                                                           user_id__in=blocked_users_ids | {user.pk}).values_list(
+        'community_id', 'user_id')
+
+    staff_communities_ids = set()
+    blocked_staff_members_ids_by_community = {}
+
+    for community_id, staff_member_id in staff_memberships:
+        if staff_member_id == user.pk:
+            staff_communities_ids.add(community_id)
+        else:
+            blocked_staff_members_ids_by_community.setdefault(community_id, set()).add(staff_member_id)
+
+    if include_for_community_staff and staff_communities_ids:
+        blocked_users_query.add(~Q(**{'%s__community_id__in' % item_post_field: staff_communities_ids}), Q.AND)
+
+    for community_id, blocked_staff_members_ids in blocked_staff_members_ids_by_community.items():
+        if not include_for_community_staff and community_id in staff_communities_ids:
+            continue
+        blocked_users_query.add(
+            ~Q(**{'%s__community_id' % item_post_field: community_id,
+                  '%s__in' % item_user_field: blocked_staff_members_ids}),
+            Q.AND)
+
+    return blocked_users_query
+
+
+def make_only_top_post_eligible_posts_query():
+    Post = get_post_model()
+    Community = get_community_model()
+    ModeratedObject = get_moderated_object_model()
+
+    top_post_eligible_posts_query = Q(community__isnull=False, community__type=Community.COMMUNITY_TYPE_PUBLIC)
+    top_post_eligible_posts_query.add(Q(is_closed=False, is_deleted=False, status=Post.STATUS_PUBLISHED), Q.AND)
+    top_post_eligible_posts_query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
 
-    return target_user_circles_posts_query
+    return top_post_eligible_posts_query
 
 
-def make_community_posts_query_for_user(user):
-    return make_only_visible_community_posts_for_user_with_id_query(user_id=user.pk)
+def make_only_top_post_candidates_query():
+    # Mirrors Post.meets_top_post_counts_criteria
+    return Q(unique_reactors_count__gte=settings.MIN_UNIQUE_TOP_POST_REACTIONS_COUNT) | Q(
+        unique_commenters_count__gte=settings.MIN_UNIQUE_TOP_POST_COMMENTS_COUNT)
@@ -1,15 +1,22 @@
 from django.db.models import Q
 
-from openbook_common.utils.model_loaders import get_post_model, get_moderated_object_model
+from openbook_common.utils.model_loaders import get_post_model, get_moderated_object_model, get_circle_model, \
+    get_community_membership_model
 from openbook_posts.queries import \
-    make_community_posts_query_for_user, make_only_posts_with_max_id, \
-    make_only_posts_with_min_id, make_circles_posts_query_for_user
+    make_only_posts_with_max_id, make_only_posts_with_min_id, make_exclude_communities_posts_query, \
+    make_exclude_reported_posts_for_user_query, make_exclude_blocked_posts_for_user_query, \
+    make_exclude_community_posts_banned_from_for_user_query, make_only_posts_in_circles_with_ids_query, \
+    make_only_posts_in_communities_with_ids_or_public_query
 
 
 def get_posts_for_user_collection(target_user, source_user, posts_only=None, posts_prefetch_related=None,
                                   max_id=None,
                                   min_id=None,
                                   include_community_posts=False):
+    """
+    The circles and communities the source user can see the posts of are resolved up front, so the posts of
+    the target user are retrieved with a scan on (creator_id, id) without joins requiring a DISTINCT
+    """
     Post = get_post_model()
 
     posts_collection_manager = Post.objects
@@ -29,7 +36,7 @@ def get_posts_for_user_collection(target_user, source_user, posts_only=None, pos
 
     query = Q(
         # Created by the target user
-        creator__username=target_user.username,
+        creator_id=target_user.pk,
         # Not closed
         is_closed=False,
         # Not deleted
@@ -38,13 +45,13 @@ def get_posts_for_user_collection(target_user, source_user, posts_only=None, pos
         status=Post.STATUS_PUBLISHED,
     )
 
-    posts_query = make_circles_posts_query_for_user(
-        user=source_user
+    posts_query = make_only_posts_in_circles_with_ids_query(
+        circles_ids=_get_visible_circles_ids_of_user_for_user(target_user=target_user, source_user=source_user)
     )
 
     if include_community_posts:
-        posts_query.add(make_community_posts_query_for_user(
-            user=source_user
+        posts_query.add(make_only_posts_in_communities_with_ids_or_public_query(
+            communities_ids=_get_joined_communities_ids_for_user(user=source_user)
         ), Q.OR)
 
     query.add(posts_query, Q.AND)
@@ -52,20 +59,40 @@ def get_posts_for_user_collection(target_user, source_user, posts_only=None, pos
     if id_boundary_query:
         query.add(id_boundary_query, Q.AND)
 
+    # Excluded communities posts
+    query.add(make_exclude_communities_posts_query(
+        communities_ids=target_user.get_profile_posts_excluded_communities_ids()), Q.AND)
+    # Reported posts
+    query.add(make_exclude_reported_posts_for_user_query(user=source_user), Q.AND)
+    # Posts of users we blocked or that have blocked us
+    query.add(make_exclude_blocked_posts_for_user_query(user=source_user), Q.AND)
+    # Posts of communities banned from
+    query.add(make_exclude_community_posts_banned_from_for_user_query(user=source_user), Q.AND)
+
     ModeratedObject = get_moderated_object_model()
 
-    posts_visibility_exclude_query = Q(
-        # Excluded communities posts
-        Q(community__profile_posts_community_exclusions__user=target_user.pk) |
-        # Reported posts
-        Q(moderated_object__reports__reporter_id=source_user.pk) |
-        # Approved reported posts
-        Q(moderated_object__status=ModeratedObject.STATUS_APPROVED) |
-        # Posts of users we blocked or that have blocked us
-        Q(creator__blocked_by_users__blocker_id=source_user.pk) | Q(
-            creator__user_blocks__blocked_user_id=source_user.pk) |
-        # Posts of communities banned from
-        Q(community__banned_users__id=source_user.pk)
-    )
+    # Approved reported posts
+    query.add(~Q(moderated_object__status=ModeratedObject.STATUS_APPROVED), Q.AND)
+
+    return posts_collection_manager.filter(query)
+
+
+def _get_visible_circles_ids_of_user_for_user(target_user, source_user):
+    """
+    The world circle and the circles of target user in which source user is a confirmed connection
+    """
+    Circle = get_circle_model()
+
+    circles_ids = set(Circle.objects.filter(creator_id=target_user.pk,
+                                            connections__target_user_id=source_user.pk,
+                                            connections__target_connection__circles__isnull=False).values_list(
+        'id', flat=True))
+
+    circles_ids.add(Circle.get_world_circle_id())
+
+    return circles_ids
+
 
-    return posts_collection_manager.filter(query).exclude(posts_visibility_exclude_query).distinct()
+def _get_joined_communities_ids_for_user(user):
+    CommunityMembership = get_community_membership_model()
+    return list(CommunityMembership.objects.filter(user_id=user.pk).values_list('community_id', flat=True))
@@ -33,6 +33,8 @@ from openbook_hashtags.models import Hashtag
 from openbook_notifications.models import PostUserMentionNotification, Notification
 from openbook_posts.models import Post, PostUserMention, PostMedia
 from openbook_common.models import ProxyBlacklistedDomain
+from openbook_translation import translation_strategy
+from openbook_translation.translated_texts import make_translated_text_cache_key
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -649,6 +651,11 @@ class PostItemAPITests(OpenbookAPITestCase):
         image = ImageFile(tmp_file)
 
         post = user.create_public_post(text=make_fake_post_text(), image=image)
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        post = Post.objects.get(pk=post.pk)
         file = post.image.image.file
 
         user.delete_post(post=post)
@@ -2203,6 +2210,31 @@ class TranslatePostAPITests(OpenbookAPITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_translates_post_text_once(self):
+        """
+        should translate the same post text once and serve the next translations from the cache
+        """
+        user = make_user()
+        Language = get_language_model()
+        user.translation_language = Language.objects.get(code='en')
+        user.save()
+        text = 'Ik ben en man 😀. Jij bent en vrouw.'
+        headers = make_authentication_headers_for_user(user)
+        post = user.create_public_post(text=text)
+        cache.delete(make_translated_text_cache_key(text=text, source_language_code='nl', target_language_code='en'))
+
+        url = self._get_url(post=post)
+
+        with mock.patch.object(translation_strategy, 'translate_text',
+                               wraps=translation_strategy.translate_text) as translate_text_mock:
+            first_response = self.client.post(url, **headers)
+            second_response = self.client.post(url, **headers)
+
+        self.assertEqual(first_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(second_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(second_response.content)['translated_text'], 'I am a man 😀. You\'re a woman.')
+        self.assertEqual(translate_text_mock.call_count, 1)
+
     def _get_url(self, post):
         return reverse('translate-post', kwargs={
             'post_uuid': post.uuid
@@ -2728,6 +2760,45 @@ class PublishPostAPITests(OpenbookAPITestCase):
         'openbook_circles/fixtures/circles.json'
     ]
 
+    def test_publishing_post_with_unprocessable_media_image_does_not_get_stuck(self):
+        """
+        should drop a media image which cannot be processed and publish the post with its text
+        """
+        user = make_user()
+
+        post = user.create_public_post(text=make_fake_post_text(), is_draft=True)
+        post.add_media(file=self._make_truncated_image_file())
+
+        post.publish()
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        post.refresh_from_db()
+
+        self.assertEqual(post.status, Post.STATUS_PUBLISHED)
+        self.assertEqual(post.count_media(), 0)
+        self.assertFalse(post.media_thumbnail)
+
+    def test_publishing_post_without_processable_media_returns_it_to_draft(self):
+        """
+        should return a post to draft instead of leaving it processing when none of its media can be processed
+        """
+        user = make_user()
+
+        post = user.create_public_post(is_draft=True)
+        post.add_media(file=self._make_truncated_image_file())
+
+        post.publish()
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        post.refresh_from_db()
+
+        self.assertEqual(post.status, Post.STATUS_DRAFT)
+        self.assertEqual(post.count_media(), 0)
+
     def test_publishing_draft_image_post_should_process_media(self):
         """
         should process draft image post when publishing
@@ -2760,6 +2831,16 @@ class PublishPostAPITests(OpenbookAPITestCase):
 
         self.assertEqual(post.status, Post.STATUS_PUBLISHED)
 
+        post_image = post.media.get(type=PostMedia.MEDIA_TYPE_IMAGE).content_object
+
+        self.assertEqual(post_image.width, 100)
+        self.assertEqual(post_image.height, 100)
+        self.assertTrue(post_image.image)
+        self.assertTrue(post_image.thumbnail)
+        self.assertFalse(post_image.raw_file)
+        self.assertEqual(post.media_width, 100)
+        self.assertTrue(post.media_thumbnail)
+
     def test_publishing_draft_video_post_should_process_media(self):
         """
         should process draft video post mp4|3gp|gif media when publishing
@@ -2963,6 +3044,21 @@ class PublishPostAPITests(OpenbookAPITestCase):
         hashtag = Hashtag.objects.get(name=hashtag_name)
         self.assertTrue(hashtag.has_image())
 
+    def _make_truncated_image_file(self):
+        """
+        A jpeg cut in half, it passes the checks of the upload but cannot be decoded
+        """
+        image = Image.effect_noise((100, 100), 100).convert('RGB')
+        image_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(image_file)
+        image_file.seek(0)
+        image_bytes = image_file.read()
+
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        tmp_file.write(image_bytes[:len(image_bytes) // 2])
+        tmp_file.seek(0)
+        return File(tmp_file)
+
     def _get_url(self, post):
         return reverse('publish-post', kwargs={
             'post_uuid': post.uuid
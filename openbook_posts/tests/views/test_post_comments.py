@@ -1,5 +1,8 @@
 # Create your tests here.
 import json
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from faker import Faker
 from rest_framework import status
@@ -12,11 +15,13 @@ import random
 
 from openbook_common.tests.helpers import make_authentication_headers_for_user, make_fake_post_text, \
     make_fake_post_comment_text, make_user, make_circle, make_community, make_private_community, \
-    make_moderation_category, get_test_usernames, make_hashtag_name, make_hashtag
+    make_moderation_category, get_test_usernames, make_hashtag_name, make_hashtag, make_reactions_emoji_group, \
+    make_emoji
 from openbook_hashtags.models import Hashtag
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.models import PostCommentNotification, PostCommentReplyNotification, \
     PostCommentUserMentionNotification, Notification
+from openbook_posts.jobs import detect_post_comment_language
 from openbook_posts.models import PostComment, PostCommentUserMention, Post
 
 logger = logging.getLogger(__name__)
@@ -873,6 +878,50 @@ class PostCommentsAPITests(OpenbookAPITestCase):
         post_comment = PostComment.objects.get(post_id=post.pk, text=post_comment_text)
         self.assertTrue(post_comment.language is not None)
 
+    def test_commenting_in_a_post_does_not_set_language_for_very_short_comment(self):
+        """
+         should not detect the language of a comment without enough letters and return 201
+         """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        post_comment_text = '👍 10'
+
+        data = self._get_create_post_comment_request_data(post_comment_text)
+
+        url = self._get_url(post)
+        response = self.client.put(url, data, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post_comment = PostComment.objects.get(post_id=post.pk, text=post_comment_text)
+        self.assertIsNone(post_comment.language)
+
+    @override_settings(LANGUAGE_DETECTION_JOBS_ASYNC=True)
+    def test_commenting_in_a_post_sets_language_for_comment_asynchronously(self):
+        """
+         should set comment language with a job when the language detection is asynchronous and return 201
+         """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        post_comment_text = make_fake_post_comment_text()
+
+        data = self._get_create_post_comment_request_data(post_comment_text)
+
+        url = self._get_url(post)
+        response = self.client.put(url, data, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post_comment = PostComment.objects.get(post_id=post.pk, text=post_comment_text)
+        self.assertIsNone(post_comment.language)
+
+        detect_post_comment_language(post_comment_id=post_comment.pk)
+
+        post_comment.refresh_from_db()
+        self.assertIsNotNone(post_comment.language)
+
     def test_cannot_comment_in_foreign_post(self):
         """
          should not be able to comment in a foreign encircled post and return 400
@@ -2057,6 +2106,96 @@ class PostCommentsAPITests(OpenbookAPITestCase):
         for post_id in post_comments_ids:
             self.assertIn(post_id, response_post_comments_ids)
 
+    def test_retrieving_comments_queries_do_not_grow_with_comments(self):
+        """
+        should retrieve the comments with their reactions, emoji counts and mutes with the same amount of queries
+        regardless of their amount
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        post_creator = make_user()
+        community = make_community(creator=post_creator)
+        post = post_creator.create_community_post(text=make_fake_post_text(), community_name=community.name)
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        def make_reacted_and_muted_comment():
+            commenter = make_user()
+            commenter.join_community_with_name(community_name=community.name)
+            post_comment = commenter.comment_post(post=post, text=make_fake_post_comment_text())
+            user.react_to_post_comment_with_id(post_comment_id=post_comment.pk, emoji_id=emoji.pk)
+            user.mute_post_comment_with_id(post_comment_id=post_comment.pk)
+
+        make_reacted_and_muted_comment()
+
+        url = self._get_url(post)
+
+        with CaptureQueriesContext(connection) as single_comment_queries:
+            response = self.client.get(url, **headers)
+
+        self.assertEqual(len(json.loads(response.content)), 1)
+
+        for i in range(0, 4):
+            make_reacted_and_muted_comment()
+
+        with CaptureQueriesContext(connection) as several_comments_queries:
+            response = self.client.get(url, **headers)
+
+        response_comments = json.loads(response.content)
+
+        self.assertEqual(len(response_comments), 5)
+
+        for response_comment in response_comments:
+            self.assertTrue(response_comment['is_muted'])
+            self.assertEqual(response_comment['reaction']['emoji']['id'], emoji.pk)
+            self.assertEqual(response_comment['reactions_emoji_counts'][0]['count'], 1)
+            self.assertEqual(len(response_comment['commenter']['communities_memberships']), 1)
+
+        self.assertEqual(len(several_comments_queries), len(single_comment_queries))
+
+    def test_retrieves_first_replies_of_comments(self):
+        """
+        should retrieve the first replies of each comment along with their replies counts and reactions
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        post_comments = [user.comment_post_with_id(post_id=post.pk, text=make_fake_post_comment_text()) for i in
+                         range(0, 2)]
+
+        post_comments_replies = [
+            [user.reply_to_comment_for_post(post_comment=post_comment, post=post, text=make_fake_post_comment_text())
+             for i in range(0, 3)] for post_comment in post_comments]
+
+        reacted_reply = post_comments_replies[0][2]
+        user.react_to_post_comment_with_id(post_comment_id=reacted_reply.pk, emoji_id=emoji.pk)
+
+        url = self._get_url(post)
+        response = self.client.get(url, {'sort': 'DESC'}, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_comments = json.loads(response.content)
+
+        self.assertEqual([response_comment['id'] for response_comment in response_comments],
+                         [post_comment.pk for post_comment in reversed(post_comments)])
+
+        for response_comment, post_comment_replies in zip(response_comments, reversed(post_comments_replies)):
+            self.assertEqual(response_comment['replies_count'], 3)
+            self.assertEqual([reply['id'] for reply in response_comment['replies']],
+                             [reply.pk for reply in reversed(post_comment_replies)][:2])
+
+        response_reacted_reply = response_comments[1]['replies'][0]
+        self.assertEqual(response_reacted_reply['reaction']['emoji']['id'], emoji.pk)
+        self.assertEqual(response_reacted_reply['reactions_emoji_counts'][0]['count'], 1)
+        self.assertEqual(response_reacted_reply['parent_comment']['id'], post_comments[0].pk)
+
     def _get_create_post_comment_request_data(self, post_comment_text):
         return {
             'text': post_comment_text
@@ -1,10 +1,13 @@
 # Create your tests here.
 import json
+import os
 import tempfile
 
 from PIL import Image
 from django.conf import settings
 from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
 from django.urls import reverse
 from django_rq import get_worker
 from faker import Faker
@@ -19,7 +22,11 @@ import logging
 from openbook_common.tests.helpers import make_authentication_headers_for_user, make_fake_post_text, \
     make_user, get_test_videos, get_test_image, get_test_video, make_circle, make_community, get_test_images
 from openbook_communities.models import Community
-from openbook_posts.models import PostMedia, Post
+from openbook_posts.models import PostMedia, Post, PostVideo
+from video_encoding.backends.base import BaseEncodingBackend
+from video_encoding.exceptions import VideoEncodingError
+from video_encoding.models import Format
+from video_encoding.tasks import convert_video
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -34,6 +41,26 @@ class PostMediaAPITests(OpenbookAPITestCase):
         'openbook_circles/fixtures/circles.json',
     ]
 
+    def test_cant_add_unreadable_media_image_to_draft_post(self):
+        """
+        should not be able to add an image which cannot be read to a draft post and return 400
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        draft_post = user.create_public_post(is_draft=True)
+
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        tmp_file.write(b'\xff\xd8\xff\xe0\x00\x10JFIF\x00' + bytes(range(256)) * 8)
+        tmp_file.seek(0)
+
+        url = self._get_url(post=draft_post)
+
+        response = self.client.put(url, {'file': tmp_file}, **headers, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(draft_post.count_media(), 0)
+
     def test_can_add_media_image_to_draft_post(self):
         """
         should be able to add a media image to a draft post
@@ -79,14 +106,90 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
         post_image = post_media_image.content_object
 
+        self.assertTrue(post_image.raw_file)
+
+        draft_post.publish()
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        post_image.refresh_from_db()
+
         self.assertTrue(hasattr(post_image, 'image'))
 
         self.assertEqual(post_image.width, image_width)
-        self.assertEqual(post_image.width, image_width)
+        self.assertEqual(post_image.height, image_height)
+        self.assertFalse(post_image.raw_file)
 
         # Not for long though
         self.assertTrue(hasattr(draft_post, 'image'))
 
+    def test_adding_already_stored_media_image_reuses_its_files(self):
+        """
+        should reuse the stored files of an already processed media image with the same contents
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        image = Image.new('RGB', (100, 100))
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(tmp_file)
+
+        posts = [user.create_public_post(is_draft=True) for i in range(0, 2)]
+
+        for post in posts:
+            tmp_file.seek(0)
+            response = self.client.put(self._get_url(post=post), {'file': tmp_file}, **headers, format='multipart')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            post.publish()
+
+            # Run the process handled by a worker
+            get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        first_post_image = posts[0].get_first_media().content_object
+        second_post_image = posts[1].get_first_media().content_object
+
+        self.assertNotEqual(first_post_image.pk, second_post_image.pk)
+        self.assertEqual(first_post_image.image.name, second_post_image.image.name)
+        self.assertEqual(first_post_image.thumbnail.name, second_post_image.thumbnail.name)
+        self.assertEqual(second_post_image.width, 100)
+        self.assertFalse(second_post_image.raw_file)
+
+    def test_adding_media_image_does_not_reuse_deleted_files(self):
+        """
+        should not reuse the files of a media image with the same contents once they were deleted
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+
+        image = Image.new('RGB', (100, 100))
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(tmp_file)
+
+        deleted_media_post = user.create_public_post(is_draft=True)
+        tmp_file.seek(0)
+        deleted_media_post.add_media(file=File(tmp_file))
+        deleted_media_post.publish()
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        deleted_post_image = deleted_media_post.get_first_media().content_object
+        deleted_image_name = deleted_post_image.image.name
+
+        deleted_media_post.delete_media()
+
+        post = user.create_public_post(is_draft=True)
+        tmp_file.seek(0)
+        response = self.client.put(self._get_url(post=post), {'file': tmp_file}, **headers, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        post_image = post.get_first_media().content_object
+
+        self.assertTrue(post_image.raw_file)
+        self.assertNotEqual(post_image.image.name, deleted_image_name)
+
     def test_can_add_media_video_to_draft_post(self):
         """
         should be able to add a media video to a draft post
@@ -184,7 +287,7 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
     def test_add_first_media_video_creates_media_thumbnail_and_dimensions(self):
         """
-        should create a post media_thumbnail and dimensions when adding the first media video
+        should create a post media_thumbnail and dimensions when processing the first media video
         """
         user = make_user()
         headers = make_authentication_headers_for_user(user=user)
@@ -203,6 +306,11 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
                 self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+                post.publish()
+
+                # Run the process handled by a worker
+                get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
                 post.refresh_from_db()
 
                 post_video = post.get_first_media().content_object
@@ -219,7 +327,7 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
     def test_add_first_media_image_creates_media_thumbnail_and_dimensions(self):
         """
-        should create a post media_thumbnail and dimensions when adding the first media image
+        should create a post media_thumbnail and dimensions when processing the first media image
         """
         user = make_user()
         headers = make_authentication_headers_for_user(user=user)
@@ -238,6 +346,11 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
                 self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+                post.publish()
+
+                # Run the process handled by a worker
+                get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
                 post.refresh_from_db()
 
                 post_image = post.get_first_media().content_object
@@ -255,7 +368,7 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
     def test_add_media_image_creates_image_thumbnails(self):
         """
-        should create an image thumbnail and dimensions when adding a media image
+        should create an image thumbnail and dimensions when processing a media image
         """
         user = make_user()
         headers = make_authentication_headers_for_user(user=user)
@@ -274,6 +387,11 @@ class PostMediaAPITests(OpenbookAPITestCase):
 
                 self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+                post.publish()
+
+                # Run the process handled by a worker
+                get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
                 post.refresh_from_db()
 
                 first_media = post.get_first_media()
@@ -906,3 +1024,109 @@ class PostMediaAPITests(OpenbookAPITestCase):
         return reverse('post-media', kwargs={
             'post_uuid': post.uuid
         })
+
+
+class RecordingEncodingBackend(BaseEncodingBackend):
+    """
+    Writes placeholder renditions and records the encodings it was asked for
+    """
+    name = 'Recording'
+    encodings = []
+    thumbnails = []
+    media_info_error = None
+
+    def encode(self, source_path, target_path, params):
+        return self.encode_renditions(source_path, [(target_path, params)])
+
+    def encode_renditions(self, source_path, renditions, total_time=None):
+        RecordingEncodingBackend.encodings.append(renditions)
+
+        for target_path, params in renditions:
+            with open(target_path, 'wb') as target_file:
+                target_file.write(b'rendition')
+
+        yield 100
+
+    def get_media_info(self, video_path):
+        if RecordingEncodingBackend.media_info_error:
+            raise RecordingEncodingBackend.media_info_error
+
+        return {'duration': 1.0, 'width': 16, 'height': 16}
+
+    def get_thumbnail(self, video_path, at_time=0.5):
+        RecordingEncodingBackend.thumbnails.append(video_path)
+
+        _, image_path = tempfile.mkstemp(suffix='.jpg')
+        Image.new('RGB', (16, 16)).save(image_path, 'JPEG')
+
+        return image_path
+
+
+@override_settings(VIDEO_ENCODING_BACKEND='openbook_posts.tests.views.test_post_media.RecordingEncodingBackend',
+                   VIDEO_ENCODING_FORMATS={
+                       'Recording': [
+                           {'name': 'mp4_sd', 'extension': 'mp4', 'params': ['-vf', 'scale=-2:480']},
+                           {'name': 'mp4_hd', 'extension': 'mp4', 'params': ['-vf', 'scale=-2:720']},
+                       ]
+                   })
+class ConvertPostVideoTests(OpenbookAPITestCase):
+    """
+    convert_video
+    """
+
+    def setUp(self):
+        super(ConvertPostVideoTests, self).setUp()
+        RecordingEncodingBackend.encodings = []
+        RecordingEncodingBackend.thumbnails = []
+        RecordingEncodingBackend.media_info_error = None
+
+    def tearDown(self):
+        RecordingEncodingBackend.media_info_error = None
+        super(ConvertPostVideoTests, self).tearDown()
+
+    def test_encodes_all_formats_in_a_single_encoding(self):
+        """
+        should encode every pending format of a video with a single multi output encoding
+        """
+        post_video = self._make_post_video()
+
+        convert_video(post_video.file)
+
+        self.assertEqual(len(RecordingEncodingBackend.encodings), 1)
+        renditions = RecordingEncodingBackend.encodings[0]
+        self.assertEqual([params for target_path, params in renditions],
+                         [['-vf', 'scale=-2:480'], ['-vf', 'scale=-2:720']])
+
+        video_formats = post_video.format_set.all()
+        self.assertEqual(sorted(video_format.format for video_format in video_formats), ['mp4_hd', 'mp4_sd'])
+
+        for video_format in video_formats:
+            self.assertEqual(video_format.progress, 100)
+            self.assertTrue(video_format.file)
+
+        for target_path, params in renditions:
+            self.assertFalse(os.path.exists(target_path))
+
+    def test_cleans_up_video_which_cannot_be_probed(self):
+        """
+        should delete the pending formats of a video which cannot be probed instead of raising
+        """
+        post_video = self._make_post_video()
+        RecordingEncodingBackend.media_info_error = VideoEncodingError('Invalid data found when processing input')
+
+        convert_video(post_video.file)
+
+        self.assertEqual(len(RecordingEncodingBackend.encodings), 0)
+        self.assertFalse(Format.objects.filter(object_id=post_video.pk).exists())
+
+    def _make_post_video(self):
+        user = make_user()
+        post = user.create_public_post(is_draft=True)
+
+        post_video = PostVideo.objects.create(post_id=post.pk,
+                                              raw_file=SimpleUploadedFile('video.mp4', b'video'))
+        # Assigned to the field file instead of the field, as the field would probe the video
+        post_video.file.name = post_video.raw_file.name
+        post_video.save()
+
+        return post_video
@@ -4,9 +4,14 @@ from unittest import mock
 
 from PIL import Image
 from django.conf import settings
+from django.core.cache import cache
 from django.core.files import File
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 from django_rq import get_worker
 from faker import Faker
 from rest_framework import status
@@ -27,15 +32,20 @@ from openbook_common.tests.helpers import make_user, make_users, make_fake_post_
     make_authentication_headers_for_user, make_circle, make_community, make_list, make_moderation_category, \
     get_test_usernames, get_test_videos, get_test_image, make_global_moderator, \
     make_fake_post_comment_text, make_reactions_emoji_group, make_emoji, make_hashtag_name, make_hashtag, \
-    get_test_valid_hashtags, get_test_invalid_hashtags
+    get_test_valid_hashtags, get_test_invalid_hashtags, make_random_language
 from openbook_common.utils.helpers import sha256sum
+from openbook_common.utils.model_loaders import get_language_model
 from openbook_communities.models import Community
 from openbook_hashtags.models import Hashtag
 from openbook_lists.models import List
 from openbook_moderation.models import ModeratedObject
 from openbook_notifications.models import PostUserMentionNotification, Notification, UserNewPostNotification
-from openbook_posts.jobs import curate_top_posts, curate_trending_posts
-from openbook_posts.models import Post, PostUserMention, PostMedia, TopPost, TrendingPost
+from openbook_posts.jobs import curate_top_posts, curate_trending_posts, trim_timeline_posts, flush_draft_posts, \
+    process_post_mentions_and_hashtags, reconcile_posts_counters, bootstrap_timeline_posts
+from openbook_posts.models import Post, PostUserMention, PostMedia, TopPost, TrendingPost, TimelinePost, \
+    PostImage, PostComment
+from openbook_translation import translation_strategy
+from openbook_translation.translated_texts import make_translated_text_cache_key
 
 logger = logging.getLogger(__name__)
 fake = Faker()
@@ -544,6 +554,124 @@ class PostsAPITests(OpenbookAPITestCase):
 
         self.assertFalse(PostUserMention.objects.filter(post_id=post.pk, user_id=user.pk).exists())
 
+    def test_users_who_can_see_posts_and_comments_match_can_see_checks(self):
+        """
+        should find the users who can see posts and comments at once like can_see_post and can_see_post_comment
+        """
+        community_creator = make_user()
+        creator = make_user()
+        commenter = make_user()
+        blocked_user = make_user()
+        banned_user = make_user()
+        connected_user = make_user()
+        reporter = make_user()
+        foreign_user = make_user()
+        users = [community_creator, creator, commenter, blocked_user, banned_user, connected_user, reporter,
+                 foreign_user]
+
+        community = make_community(creator=community_creator)
+
+        for user in [creator, commenter, blocked_user, banned_user]:
+            user.join_community_with_name(community_name=community.name)
+
+        community_creator.ban_user_with_username_from_community_with_name(username=banned_user.username,
+                                                                          community_name=community.name)
+
+        circle = make_circle(creator=creator)
+        creator.connect_with_user_with_id(user_id=connected_user.pk, circles_ids=[circle.pk])
+        connected_user.confirm_connection_with_user_with_id(user_id=creator.pk)
+
+        public_post = creator.create_public_post(text=make_fake_post_text())
+        encircled_post = creator.create_encircled_post(text=make_fake_post_text(), circles_ids=[circle.pk])
+        community_post = creator.create_community_post(community_name=community.name, text=make_fake_post_text())
+        closed_community_post = creator.create_community_post(community_name=community.name,
+                                                              text=make_fake_post_text())
+        moderated_community_post = creator.create_community_post(community_name=community.name,
+                                                                 text=make_fake_post_text())
+        posts = [public_post, encircled_post, community_post, closed_community_post, moderated_community_post]
+
+        post_comments = [commenter.comment_post(post=post, text=make_fake_post_comment_text()) for post in
+                         [public_post, community_post, closed_community_post, moderated_community_post]]
+
+        creator.block_user_with_id(user_id=blocked_user.pk)
+        foreign_user.block_user_with_id(user_id=commenter.pk)
+
+        report_category = make_moderation_category()
+        reporter.report_post(post=community_post, category_id=report_category.pk)
+        reporter.report_comment_for_post(post_comment=post_comments[0], post=public_post,
+                                         category_id=report_category.pk)
+
+        community_creator.close_post(post=closed_community_post)
+
+        foreign_user.report_post(post=moderated_community_post, category_id=report_category.pk)
+        moderated_object = ModeratedObject.get_or_create_moderated_object_for_post(post=moderated_community_post,
+                                                                                   category_id=report_category.pk)
+        community_creator.approve_moderated_object(moderated_object=moderated_object)
+
+        users_ids = [user.pk for user in users]
+
+        for post in Post.objects.filter(pk__in=[post.pk for post in posts]):
+            self.assertEqual(post.get_users_ids_who_can_see(users_ids=users_ids),
+                             {user.pk for user in users if user.can_see_post(post=post)})
+
+        for post_comment in PostComment.objects.filter(pk__in=[post_comment.pk for post_comment in post_comments]):
+            self.assertEqual(post_comment.get_users_ids_who_can_see(users_ids=users_ids),
+                             {user.pk for user in users if user.can_see_post_comment(post_comment=post_comment)})
+
+    def test_create_text_post_detects_several_mentions_and_hashtags(self):
+        """
+        should detect the mentions of the users who can see the post and the hashtags of a post at once
+        """
+        user = make_user()
+
+        headers = make_authentication_headers_for_user(user=user)
+
+        mentioned_users = [make_user() for i in range(0, 3)]
+        blocked_user = make_user()
+        user.block_user_with_id(user_id=blocked_user.pk)
+        hashtag_name = make_hashtag_name()
+        existing_hashtag = make_hashtag()
+
+        post_text = ' '.join(['@%s' % mentioned_user.username for mentioned_user in mentioned_users + [blocked_user]])
+        post_text += ' #%s #%s' % (hashtag_name, existing_hashtag.name)
+
+        url = self._get_url()
+        response = self.client.put(url, {'text': post_text}, **headers, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(text=post_text, creator_id=user.pk)
+
+        self.assertEqual(set(PostUserMention.objects.filter(post_id=post.pk).values_list('user_id', flat=True)),
+                         {mentioned_user.pk for mentioned_user in mentioned_users})
+        self.assertEqual(set(post.hashtags.values_list('name', flat=True)), {hashtag_name, existing_hashtag.name})
+
+    @override_settings(MENTIONS_AND_HASHTAGS_JOBS_ASYNC=True)
+    def test_create_text_post_detects_mentions_and_hashtags_in_job(self):
+        """
+        should detect the mentions and hashtags of the post in a job when MENTIONS_AND_HASHTAGS_JOBS_ASYNC is set
+        """
+        user = make_user()
+
+        headers = make_authentication_headers_for_user(user=user)
+
+        mentioned_user = make_user()
+        hashtag_name = make_hashtag_name()
+        post_text = 'Hello @%s #%s' % (mentioned_user.username, hashtag_name)
+
+        url = self._get_url()
+        response = self.client.put(url, {'text': post_text}, **headers, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(text=post_text, creator_id=user.pk)
+
+        self.assertFalse(PostUserMention.objects.filter(post_id=post.pk).exists())
+        self.assertFalse(post.hashtags.exists())
+
+        process_post_mentions_and_hashtags(post_id=post.pk)
+
+        self.assertTrue(PostUserMention.objects.filter(post_id=post.pk, user_id=mentioned_user.pk).exists())
+        self.assertTrue(post.hashtags.filter(name=hashtag_name).exists())
+
     def test_create_post_is_added_to_world_circle(self):
         """
         the created text post should automatically added to world circle
@@ -873,6 +1001,9 @@ class PostsAPITests(OpenbookAPITestCase):
 
                 response_post_id = response_post.get('id')
 
+                # Run the process handled by a worker
+                get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
                 media = PostMedia.objects.get(post_id=response_post_id, type=PostMedia.MEDIA_TYPE_VIDEO)
                 self.assertIsNotNone(media.content_object.thumbnail)
                 self.assertIsNotNone(media.content_object.thumbnail_width)
@@ -1075,6 +1206,93 @@ class PostsAPITests(OpenbookAPITestCase):
 
         self.assertEqual(user.posts.filter(text=post_text, status=Post.STATUS_DRAFT, circles__id=circle.pk).count(), 1)
 
+    def test_flush_draft_posts_deletes_expired_draft_posts(self):
+        """
+        should delete the draft posts not modified for a day when flushing draft posts, and their media files
+        """
+        user = make_user()
+
+        expired_draft_post = user.create_public_post(is_draft=True)
+        draft_post = user.create_public_post(is_draft=True)
+        post = user.create_public_post(text=make_fake_post_text())
+
+        image = Image.new('RGB', (100, 100))
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(tmp_file)
+        tmp_file.seek(0)
+
+        post_image = PostImage.create_post_media_image(image=File(tmp_file), post_id=expired_draft_post.pk, order=0)
+        post_image_storage = post_image.raw_file.storage
+        post_image_file_name = post_image.raw_file.name
+
+        Post.objects.filter(pk__in=[expired_draft_post.pk, post.pk]).update(
+            modified=timezone.now() - timezone.timedelta(days=2))
+
+        flush_draft_posts()
+
+        self.assertFalse(Post.objects.filter(pk=expired_draft_post.pk).exists())
+        self.assertFalse(PostImage.objects.filter(pk=post_image.pk).exists())
+        self.assertFalse(post_image_storage.exists(post_image_file_name))
+        self.assertTrue(Post.objects.filter(pk=draft_post.pk).exists())
+        self.assertTrue(Post.objects.filter(pk=post.pk).exists())
+
+    def test_flush_draft_posts_keeps_media_files_shared_with_other_posts(self):
+        """
+        should not delete the media files of flushed draft posts which are shared with other posts
+        """
+        user = make_user()
+
+        expired_draft_post = user.create_public_post(is_draft=True)
+        post = user.create_public_post(is_draft=True)
+
+        image = Image.new('RGB', (100, 100))
+        tmp_file = tempfile.NamedTemporaryFile(suffix='.jpg')
+        image.save(tmp_file)
+
+        tmp_file.seek(0)
+        post.add_media(file=File(tmp_file))
+        post.publish()
+
+        # Run the process handled by a worker
+        get_worker('high', worker_class=SimpleWorker).work(burst=True)
+
+        tmp_file.seek(0)
+        expired_draft_post_image = PostImage.create_post_media_image(image=File(tmp_file),
+                                                                     post_id=expired_draft_post.pk, order=0)
+        post_image_storage = expired_draft_post_image.image.storage
+        post_image_file_name = expired_draft_post_image.image.name
+
+        self.assertEqual(post.get_first_media().content_object.image.name, post_image_file_name)
+
+        Post.objects.filter(pk=expired_draft_post.pk).update(modified=timezone.now() - timezone.timedelta(days=2))
+
+        flush_draft_posts()
+
+        self.assertFalse(Post.objects.filter(pk=expired_draft_post.pk).exists())
+        self.assertTrue(post_image_storage.exists(post_image_file_name))
+
+    @override_settings(DRAFT_POSTS_FLUSH_BATCH_SIZE=2)
+    def test_flush_draft_posts_continues_after_time_budget(self):
+        """
+        should enqueue the flush of the remaining draft posts when running out of time budget
+        """
+        user = make_user()
+
+        draft_posts = [user.create_public_post(is_draft=True) for i in range(3)]
+
+        Post.objects.filter(status=Post.STATUS_DRAFT).update(modified=timezone.now() - timezone.timedelta(days=2))
+
+        with override_settings(DRAFT_POSTS_FLUSH_TIME_BUDGET=-1), mock.patch.object(flush_draft_posts,
+                                                                                     'delay') as mock_delay:
+            flush_draft_posts()
+
+        mock_delay.assert_called_once_with(min_id=draft_posts[1].pk)
+        self.assertEqual(Post.objects.filter(status=Post.STATUS_DRAFT).count(), 1)
+
+        flush_draft_posts(min_id=draft_posts[1].pk)
+
+        self.assertFalse(Post.objects.filter(status=Post.STATUS_DRAFT).exists())
+
     def test_get_all_posts(self):
         """
         should be able to retrieve all posts
@@ -1476,6 +1694,109 @@ class PostsAPITests(OpenbookAPITestCase):
         for post_id in created_posts_ids:
             self.assertIn(post_id, response_posts_ids)
 
+    def test_get_public_posts_for_user_unauthenticated_counts(self):
+        """
+        should retrieve the maintained comments and reactions emoji counts of public posts being unauthenticated
+        """
+        user = make_user()
+        reactor = make_user()
+        commenter = make_user()
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+        other_emoji = make_emoji(group=emoji_group)
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        reactor.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        # Changing the reaction emoji moves the count to the new emoji
+        reactor.react_to_post_with_id(post_id=post.pk, emoji_id=other_emoji.pk)
+        user_post_reaction = user.get_reaction_for_post_with_id(post.pk)
+        user.delete_reaction_with_id_for_post_with_id(post_reaction_id=user_post_reaction.pk, post_id=post.pk)
+
+        post_comment = commenter.comment_post_with_id(post_id=post.pk, text=make_fake_post_comment_text())
+        commenter.comment_post_with_id(post_id=post.pk, text=make_fake_post_comment_text())
+        user.reply_to_comment_with_id_for_post_with_uuid(post_comment_id=post_comment.pk, post_uuid=post.uuid,
+                                                         text=make_fake_post_comment_text())
+        post_comment.soft_delete()
+
+        url = self._get_url()
+
+        response = self.client.get(url, {
+            'username': user.username
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(1, len(response_posts))
+
+        response_post = response_posts[0]
+
+        self.assertEqual(response_post['comments_count'], 1)
+
+        response_emoji_counts = response_post['reactions_emoji_counts']
+        self.assertEqual(1, len(response_emoji_counts))
+        self.assertEqual(response_emoji_counts[0]['emoji']['id'], other_emoji.pk)
+        self.assertEqual(response_emoji_counts[0]['count'], 1)
+
+        post_comment.refresh_from_db()
+        self.assertEqual(post_comment.count_replies(), 1)
+
+    def test_post_reactions_count_excludes_deleted_reactors(self):
+        """
+        should not count the reactions of soft deleted reactors in the reactions count of a post
+        """
+        user = make_user()
+        reactor = make_user()
+        deleted_reactor = make_user()
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        reactor.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        deleted_reactor.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+        deleted_reactor.soft_delete()
+
+        post.refresh_from_db()
+        self.assertEqual(post.count_reactions(), 1)
+        self.assertEqual(post.count_reactions(reactor_id=deleted_reactor.pk), 0)
+
+    def test_reconcile_posts_counters_corrects_drifted_counters(self):
+        """
+        should recompute the maintained counters of posts and post comments when reconciling the posts counters
+        """
+        user = make_user()
+        commenter = make_user()
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        commenter.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        post_comment = commenter.comment_post_with_id(post_id=post.pk, text=make_fake_post_comment_text())
+        user.reply_to_comment_with_id_for_post_with_uuid(post_comment_id=post_comment.pk, post_uuid=post.uuid,
+                                                         text=make_fake_post_comment_text())
+
+        Post.objects.filter(pk=post.pk).update(unique_reactors_count=5, unique_commenters_count=0, comments_count=3)
+        PostComment.objects.filter(pk=post_comment.pk).update(replies_count=0)
+
+        reconcile_posts_counters()
+
+        post.refresh_from_db()
+        post_comment.refresh_from_db()
+
+        self.assertEqual(post.unique_reactors_count, 1)
+        self.assertEqual(post.unique_commenters_count, 2)
+        self.assertEqual(post.count_comments(), 1)
+        self.assertEqual(post_comment.count_replies(), 1)
+
     def test_get_all_public_posts_for_user_unauthenticated(self):
         """
         should be able to retrieve all the public posts of an specific user
@@ -1824,6 +2145,34 @@ class PostsAPITests(OpenbookAPITestCase):
 
         self.assertEqual(len(response_posts), 0)
 
+    def test_retrieve_encircled_post_once_from_foreign_user_posts_when_in_several_circles(self):
+        """
+        should retrieve an encircled post of a foreign user once when part of several of its circles and return 200
+        """
+        user = make_user()
+        foreign_user = make_user()
+
+        user.connect_with_user_with_id(user_id=foreign_user.pk)
+
+        circles_ids = [make_circle(creator=foreign_user).pk for i in range(2)]
+        foreign_user.confirm_connection_with_user_with_id(user_id=user.pk, circles_ids=circles_ids)
+
+        post = foreign_user.create_encircled_post(text=make_fake_post_text(), circles_ids=circles_ids)
+
+        headers = make_authentication_headers_for_user(user)
+
+        url = self._get_url()
+
+        response = self.client.get(url, {
+            'username': foreign_user.username
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual([response_post['id'] for response_post in response_posts], [post.pk])
+
     def test_retrieve_public_community_post_from_foreign_user_posts_when_community_posts_visible(self):
         """
         should retrieve public community posts from foreign user when community_posts_visible is true and return 200
@@ -3274,6 +3623,67 @@ class PostsAPITests(OpenbookAPITestCase):
         comments_count = response_post['comments_count']
         self.assertTrue(comments_count, 2)
 
+    def test_comment_counts_on_posts_should_exclude_soft_deleted_comments(self):
+        """
+        should not count soft deleted comments in the comment counts on posts
+        """
+        user = make_user()
+        commenter = make_user()
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        commenter.comment_post_with_id(post_id=post.pk, text=make_fake_post_comment_text())
+        post_comment = commenter.comment_post_with_id(post_id=post.pk, text=make_fake_post_comment_text())
+        post_comment.soft_delete()
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(1, len(response_posts))
+
+        response_post = response_posts[0]
+        self.assertEqual(response_post['comments_count'], 1)
+
+    def test_reactions_emoji_counts_on_posts_should_exclude_blocked_users(self):
+        """
+        should not count the reactions of blocked users in the reactions emoji counts on posts
+        """
+        user = make_user()
+        reactor = make_user()
+        blocked_user = make_user()
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        post = user.create_public_post(text=make_fake_post_text())
+
+        reactor.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        blocked_user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+        user.block_user_with_id(user_id=blocked_user.pk)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(1, len(response_posts))
+
+        response_emoji_counts = response_posts[0]['reactions_emoji_counts']
+        self.assertEqual(1, len(response_emoji_counts))
+        self.assertEqual(response_emoji_counts[0]['emoji']['id'], emoji.pk)
+        self.assertEqual(response_emoji_counts[0]['count'], 1)
+
     def test_cant_retrieve_own_draft_posts_by_username(self):
         """
         should not be able to retrieve own draft posts by username
@@ -3664,6 +4074,231 @@ class PostsAPITests(OpenbookAPITestCase):
 
         self.assertEqual(0, len(response_posts))
 
+    def test_retrieves_posts_published_before_following_user(self):
+        """
+        should retrieve the posts a user published before being followed
+        """
+        user = make_user()
+        user_to_follow = make_user()
+
+        post = user_to_follow.create_public_post(text=make_fake_post_text())
+
+        user.follow_user_with_id(user_id=user_to_follow.pk)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(1, len(response_posts))
+        self.assertEqual(response_posts[0]['id'], post.pk)
+
+    def test_cant_retrieve_posts_of_unfollowed_user(self):
+        """
+        should not retrieve the posts of a user after unfollowing them
+        """
+        user = make_user()
+        user_to_follow = make_user()
+
+        user.follow_user_with_id(user_id=user_to_follow.pk)
+
+        user_to_follow.create_public_post(text=make_fake_post_text())
+
+        user.unfollow_user_with_id(user_id=user_to_follow.pk)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(0, len(response_posts))
+
+    def test_retrieves_community_posts_published_before_joining(self):
+        """
+        should retrieve the posts of a community published before joining it
+        """
+        user = make_user()
+        community_creator = make_user()
+        community = make_community(creator=community_creator)
+
+        post = community_creator.create_community_post(text=make_fake_post_text(), community_name=community.name)
+
+        user.join_community_with_name(community_name=community.name)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(1, len(response_posts))
+        self.assertEqual(response_posts[0]['id'], post.pk)
+
+    def test_cant_retrieve_community_posts_after_leaving_community(self):
+        """
+        should not retrieve the posts of a community after leaving it
+        """
+        user = make_user()
+        community_creator = make_user()
+        community = make_community(creator=community_creator)
+
+        user.join_community_with_name(community_name=community.name)
+
+        community_creator.create_community_post(text=make_fake_post_text(), community_name=community.name)
+
+        user.leave_community_with_name(community_name=community.name)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual(0, len(response_posts))
+
+    def test_get_all_posts_with_max_id_past_trimmed_timeline(self):
+        """
+        should retrieve the posts older than the trimmed timeline when paginating with a max id
+        """
+        user = make_user()
+
+        posts_ids = [user.create_public_post(text=make_fake_post_text()).pk for i in range(0, 4)]
+
+        with override_settings(TIMELINE_POSTS_MAX_LENGTH=2):
+            trim_timeline_posts()
+
+        self.assertEqual(TimelinePost.objects.filter(owner=user).count(), 2)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, {
+            'max_id': posts_ids[2]
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+        self.assertEqual(response_posts_ids, [posts_ids[1], posts_ids[0]])
+
+    def test_get_all_posts_up_to_trimmed_timeline_boundary(self):
+        """
+        should retrieve the materialized posts up to the trimmed timeline boundary and the older ones past it
+        """
+        user = make_user()
+
+        posts_ids = [user.create_public_post(text=make_fake_post_text()).pk for i in range(0, 4)]
+
+        with override_settings(TIMELINE_POSTS_MAX_LENGTH=2):
+            trim_timeline_posts()
+
+        user.refresh_from_db()
+        self.assertEqual(user.timeline_posts_boundary_post_id, posts_ids[2])
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, {
+            'max_id': posts_ids[3]
+        }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+        self.assertEqual(response_posts_ids, [posts_ids[2]])
+
+        response = self.client.get(url, {
+            'max_id': posts_ids[2]
+        }, **headers)
+
+        response_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+        self.assertEqual(response_posts_ids, [posts_ids[1], posts_ids[0]])
+
+    def test_get_all_posts_without_bootstrapped_timeline(self):
+        """
+        should compute the posts of the followed users when the timeline was not bootstrapped yet
+        """
+        user = make_user()
+        followed_user = make_user()
+
+        user.follow_user_with_id(followed_user.pk)
+
+        post = followed_user.create_public_post(text=make_fake_post_text())
+
+        TimelinePost.objects.filter(owner=user).delete()
+        User.objects.filter(pk=user.pk).update(timeline_posts_boundary_post_id=None)
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+        self.assertEqual(response_posts_ids, [post.pk])
+
+    def test_bootstrap_timeline_posts_records_boundary(self):
+        """
+        should record the oldest materialized post as the boundary of the full bootstrapped timelines
+        """
+        user = make_user()
+
+        posts_ids = [user.create_public_post(text=make_fake_post_text()).pk for i in range(0, 3)]
+
+        User.objects.filter(pk=user.pk).update(timeline_posts_boundary_post_id=None)
+
+        with override_settings(TIMELINE_POSTS_MAX_LENGTH=2):
+            bootstrap_timeline_posts()
+
+        user.refresh_from_db()
+        self.assertEqual(user.timeline_posts_boundary_post_id, posts_ids[1])
+        self.assertEqual(set(TimelinePost.objects.filter(owner=user).values_list('post_id', flat=True)),
+                         {posts_ids[1], posts_ids[2]})
+
+    def test_get_all_posts_retrieves_own_post_before_fan_out(self):
+        """
+        should retrieve the own new post of the user before it is fanned out to the other timelines
+        """
+        user = make_user()
+        follower = make_user()
+
+        follower.follow_user_with_id(user.pk)
+
+        with override_settings(TIMELINE_POSTS_JOBS_ASYNC=True):
+            post = user.create_public_post(text=make_fake_post_text())
+
+        self.assertFalse(TimelinePost.objects.filter(owner=follower, post=post).exists())
+
+        url = self._get_url()
+        headers = make_authentication_headers_for_user(user)
+
+        response = self.client.get(url, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_posts_ids = [post['id'] for post in json.loads(response.content)]
+
+        self.assertEqual(response_posts_ids, [post.pk])
+
     def test_create_post_notifies_subscribers(self):
         """
         should notify subscribers when a post is created
@@ -4878,6 +5513,117 @@ class TopPostsAPITests(OpenbookAPITestCase):
         response_posts = json.loads(response.content)
         self.assertEqual(5, len(response_posts))
 
+    def test_promotes_post_to_top_post_when_reaching_minimum_reactions(self):
+        """
+        should promote a post to top post as soon as it reaches the minimum no of unique reactions
+        """
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+
+        post.refresh_from_db()
+        self.assertEqual(post.unique_reactors_count, 1)
+        self.assertTrue(TopPost.objects.filter(post_id=post.pk).exists())
+
+    def test_demotes_top_post_when_dropping_below_minimum_reactions(self):
+        """
+        should demote a top post as soon as it drops below the minimum no of unique reactions
+        """
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        post_reaction = user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        user.delete_reaction_with_id_for_post_with_id(post_reaction_id=post_reaction.pk, post_id=post.pk)
+
+        post.refresh_from_db()
+        self.assertEqual(post.unique_reactors_count, 0)
+        self.assertFalse(TopPost.objects.filter(post_id=post.pk).exists())
+
+    def test_saving_post_keeps_counters_and_deferred_fields(self):
+        """
+        should not write back the counters nor the fields a post was loaded without when saving it
+        """
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+        deferred_post = Post.objects.defer('language').get(pk=post.pk)
+
+        language = make_random_language()
+        Post.objects.filter(pk=post.pk).update(language=language, unique_reactors_count=5)
+
+        deferred_post.text = 'An edited text'
+
+        with CaptureQueriesContext(connection) as save_queries:
+            deferred_post.save()
+
+        post_updates = [query['sql'] for query in save_queries.captured_queries if
+                        query['sql'].startswith('UPDATE "openbook_posts_post"')]
+        self.assertEqual(len(post_updates), 1)
+        self.assertNotIn('"language_id"', post_updates[0])
+        self.assertNotIn('"unique_reactors_count"', post_updates[0])
+
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'An edited text')
+        self.assertEqual(post.language_id, language.pk)
+        self.assertEqual(post.unique_reactors_count, 5)
+
+    def test_counts_unique_commenters_for_top_posts(self):
+        """
+        should count the commenters of a post only once and keep it as top post while one of their comments remains
+        """
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+
+        post_comment = user.comment_post(post, text=make_fake_post_comment_text())
+        user.comment_post(post, text=make_fake_post_comment_text())
+
+        post.refresh_from_db()
+        self.assertEqual(post.unique_commenters_count, 1)
+
+        user.delete_comment_with_id_for_post_with_id(post_comment_id=post_comment.pk, post_id=post.pk)
+
+        post.refresh_from_db()
+        self.assertEqual(post.unique_commenters_count, 1)
+        self.assertTrue(TopPost.objects.filter(post_id=post.pk).exists())
+
+    def test_curates_top_post_reopened_after_reaching_minimum_reactions(self):
+        """
+        should curate a post that reached the minimum no of reactions while closed once it is reopened
+        """
+        user = make_user()
+        community = make_community(creator=user)
+
+        post = user.create_community_post(community_name=community.name, text=make_fake_post_text())
+        post.is_closed = True
+        post.save()
+
+        emoji_group = make_reactions_emoji_group()
+        emoji = make_emoji(group=emoji_group)
+
+        user.react_to_post_with_id(post_id=post.pk, emoji_id=emoji.pk)
+        self.assertFalse(TopPost.objects.filter(post_id=post.pk).exists())
+
+        post.is_closed = False
+        post.save()
+
+        curate_top_posts()
+
+        self.assertTrue(TopPost.objects.filter(post_id=post.pk).exists())
+
     def _get_url(self):
         return reverse('top-posts')
 
@@ -5442,3 +6188,107 @@ class TopPostsExcludedCommunityAPITests(OpenbookAPITestCase):
         return reverse('top-posts-excluded-community', kwargs={
             'community_name': community.name
         })
+
+
+class TranslatePostsAPITests(OpenbookAPITestCase):
+    """
+    TranslatePostsAPI
+    """
+
+    fixtures = [
+        'openbook_circles/fixtures/circles.json',
+        'openbook_common/fixtures/languages.json'
+    ]
+
+    def test_translates_posts(self):
+        """
+        should translate the translatable posts in the given order, identical texts once, and return 200
+        """
+        user = make_user()
+        Language = get_language_model()
+        user.translation_language = Language.objects.get(code='en')
+        user.save()
+        headers = make_authentication_headers_for_user(user)
+
+        text = 'Ik ben en man 😀. Jij bent en vrouw.'
+        creator = make_user()
+        first_post = creator.create_public_post(text=text)
+        second_post = creator.create_public_post(text=text)
+        circle = make_circle(creator=creator)
+        encircled_post = creator.create_encircled_post(text=text, circles_ids=[circle.pk])
+        cache.delete(make_translated_text_cache_key(text=text, source_language_code='nl', target_language_code='en'))
+
+        url = self._get_url()
+
+        with mock.patch.object(translation_strategy, 'translate_text',
+                               wraps=translation_strategy.translate_text) as translate_text_mock:
+            response = self.client.post(url, {
+                'post_uuid': ','.join(str(post.uuid) for post in [second_post, encircled_post, first_post])
+            }, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(translate_text_mock.call_count, 1)
+
+        response_posts = json.loads(response.content)
+
+        self.assertEqual([response_post['id'] for response_post in response_posts], [second_post.pk, first_post.pk])
+
+        for response_post in response_posts:
+            self.assertEqual(response_post['translated_text'], 'I am a man 😀. You\'re a woman.')
+
+    def test_returns_no_translation_for_unsupported_language_pairs(self):
+        """
+        should return no translated text for the posts between unsupported language pairs and return 200
+        """
+        user = make_user()
+        Language = get_language_model()
+        user.translation_language = Language.objects.get(code='ar')
+        user.save()
+        headers = make_authentication_headers_for_user(user)
+
+        post = make_user().create_public_post(text=make_fake_post_text())
+        post.language = Language.objects.get(code='no')
+        post.save()
+
+        url = self._get_url()
+        response = self.client.post(url, {'post_uuid': str(post.uuid)}, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response_posts = json.loads(response.content)
+        self.assertEqual(len(response_posts), 1)
+        self.assertIsNone(response_posts[0]['translated_text'])
+
+    def test_cannot_translate_posts_without_user_language(self):
+        """
+        should not translate posts and return 400 if the user language is not set
+        """
+        user = make_user()
+        headers = make_authentication_headers_for_user(user)
+        post = make_user().create_public_post(text='Ik ben en man 😀. Jij bent en vrouw.')
+
+        url = self._get_url()
+        response = self.client.post(url, {'post_uuid': str(post.uuid)}, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cannot_translate_more_than_max_posts(self):
+        """
+        should not translate more than TRANSLATE_POSTS_MAX_COUNT posts and return 400
+        """
+        user = make_user()
+        Language = get_language_model()
+        user.translation_language = Language.objects.get(code='en')
+        user.save()
+        headers = make_authentication_headers_for_user(user)
+
+        creator = make_user()
+        posts = [creator.create_public_post(text=make_fake_post_text()) for i in
+                 range(settings.TRANSLATE_POSTS_MAX_COUNT + 1)]
+
+        url = self._get_url()
+        response = self.client.post(url, {'post_uuid': ','.join(str(post.uuid) for post in posts)}, **headers)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _get_url(self):
+        return reverse('translate-posts')
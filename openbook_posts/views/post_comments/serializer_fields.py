@@ -1,5 +1,7 @@
 from rest_framework.fields import Field
 
+from openbook_common.serializers_fields.post_comment import is_preloaded_post_comment
+
 
 class RepliesField(Field):
 
@@ -16,9 +18,15 @@ class RepliesField(Field):
         sort_query = self.context.get('sort_query', '-created')
         request_user = request.user
 
-        replies = request_user.get_comment_replies_for_comment_with_id_with_post_with_uuid(
-            post_uuid=post_comment.post.uuid,
-            post_comment_id=post_comment.pk
-        ).order_by(sort_query)[:self.DEFAULT_REPLY_COUNT]
+        if is_preloaded_post_comment(context=self.context, post_comment=post_comment):
+            replies = self.context['post_comments_replies'].get(post_comment.pk, [])
+            # The data of the replies was preloaded in the same context
+            context = self.context
+        else:
+            replies = request_user.get_comment_replies_for_comment_with_id_with_post_with_uuid(
+                post_uuid=post_comment.post.uuid,
+                post_comment_id=post_comment.pk
+            ).order_by(sort_query)[:self.DEFAULT_REPLY_COUNT]
+            context = {"request": request}
 
-        return self.post_comment_reply_serializer(replies, many=True, context={"request": request}).data
+        return self.post_comment_reply_serializer(replies, many=True, context=context).data
@@ -3,16 +3,16 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from itertools import chain
-import operator
 
 # TODO Use post uuid also internally, not only as API resource identifier
 # In order to prevent enumerable posts API in alpha, this is done as a hotfix
 from openbook_common.utils.model_loaders import get_post_model
 from openbook_moderation.permissions import IsNotSuspended
+from openbook_posts.helpers import make_post_comments_serializer_context
 from openbook_posts.views.post_comments.serializers import EnableDisableCommentsPostSerializer, \
     EnableCommentsPostSerializer, DisableCommentsPostSerializer, GetPostCommentsSerializer, PostCommentSerializer, \
     CommentPostSerializer
+from openbook_posts.views.post_comments.serializer_fields import RepliesField
 
 
 def get_post_id_for_post_uuid(post_uuid):
@@ -43,36 +43,19 @@ class PostComments(APIView):
         post_uuid = data.get('post_uuid')
 
         user = request.user
-        post_id = get_post_id_for_post_uuid(post_uuid)
+        Post = get_post_model()
+        post = Post.objects.select_related('community').get(uuid=post_uuid)
 
         sort_query = self.SORT_CHOICE_TO_QUERY[sort]
 
-        if not max_id and not min_id:
-            all_comments = user.get_comments_for_post_with_id(post_id).order_by(sort_query)[:count_max].all()
-        else:
-            post_comments_max = []
-            post_comments_min = []
-            if max_id:
-                post_comments_max = user.get_comments_for_post_with_id(post_id,
-                                                                       max_id=max_id).order_by('-pk')[:count_max]
-                post_comments_max = sorted(post_comments_max.all(),
-                                           key=operator.attrgetter('created'),
-                                           reverse=sort_query == self.SORT_CHOICE_TO_QUERY['DESC'])
-
-            if min_id:
-                post_comments_min = user.get_comments_for_post_with_id(post_id,
-                                                                       min_id=min_id).order_by('pk')[:count_min]
-                post_comments_min = sorted(post_comments_min.all(),
-                                           key=operator.attrgetter('created'),
-                                           reverse=sort_query == self.SORT_CHOICE_TO_QUERY['DESC'])
-
-            if sort_query == self.SORT_CHOICE_TO_QUERY['ASC']:
-                all_comments = list(chain(post_comments_max, post_comments_min))
-            elif sort_query == self.SORT_CHOICE_TO_QUERY['DESC']:
-                all_comments = list(chain(post_comments_min, post_comments_max))
-
-        post_comments_serializer = PostCommentSerializer(all_comments, many=True, context={"request": request,
-                                                                                           "sort_query": sort_query})
+        all_comments = user.get_comments_page_for_post(post=post, sort_query=sort_query, max_id=max_id, min_id=min_id,
+                                                       count_max=count_max, count_min=count_min)
+
+        post_comments_serializer = PostCommentSerializer(all_comments, many=True,
+                                                         context=make_post_comments_serializer_context(
+                                                             request=request, post=post, post_comments=all_comments,
+                                                             sort_query=sort_query,
+                                                             replies_count=RepliesField.DEFAULT_REPLY_COUNT))
 
         return Response(post_comments_serializer.data, status=status.HTTP_200_OK)
 
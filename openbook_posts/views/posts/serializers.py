@@ -75,6 +75,15 @@ class GetTrendingPostsSerializer(serializers.Serializer):
     )
 
 
+class TranslatePostsSerializer(serializers.Serializer):
+    post_uuid = serializers.ListField(
+        required=True,
+        allow_empty=False,
+        max_length=settings.TRANSLATE_POSTS_MAX_COUNT,
+        child=serializers.UUIDField(),
+    )
+
+
 class CreatePostSerializer(serializers.Serializer):
     text = serializers.CharField(max_length=settings.POST_MAX_LENGTH, required=False, allow_blank=False,
                                  validators=post_text_validators)
@@ -11,11 +11,14 @@ from openbook_common.serializers import CommonSearchCommunitiesSerializer, Commo
     CommonCommunityNameSerializer
 from openbook_moderation.permissions import IsNotSuspended
 from openbook_common.utils.helpers import normalize_list_value_in_request_data, normalise_request_data
+from openbook_common.utils.model_loaders import get_post_model
+from openbook_posts.helpers import make_posts_serializer_context
 from openbook_posts.permissions import IsGetOrIsAuthenticated
 from openbook_posts.views.posts.serializers import AuthenticatedUserPostSerializer, \
     GetPostsSerializer, UnauthenticatedUserPostSerializer, CreatePostSerializer, GetTopPostsSerializer, \
     AuthenticatedUserTopPostSerializer, GetTrendingPostsSerializer, AuthenticatedUserTrendingPostSerializer, \
-    GetProfilePostsCommunityExclusionSerializer, GetTopPostsCommunityExclusionSerializer
+    GetProfilePostsCommunityExclusionSerializer, GetTopPostsCommunityExclusionSerializer, TranslatePostsSerializer
+from openbook_translation.strategies.base import TranslationClientError
 
 
 class Posts(APIView):
@@ -85,9 +88,11 @@ class Posts(APIView):
                 count=count
             )
 
-        posts = posts.order_by('-id')[:count]
+        posts = list(posts.order_by('-id')[:count])
 
-        post_serializer_data = AuthenticatedUserPostSerializer(posts, many=True, context={"request": request}).data
+        post_serializer_data = AuthenticatedUserPostSerializer(posts, many=True,
+                                                               context=make_posts_serializer_context(request=request,
+                                                                                                     posts=posts)).data
 
         return Response(post_serializer_data, status=status.HTTP_200_OK)
 
@@ -120,8 +125,10 @@ class TrendingPosts(APIView):
     def get(self, request):
         user = request.user
 
-        posts = user.get_trending_posts_old()[:30]
-        posts_serializer = AuthenticatedUserPostSerializer(posts, many=True, context={"request": request})
+        posts = list(user.get_trending_posts_old()[:30])
+        posts_serializer = AuthenticatedUserPostSerializer(posts, many=True,
+                                                           context=make_posts_serializer_context(request=request,
+                                                                                                 posts=posts))
         return Response(posts_serializer.data, status=status.HTTP_200_OK)
 
 
@@ -140,12 +147,46 @@ class TrendingPostsNew(APIView):
         count = data.get('count', 30)
         user = request.user
 
-        trending_posts = user.get_trending_posts(max_id=max_id, min_id=min_id).order_by('-id')[:count]
+        trending_posts = list(user.get_trending_posts(max_id=max_id, min_id=min_id).order_by('-id')[:count])
+        posts_serializer_context = make_posts_serializer_context(request=request,
+                                                                 posts=[trending_post.post for trending_post in
+                                                                        trending_posts])
         posts_serializer = AuthenticatedUserTrendingPostSerializer(trending_posts, many=True,
-                                                                   context={"request": request})
+                                                                   context=posts_serializer_context)
         return Response(posts_serializer.data, status=status.HTTP_200_OK)
 
 
+class TranslatePosts(APIView):
+    permission_classes = (IsAuthenticated, IsNotSuspended)
+
+    def post(self, request):
+        request_data = normalise_request_data(request.data)
+        normalize_list_value_in_request_data('post_uuid', request_data)
+
+        serializer = TranslatePostsSerializer(data=request_data)
+        serializer.is_valid(raise_exception=True)
+
+        data = serializer.validated_data
+        posts_uuids = data.get('post_uuid')
+        user = request.user
+
+        Post = get_post_model()
+        posts_ids_by_uuid = dict(Post.objects.filter(uuid__in=posts_uuids).values_list('uuid', 'id'))
+        posts_ids = [posts_ids_by_uuid[post_uuid] for post_uuid in posts_uuids if post_uuid in posts_ids_by_uuid]
+
+        try:
+            translated_posts = user.translate_posts_with_ids(posts_ids=posts_ids)
+        except TranslationClientError:
+            return ApiMessageResponse(_('Translation service returned an error'),
+                                      status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        return Response([{
+            'id': post.pk,
+            'uuid': str(post.uuid),
+            'translated_text': translated_text
+        } for post, translated_text in translated_posts], status=status.HTTP_200_OK)
+
+
 class TopPosts(APIView):
     permission_classes = (IsAuthenticated, IsNotSuspended)
 
@@ -163,9 +204,12 @@ class TopPosts(APIView):
 
         user = request.user
 
-        top_posts = user.get_top_posts(max_id=max_id, min_id=min_id,
-                                       exclude_joined_communities=exclude_joined_communities).order_by('-id')[:count]
-        posts_serializer = AuthenticatedUserTopPostSerializer(top_posts, many=True, context={"request": request})
+        top_posts = list(user.get_top_posts(max_id=max_id, min_id=min_id,
+                                            exclude_joined_communities=exclude_joined_communities).order_by('-id')[
+                         :count])
+        posts_serializer_context = make_posts_serializer_context(request=request,
+                                                                 posts=[top_post.post for top_post in top_posts])
+        posts_serializer = AuthenticatedUserTopPostSerializer(top_posts, many=True, context=posts_serializer_context)
         return Response(posts_serializer.data, status=status.HTTP_200_OK)
 
 
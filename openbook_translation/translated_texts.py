@@ -0,0 +1,67 @@
+import time
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+
+from openbook_translation import translation_strategy
+
+TRANSLATED_TEXT_CACHE_KEY_PREFIX = 'translated_text:'
+TRANSLATED_TEXT_LOCK_KEY_SUFFIX = ':lock'
+
+
+def get_translated_text(text, source_language_code, target_language_code):
+    """
+    Returns the translation of the text, translating it with the translation strategy only if it is not cached.
+    Translations are keyed by the hash of the text, so the same text is translated once per language pair.
+    Concurrent requests for the same translation wait shortly for the first one before translating it themselves.
+    """
+    cache_key = make_translated_text_cache_key(text=text, source_language_code=source_language_code,
+                                               target_language_code=target_language_code)
+    translated_text = cache.get(cache_key)
+
+    if translated_text is not None:
+        return translated_text
+
+    lock_key = '%s%s' % (cache_key, TRANSLATED_TEXT_LOCK_KEY_SUFFIX)
+    is_lock_acquired = cache.add(lock_key, True, settings.TRANSLATION_CACHE_LOCK_TIMEOUT)
+
+    if not is_lock_acquired:
+        translated_text = _wait_for_translated_text(cache_key=cache_key, lock_key=lock_key)
+        if translated_text is not None:
+            return translated_text
+
+    try:
+        result = translation_strategy.translate_text(
+            source_language_code=source_language_code,
+            target_language_code=target_language_code,
+            text=text
+        )
+        translated_text = result.get('translated_text')
+
+        if translated_text is not None:
+            cache.set(cache_key, translated_text, settings.TRANSLATION_CACHE_TIMEOUT)
+    finally:
+        if is_lock_acquired:
+            cache.delete(lock_key)
+
+    return translated_text
+
+
+def make_translated_text_cache_key(text, source_language_code, target_language_code):
+    return '%s%s:%s:%s' % (TRANSLATED_TEXT_CACHE_KEY_PREFIX, source_language_code, target_language_code,
+                           sha256(text.encode('utf-8')).hexdigest())
+
+
+def _wait_for_translated_text(cache_key, lock_key):
+    # Gives up once the lock holder is done or after a short wait, the caller then translates the text itself
+    deadline = time.monotonic() + settings.TRANSLATION_CACHE_LOCK_WAIT_TIMEOUT
+
+    while time.monotonic() < deadline:
+        time.sleep(settings.TRANSLATION_CACHE_LOCK_POLL_INTERVAL)
+        values = cache.get_many([cache_key, lock_key])
+
+        if values.get(cache_key) is not None or lock_key not in values:
+            return values.get(cache_key)
+
+    return None
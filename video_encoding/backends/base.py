@@ -19,6 +19,16 @@ class BaseEncodingBackend(six.with_metaclass(abc.ABCMeta)):
         """
         pass
 
+    def encode_renditions(self, source_path, renditions, total_time=None):
+        """
+        Encodes a video to several files, `renditions` is a list of
+        `(target_path, params)` tuples. Backends able to produce several
+        outputs at once should override this.
+        """
+        for i, (target_path, params) in enumerate(renditions):
+            for progress in self.encode(source_path, target_path, params):
+                yield (i + progress / 100) * 100 / len(renditions)
+
     @abc.abstractmethod
     def get_media_info(self, video_path):  # pragma: no cover
         """
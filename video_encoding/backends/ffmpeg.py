@@ -16,6 +16,7 @@ from .base import BaseEncodingBackend
 
 logger = logging.getLogger(__name__)
 RE_TIMECODE = re.compile(r'time=(\d+:\d+:\d+.\d+) ')
+PROGRESS_READ_SIZE = 4096
 
 console_encoding = locale.getdefaultlocale()[1] or 'UTF-8'
 
@@ -80,58 +81,70 @@ class FFmpegBackend(BaseEncodingBackend):
         self.stderr = stderr.decode(console_encoding)
         return self.stdout, self.stderr
 
-    # TODO reduce complexity
-    def encode(self, source_path, target_path, params):  # NOQA: C901
+    def encode(self, source_path, target_path, params, total_time=None):
         """
         Encodes a video to a specified file. All encoder specific options
         are passed in using `params`.
         """
-        total_time = self.get_media_info(source_path)['duration']
+        return self.encode_renditions(source_path, [(target_path, params)], total_time=total_time)
+
+    def encode_renditions(self, source_path, renditions, total_time=None):
+        """
+        Encodes a video to several files with a single ffmpeg invocation, so
+        the source is only read and decoded once. `renditions` is a list of
+        `(target_path, params)` tuples.
+        """
+        if total_time is None:
+            total_time = self.get_media_info(source_path)['duration']
 
         cmds = [self.ffmpeg_path, '-i', source_path]
-        cmds.extend(self.params)
-        cmds.extend(params)
-        cmds.extend([target_path])
+        for target_path, params in renditions:
+            cmds.extend(self.params)
+            cmds.extend(params)
+            cmds.extend([target_path])
 
         process = self._spawn(cmds)
 
-        buf = output = ''
+        output = []
+        buf = ''
         # update progress
         while True:
             # any more data?
-            out = process.stderr.read(10)
+            out = process.stderr.read1(PROGRESS_READ_SIZE)
             if not out:
                 break
 
-            out = out.decode(console_encoding)
-            output += out
+            out = out.decode(console_encoding, errors='replace')
+            output.append(out)
             buf += out
 
-            try:
-                line, buf = buf.split('\r', 1)
-            except ValueError:
-                continue
+            *lines, buf = buf.split('\r')
 
-            try:
-                time_str = RE_TIMECODE.findall(line)[0]
-            except IndexError:
+            # only the latest progress line is of interest
+            for line in reversed(lines):
+                time_str = RE_TIMECODE.findall(line)
+                if time_str:
+                    break
+            else:
                 continue
 
             # convert progress to percent
             time = 0
-            for part in time_str.split(':'):
+            for part in time_str[0].split(':'):
                 time = 60 * time + float(part)
 
-            percent = time / total_time
+            percent = min(time / total_time * 100, 100)
             logger.debug('yield {}%'.format(percent))
             yield percent
 
-        if os.path.getsize(target_path) == 0:
-            raise exceptions.FFmpegError("File size of generated file is 0")
+        for target_path, params in renditions:
+            if os.path.getsize(target_path) == 0:
+                raise exceptions.FFmpegError("File size of generated file is 0")
 
         # wait for process to exit
         self._check_returncode(process)
 
+        output = ''.join(output)
         logger.debug(output)
         if not output:
             raise exceptions.FFmpegError("No output from FFmpeg.")
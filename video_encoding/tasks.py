@@ -1,5 +1,6 @@
 import os
 import tempfile
+import time
 
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
@@ -37,6 +38,10 @@ def convert_all_videos(app_label, model_name, object_pk):
 def convert_video(fieldfile, force=False):
     """
     Converts a given video file into all defined formats.
+
+    The source is probed once and all the pending formats are encoded
+    together, the progress is persisted at most every
+    `VIDEO_ENCODING_PROGRESS_UPDATE` seconds.
     """
     instance = fieldfile.instance
     field = fieldfile.field
@@ -47,51 +52,81 @@ def convert_video(fieldfile, force=False):
     source_path = local_path
 
     encoding_backend = get_backend()
+    content_type = ContentType.objects.get_for_model(instance)
 
-    for options in settings.VIDEO_ENCODING_FORMATS[encoding_backend.name]:
-        video_format, created = Format.objects.get_or_create(
-            object_id=instance.pk,
-            content_type=ContentType.objects.get_for_model(instance),
-            field_name=field.name, format=options['name'])
+    pending_formats = []
+
+    try:
+        for options in settings.VIDEO_ENCODING_FORMATS[encoding_backend.name]:
+            video_format, created = Format.objects.get_or_create(
+                object_id=instance.pk,
+                content_type=content_type,
+                field_name=field.name, format=options['name'])
+
+            # do not reencode if not requested
+            if video_format.file and not force:
+                continue
 
-        # do not reencode if not requested
-        if video_format.file and not force:
-            continue
-        else:
             # set progress to 0
             video_format.reset_progress()
 
-        # TODO do not upscale videos
+            # TODO do not upscale videos
 
-        _, target_path = tempfile.mkstemp(
-            suffix='_{name}.{extension}'.format(**options))
+            target_fd, target_path = tempfile.mkstemp(
+                suffix='_{name}.{extension}'.format(**options))
+            os.close(target_fd)
+
+            pending_formats.append((video_format, options, target_path))
+
+        if not pending_formats:
+            return
 
         try:
-            encoding = encoding_backend.encode(
-                source_path, target_path, options['params'])
-            while encoding:
-                try:
-                    progress = next(encoding)
-                except StopIteration:
-                    break
-                video_format.update_progress(progress)
+            total_time = encoding_backend.get_media_info(source_path)['duration']
+            _encode_formats(encoding_backend=encoding_backend,
+                            source_path=source_path,
+                            pending_formats=pending_formats,
+                            total_time=total_time)
         except VideoEncodingError:
             # TODO handle with more care
-            video_format.delete()
-            os.remove(target_path)
-            continue
+            for video_format, options, target_path in pending_formats:
+                video_format.delete()
+            return
+
+        for video_format, options, target_path in pending_formats:
+            # save encoded file
+            with open(target_path, mode='rb') as target_file:
+                video_format.file.save(
+                    '{filename}_{name}.{extension}'.format(filename=filename,
+                                                           **options),
+                    File(target_file))
+
+            video_format.update_progress(100)  # now we are ready
+    finally:
+        # remove temporary files
+        for video_format, options, target_path in pending_formats:
+            if os.path.exists(target_path):
+                os.remove(target_path)
 
-        # save encoded file
-        video_format.file.save(
-            '{filename}_{name}.{extension}'.format(filename=filename,
-                                                   **options),
-            File(open(target_path, mode='rb')))
+        if temp_file:
+            temp_file.close()
+            os.unlink(temp_file.name)
 
-        video_format.update_progress(100)  # now we are ready
 
-        # remove temporary file
-        os.remove(target_path)
+def _encode_formats(encoding_backend, source_path, pending_formats,
+                    total_time):
+    formats_ids = [video_format.pk for video_format, options, target_path
+                   in pending_formats]
+    renditions = [(target_path, options['params']) for
+                  video_format, options, target_path in pending_formats]
 
-        if temp_file:
-            os.unlink(temp_file.name)
-            temp_file.close()
+    last_progress_update = time.monotonic()
+
+    for progress in encoding_backend.encode_renditions(
+            source_path, renditions, total_time=total_time):
+        now = time.monotonic()
+        if now - last_progress_update < settings.VIDEO_ENCODING_PROGRESS_UPDATE:
+            continue
+
+        Format.objects.filter(pk__in=formats_ids).update(progress=int(progress))
+        last_progress_update = now
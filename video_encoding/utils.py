@@ -9,10 +9,14 @@ def get_fieldfile_local_path(fieldfile):
         # Try to access with path
         storage_local_path = storage.path(fieldfile.path)
     except (NotImplementedError, AttributeError):
-        # Storage doesnt support absolute paths, download file to a temp local dir
-        storage_file = storage.open(fieldfile.name, 'r')
+        # Storage doesnt support absolute paths, stream the file to a temp local dir
         local_temp_file = tempfile.NamedTemporaryFile(delete=False)
-        local_temp_file.write(storage_file.read())
+
+        with storage.open(fieldfile.name, 'rb') as storage_file:
+            for chunk in storage_file.chunks():
+                local_temp_file.write(chunk)
+
+        local_temp_file.flush()
         local_temp_file.seek(0)
 
         storage_local_path = local_temp_file.name